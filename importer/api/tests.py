@@ -1,3 +1,7 @@
+import hashlib
+import os
+import shutil
+from datetime import timedelta
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from geonode.layers.models import Dataset
@@ -9,7 +13,8 @@ from importer import project_dir
 from geonode.base.populate_test_data import create_single_dataset
 from django.http import HttpResponse, QueryDict
 
-from importer.models import ResourceHandlerInfo
+from importer.models import ChunkedUpload, ResourceHandlerInfo
+from importer.api.views import ExecutionStatusViewSet
 from importer.tests.utils import ImporterBaseTestSupport
 from importer.orchestrator import orchestrator
 from django.utils.module_loading import import_string
@@ -106,10 +111,9 @@ class TestImporterViewSet(ImporterBaseTestSupport):
 
         self.assertTrue(201, response.status_code)
 
+    @patch("importer.api.views.stage_upload")
     @patch("importer.api.views.import_orchestrator")
-    def test_zip_file_is_unzip_and_the_handler_is_found(self, patch_upload):
-        patch_upload.apply_async.side_effect = MagicMock()
-
+    def test_zip_file_is_staged_by_the_worker(self, patch_upload, stage_upload):
         self.client.force_login(get_user_model().objects.get(username="admin"))
         payload = {
             "base_file": open(f"{project_dir}/tests/fixture/valid.zip", "rb"),
@@ -117,9 +121,20 @@ class TestImporterViewSet(ImporterBaseTestSupport):
             "store_spatial_files": True,
         }
 
-        response = self.client.post(self.url, data=payload)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, data=payload)
 
         self.assertEqual(201, response.status_code)
+        execution_id = response.json()["execution_id"]
+        stage_upload.apply_async.assert_called_once_with((execution_id,))
+        patch_upload.s.assert_not_called()
+
+        staging = orchestrator.get_execution_object(execution_id).input_params[
+            "staging"
+        ]
+        self.assertEqual("valid", staging["original_zip_name"])
+        self.assertTrue(os.path.exists(staging["archive"]))
+        shutil.rmtree(os.path.dirname(staging["archive"]))
 
     def test_copy_method_not_allowed(self):
         self.client.force_login(get_user_model().objects.get(username="admin"))
@@ -213,3 +228,330 @@ class TestImporterViewSet(ImporterBaseTestSupport):
 
         self.assertEqual(500, response.status_code)
         self.assertFalse(LocalAsset.objects.exists())
+
+    @patch("importer.api.views.import_orchestrator")
+    def test_chunked_upload_should_start_the_import_once_finalized(
+        self, patch_upload
+    ):
+        patch_upload.apply_async.side_effect = MagicMock()
+        content = b'{"type": "FeatureCollection", "content": "some-content"}'
+
+        self.client.force_login(get_user_model().objects.get(username="admin"))
+        response = self.client.post(
+            reverse("importer_chunked_upload"),
+            data={
+                "files": {"base_file": {"name": "test.geojson", "size": len(content)}},
+                "store_spatial_files": True,
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(201, response.status_code)
+        upload_id = response.json()["upload_id"]
+        detail_url = reverse("importer_chunked_upload_detail", args=[upload_id])
+
+        response = self.client.put(
+            f"{detail_url}?file=base_file&offset=0",
+            data=content[:10],
+            content_type="application/octet-stream",
+            HTTP_X_CHUNK_CHECKSUM=hashlib.sha256(content[:10]).hexdigest(),
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(10, response.json()["files"]["base_file"]["offset"])
+
+        # the chunk already sent is rejected with the current offset
+        response = self.client.put(
+            f"{detail_url}?file=base_file&offset=0",
+            data=content[:10],
+            content_type="application/octet-stream",
+        )
+        self.assertEqual(409, response.status_code)
+        self.assertEqual(10, response.json()["files"]["base_file"]["offset"])
+
+        finalize_url = reverse("importer_chunked_upload_finalize", args=[upload_id])
+        response = self.client.post(finalize_url)
+        self.assertEqual(500, response.status_code)
+
+        response = self.client.put(
+            f"{detail_url}?file=base_file&offset=10",
+            data=content[10:],
+            content_type="application/octet-stream",
+        )
+        self.assertEqual(200, response.status_code)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(finalize_url)
+        self.assertEqual(201, response.status_code)
+        patch_upload.s.assert_called_once()
+        patch_upload.s.return_value.apply_async.assert_called_once()
+
+        _exec = orchestrator.get_execution_object(response.json()["execution_id"])
+        with open(_exec.input_params["files"]["base_file"], "rb") as _file:
+            self.assertEqual(content, _file.read())
+
+        # the finalize is idempotent
+        response = self.client.post(finalize_url)
+        self.assertEqual(201, response.status_code)
+        patch_upload.s.assert_called_once()
+
+        asset_handler = import_string(_exec.input_params["asset_module_path"])
+        asset_handler.objects.filter(id=_exec.input_params["asset_id"]).delete()
+
+    def test_chunked_upload_should_refuse_invalid_file_names(self):
+        self.client.force_login(get_user_model().objects.get(username="admin"))
+        for files in (
+            {"base_file": {"name": "..", "size": 10}},
+            {"base_file": {"name": "../../test.geojson", "size": 10}},
+            {
+                "base_file": {"name": "test.shp", "size": 10},
+                "dbf_file": {"name": "test.shp", "size": 10},
+            },
+        ):
+            response = self.client.post(
+                reverse("importer_chunked_upload"),
+                data={"files": files},
+                content_type="application/json",
+            )
+            self.assertEqual(400, response.status_code)
+
+    def test_chunked_upload_should_delete_the_expired_uploads(self):
+        self.client.force_login(get_user_model().objects.get(username="admin"))
+        payload = {"files": {"base_file": {"name": "test.geojson", "size": 10}}}
+        response = self.client.post(
+            reverse("importer_chunked_upload"), data=payload, content_type="application/json"
+        )
+        upload_id = response.json()["upload_id"]
+        detail_url = reverse("importer_chunked_upload_detail", args=[upload_id])
+        upload = ChunkedUpload.objects.get(upload_id=upload_id)
+        self.assertTrue(os.path.exists(upload.asset_dir))
+
+        # the anonymous users cannot read the uploads
+        self.client.logout()
+        self.assertIn(self.client.get(detail_url).status_code, (401, 403))
+        self.client.force_login(get_user_model().objects.get(username="admin"))
+
+        ChunkedUpload.objects.filter(pk=upload.pk).update(
+            last_updated=upload.last_updated - timedelta(days=2)
+        )
+        self.assertEqual(404, self.client.get(detail_url).status_code)
+
+        # a new upload deletes the expired ones and their files
+        response = self.client.post(
+            reverse("importer_chunked_upload"), data=payload, content_type="application/json"
+        )
+        self.assertEqual(201, response.status_code)
+        self.assertFalse(ChunkedUpload.objects.filter(pk=upload.pk).exists())
+        self.assertFalse(os.path.exists(upload.asset_dir))
+
+        new_upload = ChunkedUpload.objects.get(upload_id=response.json()["upload_id"])
+        shutil.rmtree(new_upload.asset_dir, ignore_errors=True)
+        new_upload.delete()
+
+    @patch("importer.api.views.dispatch_execution_group")
+    def test_bulk_import_should_group_the_executions(self, dispatch):
+        self.client.force_login(get_user_model().objects.get(username="admin"))
+        payload = {
+            "manifest": [
+                {"base_file": f"{project_dir}/tests/fixture/valid.gpkg"},
+                {
+                    "base_file": f"{project_dir}/tests/fixture/valid.geojson",
+                    "overwrite_existing_layer": False,
+                },
+            ],
+            "store_spatial_files": True,
+        }
+        with patch(
+            "importer.api.views.IMPORTER_BULK_IMPORT_ALLOWED_DIRS",
+            [f"{project_dir}/tests/fixture"],
+        ):
+            response = self.client.post(
+                reverse("importer_bulk_upload"),
+                data=payload,
+                content_type="application/json",
+            )
+
+        self.assertEqual(201, response.status_code)
+        parent_id = response.json()["execution_id"]
+        dispatch.apply_async.assert_called_once_with((parent_id,))
+
+        parent = orchestrator.get_execution_object(parent_id)
+        self.assertEqual(2, len(parent.input_params["children"]))
+        self.assertEqual(
+            {"total": 2, "finished": 0, "failed": 0}, parent.output_params["group"]
+        )
+        handlers = []
+        for child_id in parent.input_params["children"]:
+            child = orchestrator.get_execution_object(child_id)
+            self.assertEqual(parent_id, child.input_params["parent"])
+            handlers.append(child.input_params["handler_module_path"])
+            asset_handler = import_string(child.input_params["asset_module_path"])
+            asset_handler.objects.filter(id=child.input_params["asset_id"]).delete()
+        self.assertListEqual(
+            [
+                "importer.handlers.gpkg.handler.GPKGFileHandler",
+                "importer.handlers.geojson.handler.GeoJsonFileHandler",
+            ],
+            handlers,
+        )
+
+    @patch("importer.api.views.dispatch_execution_group")
+    @patch("importer.api.views.UploadLimitValidator._get_max_parallel_uploads")
+    def test_bulk_import_should_count_each_file_in_the_parallelism_limit(
+        self, max_parallel_uploads, dispatch
+    ):
+        max_parallel_uploads.return_value = 1
+        self.client.force_login(get_user_model().objects.get(username="admin"))
+        payload = {
+            "manifest": [
+                {"base_file": f"{project_dir}/tests/fixture/valid.gpkg"},
+                {"base_file": f"{project_dir}/tests/fixture/valid.geojson"},
+            ],
+        }
+        with patch(
+            "importer.api.views.IMPORTER_BULK_IMPORT_ALLOWED_DIRS",
+            [f"{project_dir}/tests/fixture"],
+        ):
+            response = self.client.post(
+                reverse("importer_bulk_upload"),
+                data=payload,
+                content_type="application/json",
+            )
+
+        self.assertEqual(400, response.status_code)
+        dispatch.apply_async.assert_not_called()
+        self.assertFalse(LocalAsset.objects.exists())
+
+    @patch("importer.api.views.dispatch_execution_group")
+    def test_bulk_import_should_validate_the_params(self, dispatch):
+        self.client.force_login(get_user_model().objects.get(username="admin"))
+        payload = {
+            "manifest": [{"base_file": f"{project_dir}/tests/fixture/valid.gpkg"}],
+            "overwrite_existing_layer": "not_a_boolean",
+        }
+        with patch(
+            "importer.api.views.IMPORTER_BULK_IMPORT_ALLOWED_DIRS",
+            [f"{project_dir}/tests/fixture"],
+        ):
+            response = self.client.post(
+                reverse("importer_bulk_upload"),
+                data=payload,
+                content_type="application/json",
+            )
+
+        self.assertEqual(400, response.status_code)
+        dispatch.apply_async.assert_not_called()
+        self.assertFalse(LocalAsset.objects.exists())
+
+    @patch("importer.api.views.dispatch_execution_group")
+    def test_bulk_import_should_refuse_the_paths_not_allowed(self, dispatch):
+        self.client.force_login(get_user_model().objects.get(username="admin"))
+        payload = {
+            "manifest": [{"base_file": f"{project_dir}/tests/fixture/valid.gpkg"}],
+        }
+
+        response = self.client.post(
+            reverse("importer_bulk_upload"),
+            data=payload,
+            content_type="application/json",
+        )
+
+        self.assertEqual(400, response.status_code)
+        dispatch.apply_async.assert_not_called()
+        self.assertFalse(LocalAsset.objects.exists())
+
+    def test_execution_status_should_answer_with_the_cursor(self):
+        user = get_user_model().objects.get(username="admin")
+        exec_id = orchestrator.create_execution_request(
+            user=user, func_name="start_import", step="start_import"
+        )
+        url = reverse("importer_execution_status", args=[str(exec_id)])
+        self.client.force_login(user)
+
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        cursor = response.json()["cursor"]
+        self.assertEqual("start_import", response.json()["step"])
+
+        # nothing changed, the long-poll answers at the timeout with the same cursor
+        with patch("importer.api.views.IMPORTER_STATUS_STREAM", True), patch(
+            "importer.api.views.IMPORTER_STATUS_STREAM_TIMEOUT", 0
+        ):
+            response = self.client.get(url, {"cursor": cursor})
+        self.assertEqual(cursor, response.json()["cursor"])
+
+        orchestrator.update_execution_request_status(
+            execution_id=str(exec_id), step="importer.import_resource"
+        )
+        response = self.client.get(url, {"cursor": cursor})
+        self.assertNotEqual(cursor, response.json()["cursor"])
+        self.assertEqual("importer.import_resource", response.json()["step"])
+
+    @patch("importer.api.views.IMPORTER_STATUS_STREAM", False)
+    def test_execution_status_should_not_wait_if_the_stream_is_disabled(self):
+        user = get_user_model().objects.get(username="admin")
+        exec_id = orchestrator.create_execution_request(
+            user=user, func_name="start_import", step="start_import"
+        )
+        url = reverse("importer_execution_status", args=[str(exec_id)])
+        self.client.force_login(user)
+        cursor = self.client.get(url).json()["cursor"]
+
+        with patch.object(
+            ExecutionStatusViewSet,
+            "_wait_for_update",
+            wraps=ExecutionStatusViewSet._wait_for_update,
+        ) as wait_for_update:
+            response = self.client.get(url, {"cursor": cursor})
+
+        self.assertEqual(cursor, response.json()["cursor"])
+        wait_for_update.assert_called_once_with(str(exec_id), cursor, 0)
+
+    def test_execution_status_stream_should_close_once_completed(self):
+        user = get_user_model().objects.get(username="admin")
+        exec_id = orchestrator.create_execution_request(
+            user=user, func_name="start_import", step="start_import"
+        )
+        orchestrator.set_as_completed(exec_id)
+        self.client.force_login(user)
+
+        response = self.client.get(
+            reverse("importer_execution_status", args=[str(exec_id)]),
+            HTTP_ACCEPT="text/event-stream",
+        )
+
+        self.assertEqual(200, response.status_code)
+        events = b"".join(response.streaming_content).decode().strip().split("\n\n")
+        self.assertEqual(1, len(events))
+        self.assertIn("event: status", events[0])
+        self.assertIn('"status": "finished"', events[0])
+
+    def test_resume_should_refuse_the_executions_not_failed(self):
+        user = get_user_model().objects.get(username="admin")
+        exec_id = orchestrator.create_execution_request(
+            user=user, func_name="start_import", step="start_import"
+        )
+        self.client.force_login(user)
+
+        response = self.client.post(
+            reverse("importer_execution_resume", args=[str(exec_id)])
+        )
+
+        self.assertEqual(409, response.status_code)
+
+    @patch("importer.api.views.orchestrator.resume_execution", return_value=["layer"])
+    def test_resume_should_resume_the_failed_layers(self, resume_execution):
+        user = get_user_model().objects.get(username="admin")
+        exec_id = orchestrator.create_execution_request(
+            user=user, func_name="start_import", step="start_import"
+        )
+        orchestrator.update_execution_request_status(
+            execution_id=str(exec_id), status="failed"
+        )
+        self.client.force_login(user)
+
+        response = self.client.post(
+            reverse("importer_execution_resume", args=[str(exec_id)])
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(["layer"], response.json()["layers"])
+        resume_execution.assert_called_once_with(str(exec_id))
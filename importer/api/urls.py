@@ -1,5 +1,13 @@
 from geonode.upload.api.urls import urlpatterns
-from importer.api.views import ResourceImporter, ImporterViewSet
+from importer.api.views import (
+    BulkImporterViewSet,
+    ChunkedUploadViewSet,
+    ExecutionResumeViewSet,
+    ExecutionStatusViewSet,
+    ImporterViewSet,
+    MetricsViewSet,
+    ResourceImporter,
+)
 from django.urls import re_path
 
 urlpatterns.insert(
@@ -19,3 +27,67 @@ urlpatterns.insert(
         name="importer_resource_copy",
     ),
 )
+
+# the chunked and bulk upload routes must be evaluated before the importer_upload one
+urlpatterns.insert(
+    0,
+    re_path(
+        r"uploads/upload/chunked/(?P<upload_id>[0-9a-f-]+)/finalize$",
+        ChunkedUploadViewSet.as_view({"post": "finalize"}),
+        name="importer_chunked_upload_finalize",
+    ),
+)
+
+urlpatterns.insert(
+    0,
+    re_path(
+        r"uploads/upload/chunked/(?P<upload_id>[0-9a-f-]+)$",
+        ChunkedUploadViewSet.as_view({"get": "status", "put": "chunk"}),
+        name="importer_chunked_upload_detail",
+    ),
+)
+
+urlpatterns.insert(
+    0,
+    re_path(
+        r"uploads/upload/chunked$",
+        ChunkedUploadViewSet.as_view({"post": "initiate"}),
+        name="importer_chunked_upload",
+    ),
+)
+
+urlpatterns.insert(
+    0,
+    re_path(
+        r"uploads/upload/bulk$",
+        BulkImporterViewSet.as_view({"post": "bulk"}),
+        name="importer_bulk_upload",
+    ),
+)
+
+urlpatterns.insert(
+    0,
+    re_path(
+        r"uploads/upload/status/(?P<execution_id>[0-9a-f-]+)$",
+        ExecutionStatusViewSet.as_view({"get": "status"}),
+        name="importer_execution_status",
+    ),
+)
+
+urlpatterns.insert(
+    0,
+    re_path(
+        r"uploads/upload/metrics$",
+        MetricsViewSet.as_view({"get": "metrics"}),
+        name="importer_metrics",
+    ),
+)
+
+urlpatterns.insert(
+    0,
+    re_path(
+        r"uploads/upload/resume/(?P<execution_id>[0-9a-f-]+)$",
+        ExecutionResumeViewSet.as_view({"post": "resume"}),
+        name="importer_execution_resume",
+    ),
+)
@@ -16,12 +16,26 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 #########################################################################
+import hashlib
+import hmac
+import json
 import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import timedelta
 from urllib.parse import urljoin, urlsplit
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils import timezone
 from pathlib import Path
 from geonode.resource.enumerator import ExecutionRequestAction
+from geonode.resource.models import ExecutionRequest
 from django.utils.translation import gettext_lazy as _
 from dynamic_rest.filters import DynamicFilterBackend, DynamicSortingFilter
 from dynamic_rest.viewsets import DynamicModelViewSet
@@ -35,16 +49,42 @@ from geonode.base.api.serializers import ResourceBaseSerializer
 from geonode.base.api.views import ResourceBaseViewSet
 from geonode.base.models import ResourceBase
 from geonode.storage.manager import StorageManager
+from geonode.upload.api.exceptions import (
+    FileUploadLimitException,
+    UploadParallelismLimitException,
+)
 from geonode.upload.api.permissions import UploadPermissionsFilter
 from geonode.upload.utils import UploadLimitValidator
-from importer.api.exception import HandlerException, ImportException
+from importer.api.exception import (
+    HandlerException,
+    ImportException,
+    InvalidInputFileException,
+)
 from importer.api.serializer import ImporterSerializer
-from importer.celery_tasks import import_orchestrator
+from importer.celery_tasks import (
+    dispatch_execution_group,
+    import_orchestrator,
+    stage_upload,
+)
+from importer.metrics import metrics
+from importer.models import ChunkedUpload
 from importer.orchestrator import orchestrator
+from importer.settings import (
+    IMPORTER_BULK_IMPORT_ALLOWED_DIRS,
+    IMPORTER_BULK_IMPORT_MAX_FILES,
+    IMPORTER_CHUNKED_UPLOAD_EXPIRY,
+    IMPORTER_METRICS,
+    IMPORTER_METRICS_TOKEN,
+    IMPORTER_STATUS_POLL_INTERVAL,
+    IMPORTER_STATUS_STREAM,
+    IMPORTER_STATUS_STREAM_TIMEOUT,
+)
+from importer.tracing import tracer
+from importer.utils import DedupePolicy, get_dedupe_params
 from oauth2_provider.contrib.rest_framework import OAuth2Authentication
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
 from rest_framework.parsers import FileUploadParser, MultiPartParser, JSONParser
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from geonode.assets.handlers import asset_handler_registry
 from geonode.assets.local import LocalAssetHandler
@@ -93,15 +133,14 @@ class ImporterViewSet(DynamicModelViewSet):
         It clone on the local repo the file that the user want to upload
         """
         _file = request.FILES.get("base_file") or request.data.get("base_file")
-        execution_id = None
         asset_handler = LocalAssetHandler()
         asset_dir = asset_handler._create_asset_dir()
 
         serializer = self.get_serializer_class()
         data = serializer(data=request.data)
-        storage_manager = None
         # serializer data validation
         data.is_valid(raise_exception=True)
+        dedupe_policy = self._get_dedupe_policy(request.data)
         _data = {
             **data.data.copy(),
             **{
@@ -111,36 +150,139 @@ class ImporterViewSet(DynamicModelViewSet):
         }
 
         if "zip_file" in _data or "kmz_file" in _data:
-            # if a zipfile is provided, we need to unzip it before searching for an handler
-            zipname = Path(_data["base_file"].name).stem
-            storage_manager = StorageManager(
-                remote_files={"base_file": _data.get("zip_file", _data.get("kmz_file"))}
-            )
-            # cloning and unzip the base_file
-            storage_manager.clone_remote_files(
-                cloning_directory=asset_dir, create_tempdir=False
+            # the archive is unzipped by the stage_upload task before
+            # searching for an handler, here is only saved in the staging dir
+            archive_path = self._store_archive(
+                _data.get("zip_file", _data.get("kmz_file")), asset_dir
             )
-            # update the payload with the unziped paths
-            _data.update(
-                {
-                    **{"original_zip_name": zipname},
-                    **storage_manager.get_retrieved_paths(),
-                }
+            params = {
+                key: value
+                for key, value in data.data.items()
+                if key not in request.FILES
+            }
+            if dedupe_policy:
+                params["dedupe_policy"] = dedupe_policy
+            return self._start_staging(
+                request,
+                params,
+                archive_path,
+                zipname=Path(_data["base_file"].name).stem,
+                name=_file.name,
             )
 
         handler = orchestrator.get_handler(_data)
 
         # not file but handler means that is a remote resource
+        if handler:
+            return self._start_import(
+                request,
+                handler,
+                _data,
+                asset_dir,
+                name=_file.name if _file else None,
+                has_file=bool(_file),
+                dedupe_policy=dedupe_policy,
+            )
+
+        raise ImportException(detail="No handlers found for this dataset type")
+
+    @staticmethod
+    def _get_dedupe_policy(params):
+        policy = params.get("dedupe_policy") or None
+        allowed = [_policy.value for _policy in DedupePolicy]
+        if policy is not None and policy not in allowed:
+            raise InvalidInputFileException(
+                detail=f"The dedupe_policy must be one of: {', '.join(allowed)}"
+            )
+        return policy
+
+    @staticmethod
+    def _store_archive(archive, directory):
+        """
+        Save the archive in the staging directory, the archive can be
+        an uploaded file or a path available on the server
+        """
+        if isinstance(archive, str):
+            return shutil.copy(archive, directory)
+        archive_path = os.path.join(directory, os.path.basename(archive.name))
+        with open(archive_path, "wb") as fp:
+            for chunk in archive.chunks():
+                fp.write(chunk)
+        return archive_path
+
+    @staticmethod
+    def _get_staging_payload(archive_path, zipname, params):
+        return {
+            "files": {"base_file": archive_path},
+            "staging": {
+                "archive": archive_path,
+                "original_zip_name": zipname,
+                "params": params,
+            },
+        }
+
+    def _start_staging(
+        self, request, params, archive_path, zipname, name=None, keep_files=False
+    ):
+        """
+        The extraction of the archive, the search of the handler and the
+        asset creation are performed by the stage_upload task.
+        The request only creates the ExecutionRequest with the archive path.
+        The task is sent once the ExecutionRequest is committed
+        """
+        try:
+            UploadLimitValidator(request.user).validate_parallelism_limit_per_user()
+            execution_id = orchestrator.create_execution_request(
+                user=request.user,
+                func_name="stage_upload",
+                step=_("importer.stage_upload"),
+                input_params=self._get_staging_payload(archive_path, zipname, params),
+                action=ExecutionRequestAction.IMPORT.value,
+                name=name,
+                source=params.get("source", "upload"),
+            )
+            transaction.on_commit(lambda: stage_upload.apply_async((str(execution_id),)))
+            return Response(data={"execution_id": execution_id}, status=201)
+        except Exception as e:
+            if not keep_files:
+                shutil.rmtree(os.path.dirname(archive_path), ignore_errors=True)
+            logger.exception(e)
+            raise ImportException(detail=e.args[0] if len(e.args) > 0 else e)
+
+    @tracer.traced("importer.start_import")
+    def _start_import(
+        self,
+        request,
+        handler,
+        _data,
+        asset_dir,
+        name=None,
+        has_file=False,
+        stored_files=None,
+        dedupe_policy=None,
+    ):
+        """
+        Create the asset and the ExecutionRequest, then start the import.
+        stored_files are the files already available in the asset directory
+        (like the ones sent with the chunked upload), they are not cloned again
+        """
         if handler:
             asset = None
             files = []
+            execution_id = None
+            storage_manager = None
             try:
                 # cloning data into a local folder
                 extracted_params, _data = handler.extract_params_from_data(_data)
                 extracted_params.update({"custom": _data.pop("custom", {})})
-                if _file:
+                if stored_files:
+                    asset, files = self._create_asset(request, stored_files, handler)
+                    UploadLimitValidator(
+                        request.user
+                    ).validate_parallelism_limit_per_user()
+                elif has_file:
                     storage_manager, asset, files = self._handle_asset(
-                        request, asset_dir, storage_manager, _data, handler
+                        request, asset_dir, _data, handler
                     )
 
                     self.validate_upload(request, storage_manager)
@@ -159,6 +301,9 @@ class ImporterViewSet(DynamicModelViewSet):
                 if asset:
                     input_params.update(
                         {
+                            **get_dedupe_params(
+                                files, dedupe_policy, compute_hash=False
+                            ),
                             "asset_id": asset.id,
                             "asset_module_path": f"{asset.__module__}.{asset.__class__.__name__}",
                         }
@@ -170,14 +315,15 @@ class ImporterViewSet(DynamicModelViewSet):
                     step=_(next(iter(handler.get_task_list(action=action)))),
                     input_params=input_params,
                     action=action,
-                    name=_file.name if _file else extracted_params.get("title", None),
+                    name=name or extracted_params.get("title", None),
                     source=extracted_params.get("source"),
                 )
 
                 sig = import_orchestrator.s(
                     files, str(execution_id), handler=str(handler), action=action
                 )
-                sig.apply_async()
+                # the worker must find the ExecutionRequest, so the task is sent once committed
+                transaction.on_commit(sig.apply_async)
                 return Response(data={"execution_id": execution_id}, status=201)
             except Exception as e:
                 # in case of any exception, is better to delete the
@@ -194,17 +340,14 @@ class ImporterViewSet(DynamicModelViewSet):
                 logger.exception(e)
                 raise ImportException(detail=e.args[0] if len(e.args) > 0 else e)
 
-        raise ImportException(detail="No handlers found for this dataset type")
-
-    def _handle_asset(self, request, asset_dir, storage_manager, _data, handler):
-        if storage_manager is None:
-            # means that the storage manager is not initialized yet, so
-            # the file is not a zip
-            storage_manager = StorageManager(remote_files=_data)
-            storage_manager.clone_remote_files(
-                cloning_directory=asset_dir, create_tempdir=False
-            )
-            # get filepath
+    def _handle_asset(self, request, asset_dir, _data, handler):
+        # the archives are handled by the stage_upload task, so
+        # only the plain files are cloned here
+        storage_manager = StorageManager(remote_files=_data)
+        storage_manager.clone_remote_files(
+            cloning_directory=asset_dir, create_tempdir=False
+        )
+        # get filepath
         asset, files = self.generate_asset_and_retrieve_paths(
             request, storage_manager, handler
         )
@@ -216,8 +359,12 @@ class ImporterViewSet(DynamicModelViewSet):
         upload_validator.validate_files_sum_of_sizes(storage_manager.data_retriever)
 
     def generate_asset_and_retrieve_paths(self, request, storage_manager, handler):
+        return self._create_asset(
+            request, storage_manager.get_retrieved_paths(), handler
+        )
+
+    def _create_asset(self, request, _files, handler):
         asset_handler = asset_handler_registry.get_default_handler()
-        _files = storage_manager.get_retrieved_paths()
         asset = asset_handler.create(
             title="Original",
             owner=request.user,
@@ -230,6 +377,615 @@ class ImporterViewSet(DynamicModelViewSet):
         return asset, _files
 
 
+class ChunkedUploadViewSet(ImporterViewSet):
+    """
+    Resumable upload of big files. The client initiates the upload declaring
+    the files and their size, sends each file in chunks (PUT with the offset)
+    and finalizes the upload to start the import.
+    The chunks are written directly in the asset directory, so an
+    interrupted upload can be resumed from the last offset received,
+    until IMPORTER_CHUNKED_UPLOAD_EXPIRY seconds are passed
+    """
+
+    permission_classes = [
+        IsAuthenticated,
+        UserHasPerms(
+            perms_dict={
+                "default": {
+                    "POST": ["base.add_resourcebase"],
+                    "PUT": ["base.add_resourcebase"],
+                }
+            }
+        ),
+    ]
+    http_method_names = ["get", "post", "put"]
+    read_size = 1024 * 1024
+
+    def get_upload(self, upload_id, lock=False):
+        queryset = ChunkedUpload.objects.filter(
+            user=self.request.user, last_updated__gte=self._get_expiry_date()
+        )
+        if lock:
+            queryset = queryset.select_for_update()
+        return get_object_or_404(queryset, upload_id=upload_id)
+
+    @staticmethod
+    def _get_expiry_date():
+        return timezone.now() - timedelta(seconds=IMPORTER_CHUNKED_UPLOAD_EXPIRY)
+
+    @classmethod
+    def delete_expired_uploads(cls):
+        """
+        Delete the expired uploads. The files of the uploads not finalized
+        are deleted as well, the other ones belong to the asset of the import
+        """
+        expired = ChunkedUpload.objects.filter(last_updated__lt=cls._get_expiry_date())
+        for upload in expired.filter(exec_id__isnull=True):
+            shutil.rmtree(upload.asset_dir, ignore_errors=True)
+        expired.delete()
+
+    @staticmethod
+    def _upload_status(upload):
+        return {
+            "upload_id": str(upload.upload_id),
+            "files": {
+                key: {"offset": value["offset"], "size": value["size"]}
+                for key, value in upload.files.items()
+            },
+            "execution_id": str(upload.exec_id) if upload.exec_id else None,
+        }
+
+    def initiate(self, request, *args, **kwargs):
+        """
+        Payload expected:
+        {
+            "files": {"base_file": {"name": "file.gpkg", "size": 1024}},
+            ...the other import parameters
+        }
+        """
+        params = request.data.copy()
+        declared = params.pop("files", None)
+        if not isinstance(declared, dict) or "base_file" not in declared:
+            raise ImportException(detail="The base_file must be declared in files")
+        try:
+            sizes = {key: int(value["size"]) for key, value in declared.items()}
+            names = {
+                key: os.path.basename(value["name"]) for key, value in declared.items()
+            }
+        except (KeyError, TypeError, ValueError):
+            raise ImportException(detail="Each file requires a name and its size")
+
+        if any(size < 0 for size in sizes.values()) or not all(names.values()):
+            raise ImportException(detail="Each file requires a name and its size")
+        if any(
+            name in (".", "..") or name != declared[key]["name"]
+            for key, name in names.items()
+        ):
+            raise InvalidInputFileException(detail="The file names cannot contain a path")
+        if len(set(names.values())) != len(names):
+            raise InvalidInputFileException(detail="The file names must be unique")
+
+        self.delete_expired_uploads()
+
+        upload_validator = UploadLimitValidator(request.user)
+        upload_validator.validate_parallelism_limit_per_user()
+        max_size = upload_validator._get_uploads_max_size()
+        if sum(sizes.values()) > max_size:
+            raise FileUploadLimitException(
+                f"Total upload size exceeds {max_size} bytes. "
+                f"Please try again with smaller files."
+            )
+
+        asset_dir = LocalAssetHandler()._create_asset_dir()
+        files = {}
+        for key, name in names.items():
+            path = os.path.join(asset_dir, name)
+            # the empty file is created now, each chunk is written in place
+            open(path, "wb").close()
+            files[key] = {
+                "name": name,
+                "size": sizes[key],
+                "offset": 0,
+                "path": path,
+                "digests": [],
+            }
+
+        upload = ChunkedUpload.objects.create(
+            user=request.user, asset_dir=asset_dir, files=files, params=params
+        )
+        return Response(data=self._upload_status(upload), status=201)
+
+    def status(self, request, upload_id, *args, **kwargs):
+        return Response(data=self._upload_status(self.get_upload(upload_id)))
+
+    def chunk(self, request, upload_id, *args, **kwargs):
+        """
+        Write the request body in the file at the offset provided:
+        PUT .../chunked/<upload_id>?file=base_file&offset=0
+        The optional X-Chunk-Checksum header is the sha256 of the chunk
+        """
+        key = request.query_params.get("file", "base_file")
+        try:
+            offset = int(request.query_params.get("offset", 0))
+        except ValueError:
+            raise ImportException(detail="The offset must be an integer")
+
+        upload = self.get_upload(upload_id)
+        conflict = self._validate_chunk(upload, key, offset)
+        if conflict:
+            return conflict
+
+        # the body is received in a part file without holding the lock of the upload
+        part_path = f"{upload.files[key]['path']}.{uuid.uuid4().hex}.part"
+        try:
+            digest = hashlib.sha256()
+            written = offset
+            stream = request.stream
+            with open(part_path, "wb") as fp:
+                while stream is not None:
+                    data = stream.read(self.read_size)
+                    if not data:
+                        break
+                    written += len(data)
+                    if written > upload.files[key]["size"]:
+                        raise ImportException(
+                            detail=f"The chunk exceeds the size declared for {key}"
+                        )
+                    digest.update(data)
+                    fp.write(data)
+
+            checksum = request.headers.get("X-Chunk-Checksum")
+            if checksum and checksum.lower() != digest.hexdigest():
+                raise ImportException(detail="The checksum of the chunk is not valid")
+
+            with transaction.atomic():
+                # the row lock serializes only the check and the advance of the offset
+                upload = self.get_upload(upload_id, lock=True)
+                conflict = self._validate_chunk(upload, key, offset)
+                if conflict:
+                    return conflict
+                if written > offset:
+                    _file = upload.files[key]
+                    with open(part_path, "rb") as part, open(_file["path"], "r+b") as fp:
+                        fp.seek(offset)
+                        shutil.copyfileobj(part, fp, self.read_size)
+                    _file["offset"] = written
+                    _file["digests"].append(digest.hexdigest())
+                    upload.save(update_fields=["files", "last_updated"])
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+        return Response(data=self._upload_status(upload))
+
+    def _validate_chunk(self, upload, key, offset):
+        """
+        Return the conflict response if the offset is not the one expected
+        """
+        if upload.exec_id:
+            raise ImportException(detail="The upload is already finalized")
+        if key not in upload.files:
+            raise ImportException(detail=f"The file {key} is not declared")
+        if offset != upload.files[key]["offset"]:
+            return Response(data=self._upload_status(upload), status=409)
+        return None
+
+    def finalize(self, request, upload_id, *args, **kwargs):
+        """
+        Start the import of the uploaded files. The checksum
+        is the sha256 of the concatenated sha256 of the chunks
+        """
+        with transaction.atomic():
+            upload = self.get_upload(upload_id, lock=True)
+            if upload.exec_id:
+                return Response(data={"execution_id": upload.exec_id}, status=201)
+
+            incomplete = [
+                key
+                for key, value in upload.files.items()
+                if value["offset"] != value["size"]
+            ]
+            if incomplete:
+                raise ImportException(
+                    detail=f"The upload is not completed for: {', '.join(incomplete)}"
+                )
+
+            checksum = request.data.get("checksum")
+            if checksum and checksum.lower() != self.get_checksum(upload):
+                raise ImportException(detail="The checksum of the upload is not valid")
+
+            response = self._start_upload_import(request, upload)
+            upload.exec_id = response.data["execution_id"]
+            upload.save(update_fields=["exec_id", "last_updated"])
+        return response
+
+    @staticmethod
+    def get_checksum(upload):
+        digest = hashlib.sha256()
+        for key in sorted(upload.files):
+            digest.update("".join(upload.files[key]["digests"]).encode())
+        return digest.hexdigest()
+
+    def _start_upload_import(self, request, upload):
+        paths = {key: value["path"] for key, value in upload.files.items()}
+        _data = {**upload.params, **paths}
+        dedupe_policy = self._get_dedupe_policy(upload.params)
+
+        if "zip_file" in _data or "kmz_file" in _data:
+            return self._start_staging(
+                request,
+                upload.params,
+                _data.get("zip_file", _data.get("kmz_file")),
+                zipname=Path(upload.files["base_file"]["name"]).stem,
+                name=upload.files["base_file"]["name"],
+                # the chunks are kept, so the finalize can be retried
+                keep_files=True,
+            )
+
+        handler = orchestrator.get_handler(_data)
+        if not handler:
+            raise ImportException(detail="No handlers found for this dataset type")
+
+        return self._start_import(
+            request,
+            handler,
+            _data,
+            upload.asset_dir,
+            name=upload.files["base_file"]["name"],
+            stored_files=paths,
+            dedupe_policy=dedupe_policy,
+        )
+
+
+class BulkImporterViewSet(ImporterViewSet):
+    """
+    Import many files with a single request. Each file is imported by its
+    own execution, all grouped under a parent execution which keeps
+    the aggregated progress. Each file of the manifest can be sent with
+    the request or can be a path on the server:
+    {
+        "manifest": [
+            {"base_file": "/data/roads.gpkg"},
+            {"base_file": "parcels.geojson", "overwrite_existing_layer": true}
+        ],
+        ...the params shared by all the files
+    }
+    """
+
+    def bulk(self, request, *args, **kwargs):
+        manifest, shared_params = self._get_manifest(request)
+        self._validate_parallelism_limit(request.user, len(manifest))
+
+        # the handlers are searched before copying any file
+        items = [
+            self._resolve_item(request, index, entry, shared_params)
+            for index, entry in enumerate(manifest)
+        ]
+        try:
+            children = [self._prepare_item(request, item) for item in items]
+            execution_id = orchestrator.create_execution_group(
+                user=request.user, children=children, source="bulk"
+            )
+        except Exception as e:
+            # the assets and the files already cloned are removed
+            for item in items:
+                if item.get("asset"):
+                    try:
+                        item["asset"].delete()
+                    except Exception as _exc:
+                        logger.warning(_exc)
+                if item.get("asset_dir"):
+                    shutil.rmtree(item["asset_dir"], ignore_errors=True)
+            logger.exception(e)
+            raise ImportException(detail=e.args[0] if len(e.args) > 0 else e)
+
+        dispatch_execution_group.apply_async((str(execution_id),))
+        return Response(data={"execution_id": execution_id}, status=201)
+
+    @staticmethod
+    def _get_manifest(request):
+        manifest = request.data.get("manifest")
+        if isinstance(manifest, str):
+            try:
+                manifest = json.loads(manifest)
+            except ValueError:
+                raise InvalidInputFileException(detail="The manifest is not a valid JSON")
+        if (
+            not isinstance(manifest, list)
+            or not manifest
+            or not all(isinstance(entry, dict) for entry in manifest)
+        ):
+            raise InvalidInputFileException(
+                detail="The manifest must be a list of files to import"
+            )
+        if len(manifest) > IMPORTER_BULK_IMPORT_MAX_FILES:
+            raise InvalidInputFileException(
+                detail=f"The manifest cannot contain more than {IMPORTER_BULK_IMPORT_MAX_FILES} files"
+            )
+        shared_params = {
+            key: request.data.get(key)
+            for key in request.data.keys()
+            if key != "manifest" and key not in request.FILES
+        }
+        return manifest, shared_params
+
+    @staticmethod
+    def _validate_parallelism_limit(user, count):
+        """
+        Each file is imported by its own execution, so the limit of the
+        parallel uploads is checked against all the executions to create
+        """
+        validator = UploadLimitValidator(user)
+        max_parallel_uploads = validator._get_max_parallel_uploads()
+        if validator._get_parallel_uploads_count() + count > max_parallel_uploads:
+            raise UploadParallelismLimitException(
+                _(
+                    f"The number of active parallel uploads exceeds {max_parallel_uploads}. Wait for the pending ones to finish."
+                )
+            )
+
+    @staticmethod
+    def _get_server_path(path):
+        """
+        Return the real path of the file, only the files
+        under the IMPORTER_BULK_IMPORT_ALLOWED_DIRS are accepted
+        """
+        real_path = os.path.realpath(str(path))
+        allowed = any(
+            real_path.startswith(os.path.join(os.path.realpath(_dir), ""))
+            for _dir in IMPORTER_BULK_IMPORT_ALLOWED_DIRS
+        )
+        if not allowed or not os.path.isfile(real_path):
+            raise InvalidInputFileException(detail=f"The file {path} is not available")
+        return real_path
+
+    def _resolve_item(self, request, index, entry, shared_params):
+        files, params = {}, {**shared_params}
+        for key, value in entry.items():
+            if not key.endswith("_file"):
+                params[key] = value
+            elif isinstance(value, str) and value in request.FILES:
+                files[key] = request.FILES[value]
+            else:
+                files[key] = self._get_server_path(value)
+        self._get_dedupe_policy(params)
+
+        # the params are validated as the single import does, the files are already checked
+        serializer = orchestrator.get_serializer({**params, **files})
+        data = serializer(data=params, partial=True)
+        data.is_valid(raise_exception=True)
+        params.update(data.validated_data)
+
+        if "base_file" not in files:
+            raise InvalidInputFileException(
+                detail=f"The base_file is missing for the file {index} of the manifest"
+            )
+        handler = None
+        if "zip_file" not in files and "kmz_file" not in files:
+            handler = orchestrator.get_handler({**params, **files})
+            if not handler:
+                raise InvalidInputFileException(
+                    detail=f"No handlers found for the file {index} of the manifest"
+                )
+        return {"files": files, "params": params, "handler": handler}
+
+    def _prepare_item(self, request, item):
+        """
+        Copy the files in the asset dir and return the payload of the execution.
+        The archives are extracted later by the stage_upload task
+        """
+        files, handler = item["files"], item["handler"]
+        base_file = files["base_file"]
+        name = os.path.basename(getattr(base_file, "name", base_file))
+        item["asset_dir"] = LocalAssetHandler()._create_asset_dir()
+        action = ExecutionRequestAction.IMPORT.value
+
+        if handler is None:
+            archive_path = self._store_archive(
+                files.get("zip_file", files.get("kmz_file")), item["asset_dir"]
+            )
+            return {
+                "func_name": "stage_upload",
+                "step": "importer.stage_upload",
+                "input_params": self._get_staging_payload(
+                    archive_path, Path(name).stem, item["params"]
+                ),
+                "action": action,
+                "name": name,
+            }
+
+        extracted_params, _data = handler.extract_params_from_data(
+            {**item["params"], **files}
+        )
+        extracted_params.update({"custom": _data.pop("custom", {})})
+        storage_manager = StorageManager(remote_files=files)
+        storage_manager.clone_remote_files(
+            cloning_directory=item["asset_dir"], create_tempdir=False
+        )
+        UploadLimitValidator(request.user).validate_files_sum_of_sizes(
+            storage_manager.data_retriever
+        )
+        asset, _files = self._create_asset(
+            request, storage_manager.get_retrieved_paths(), handler
+        )
+        item["asset"] = asset
+
+        step = next(iter(handler.get_task_list(action=action)))
+        return {
+            "func_name": step,
+            "step": step,
+            "input_params": {
+                **{"files": _files, "handler_module_path": str(handler)},
+                **extracted_params,
+                **get_dedupe_params(
+                    _files,
+                    self._get_dedupe_policy(item["params"]),
+                    compute_hash=False,
+                ),
+                **{
+                    "asset_id": asset.id,
+                    "asset_module_path": f"{asset.__module__}.{asset.__class__.__name__}",
+                },
+            },
+            "action": action,
+            "name": name,
+        }
+
+
+class ExecutionStatusViewSet(ImporterViewSet):
+    """
+    Push the status of an execution to the clients, instead of letting them poll it.
+    Long-poll: GET .../status/<execution_id>?cursor=<cursor> answers as soon as the
+    execution changes (or after IMPORTER_STATUS_STREAM_TIMEOUT) with the status
+    and the new cursor to use for the next request.
+    With the header "Accept: text/event-stream" each change is sent as a
+    Server-Sent Event, with the cursor as event id, until the execution is completed.
+    The request is kept open only with IMPORTER_STATUS_STREAM, otherwise
+    the long-poll answers immediately and the stream sends only the current status
+    """
+
+    http_method_names = ["get"]
+    final_statuses = (ExecutionRequest.STATUS_FINISHED, ExecutionRequest.STATUS_FAILED)
+
+    def perform_content_negotiation(self, request, force=False):
+        # the event-stream is not a renderer, so the negotiation must not fail
+        return super().perform_content_negotiation(request, force=True)
+
+    def get_execution(self, execution_id):
+        queryset = ExecutionRequest.objects.all()
+        user = self.request.user
+        if not user.is_authenticated:
+            queryset = queryset.none()
+        elif not user.is_superuser:
+            queryset = queryset.filter(user=user)
+        return get_object_or_404(queryset, exec_id=execution_id)
+
+    @staticmethod
+    def _serialize(_exec, cursor):
+        return {
+            "cursor": cursor,
+            "exec_id": str(_exec.exec_id),
+            "name": _exec.name,
+            "status": _exec.status,
+            "step": str(_exec.step) if _exec.step else None,
+            "log": _exec.log,
+            "created": _exec.created,
+            "finished": _exec.finished,
+            "last_updated": _exec.last_updated,
+            "output_params": _exec.output_params,
+        }
+
+    @staticmethod
+    def _get_hold_time():
+        return IMPORTER_STATUS_STREAM_TIMEOUT if IMPORTER_STATUS_STREAM else 0
+
+    @staticmethod
+    def _wait_for_update(execution_id, cursor, timeout):
+        """
+        Wait until the cursor of the execution changes, or the timeout expires.
+        Return the current cursor
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            current = orchestrator.get_execution_cursor(execution_id)
+            if current != cursor or time.monotonic() >= deadline:
+                return current
+            time.sleep(IMPORTER_STATUS_POLL_INTERVAL)
+
+    def status(self, request, execution_id, *args, **kwargs):
+        _exec = self.get_execution(execution_id)
+        if "text/event-stream" in request.headers.get("Accept", ""):
+            return self._stream(execution_id, request.headers.get("Last-Event-ID"))
+
+        cursor = request.query_params.get("cursor")
+        if cursor is not None and _exec.status not in self.final_statuses:
+            self._wait_for_update(execution_id, cursor, self._get_hold_time())
+        # the cursor is read before the execution, so no update can be lost
+        cursor = orchestrator.get_execution_cursor(execution_id)
+        _exec.refresh_from_db()
+        return Response(data=self._serialize(_exec, cursor))
+
+    def _stream(self, execution_id, cursor=None):
+        def events():
+            last = cursor
+            deadline = time.monotonic() + self._get_hold_time()
+            while True:
+                current = self._wait_for_update(
+                    execution_id, last, max(deadline - time.monotonic(), 0)
+                )
+                if current == last:
+                    # the client reconnects sending the last cursor as Last-Event-ID
+                    yield ": timeout\n\n"
+                    return
+                _exec = ExecutionRequest.objects.filter(exec_id=execution_id).first()
+                if _exec is None:
+                    return
+                last = current
+                data = json.dumps(self._serialize(_exec, current), cls=DjangoJSONEncoder)
+                yield f"id: {current}\nevent: status\ndata: {data}\n\n"
+                if _exec.status in self.final_statuses:
+                    return
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class ExecutionResumeViewSet(ExecutionStatusViewSet):
+    """
+    Resume a failed execution from the last step completed by its layers.
+    Only the layers failed for a transient error (with IMPORTER_RESUMABLE)
+    are resumed, reusing the data already loaded and the staged files
+    """
+
+    http_method_names = ["post"]
+
+    def resume(self, request, execution_id, *args, **kwargs):
+        _exec = self.get_execution(execution_id)
+        if _exec.status != ExecutionRequest.STATUS_FAILED:
+            return Response(
+                data={"detail": "Only the failed executions can be resumed"}, status=409
+            )
+        layers = orchestrator.resume_execution(execution_id)
+        if not layers:
+            return Response(
+                data={"detail": "The execution has no layers to resume"}, status=409
+            )
+        return Response(data={"execution_id": execution_id, "layers": layers})
+
+
+class MetricsViewSet(ImporterViewSet):
+    """
+    Expose the metrics of the importer in the Prometheus text format.
+    Available to the superusers or, for the scrapers, with the header
+    "Authorization: Bearer <IMPORTER_METRICS_TOKEN>"
+    """
+
+    http_method_names = ["get"]
+    permission_classes = []
+
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
+    def has_access(self, request):
+        if request.user.is_superuser:
+            return True
+        authorization = request.headers.get("Authorization", "")
+        return bool(IMPORTER_METRICS_TOKEN) and hmac.compare_digest(
+            authorization.encode(), f"Bearer {IMPORTER_METRICS_TOKEN}".encode()
+        )
+
+    def metrics(self, request, *args, **kwargs):
+        if not IMPORTER_METRICS:
+            return Response(status=404)
+        if not self.has_access(request):
+            return Response(status=403)
+        return HttpResponse(
+            metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+
 class ResourceImporter(DynamicModelViewSet):
     authentication_classes = [
         SessionAuthentication,
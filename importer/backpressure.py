@@ -0,0 +1,196 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from celery.utils.time import rate
+from django.core.cache import caches
+
+from importer.celery_app import importer_app
+from importer.metrics import metrics
+from importer.tracing import tracer
+from importer.settings import (
+    IMPORTER_BACKPRESSURE,
+    IMPORTER_BACKPRESSURE_CACHE,
+    IMPORTER_BACKPRESSURE_MAX_ERROR_RATE,
+    IMPORTER_BACKPRESSURE_MAX_LATENCY,
+    IMPORTER_BACKPRESSURE_WINDOW,
+    IMPORTER_CIRCUIT_BREAKER_TIMEOUT,
+    IMPORTER_GLOBAL_RATE_LIMIT,
+    IMPORTER_PUBLISHING_RATE_LIMIT,
+    IMPORTER_RESOURCE_CREATION_RATE_LIMIT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceController:
+    """
+    Adaptive backpressure for an external service (GeoServer, the datastore).
+    The latency and the errors of the calls are collected in windows of
+    IMPORTER_BACKPRESSURE_WINDOW seconds, shared by all the workers through the cache.
+    At the end of each window the rate limit of the tasks using the service
+    is scaled: increased step by step while the service is healthy, halved
+    when it is slow or failing. With the circuit breaker, if the error rate
+    reaches IMPORTER_BACKPRESSURE_MAX_ERROR_RATE the service is paused for
+    IMPORTER_CIRCUIT_BREAKER_TIMEOUT seconds
+    """
+
+    # min number of calls in a window to evaluate the health of the service
+    MIN_CALLS = 5
+    # range and additive step of the factor applied to the configured rate limits
+    MIN_FACTOR = 0.1
+    MAX_FACTOR = 4
+    FACTOR_STEP = 0.25
+
+    def __init__(
+        self,
+        service,
+        tasks: dict,
+        max_latency=None,
+        circuit_breaker=False,
+        error_markers=None,
+    ) -> None:
+        self.service = service
+        self.tasks = tasks
+        self.max_latency = max_latency
+        self.circuit_breaker = circuit_breaker
+        # if provided, only the errors with one of the markers are caused by the service
+        self.error_markers = error_markers
+
+    @property
+    def cache(self):
+        return caches[IMPORTER_BACKPRESSURE_CACHE]
+
+    def _key(self, name):
+        return f"importer:backpressure:{self.service}:{name}"
+
+    def is_service_error(self, exc) -> bool:
+        if self.error_markers is None:
+            return True
+        message = str(exc).lower()
+        return any(marker in message for marker in self.error_markers)
+
+    @contextmanager
+    def measure(self, calls=1):
+        """
+        Record the latency of the calls performed in the block
+        and if they raised an error caused by the service
+        """
+        start = time.monotonic()
+        try:
+            with tracer.span(self.service, calls=calls):
+                yield
+        except Exception as e:
+            self.record(time.monotonic() - start, error=self.is_service_error(e), calls=calls)
+            raise
+        self.record(time.monotonic() - start, calls=calls)
+
+    def record(self, elapsed, error=False, calls=1):
+        metrics.observe(
+            "importer_service_call_duration_seconds",
+            elapsed / max(calls, 1),
+            count=calls,
+            service=self.service,
+            status="failure" if error else "success",
+        )
+        if not IMPORTER_BACKPRESSURE:
+            return
+        window = int(time.time() // IMPORTER_BACKPRESSURE_WINDOW)
+        timeout = IMPORTER_BACKPRESSURE_WINDOW * 3
+        try:
+            for name, value in (
+                ("calls", calls),
+                ("errors", calls if error else 0),
+                ("latency", int(elapsed * 1000)),
+            ):
+                key = self._key(f"{window}:{name}")
+                self.cache.add(key, 0, timeout=timeout)
+                if value:
+                    self.cache.incr(key, value)
+            # the first call of a window evaluates the previous one
+            if self.cache.add(self._key(f"{window - 1}:evaluated"), 1, timeout=timeout):
+                self.evaluate(window - 1)
+        except Exception as e:
+            logger.warning(f"Cannot record the health of {self.service}: {e}")
+
+    def evaluate(self, window):
+        calls = self.cache.get(self._key(f"{window}:calls"), 0)
+        if calls < self.MIN_CALLS:
+            return
+        error_rate = self.cache.get(self._key(f"{window}:errors"), 0) / calls
+        latency = self.cache.get(self._key(f"{window}:latency"), 0) / calls / 1000
+        factor = self.get_factor()
+        if error_rate >= IMPORTER_BACKPRESSURE_MAX_ERROR_RATE:
+            factor = factor / 2
+            if self.circuit_breaker:
+                self.open_circuit()
+        elif error_rate or (self.max_latency and latency > self.max_latency):
+            factor = factor / 2
+        else:
+            factor = factor + self.FACTOR_STEP
+        logger.info(
+            f"Health of {self.service}: {calls} calls, error rate {error_rate:.2f}, latency {latency:.2f}s"
+        )
+        self.set_factor(min(max(factor, self.MIN_FACTOR), self.MAX_FACTOR))
+
+    def get_factor(self) -> float:
+        return self.cache.get(self._key("factor"), 1)
+
+    def set_factor(self, factor):
+        if factor == self.get_factor():
+            return
+        self.cache.set(self._key("factor"), factor, timeout=None)
+        # the new rate limits are applied by all the workers
+        for task_name, base_rate in self.tasks.items():
+            new_rate = f"{round(rate(base_rate) * factor * 60, 2)}/m"
+            logger.info(f"Rate limit of {task_name} set to {new_rate}")
+            importer_app.control.rate_limit(task_name, new_rate)
+
+    def open_circuit(self):
+        logger.warning(
+            f"{self.service} is not healthy, paused for {IMPORTER_CIRCUIT_BREAKER_TIMEOUT} seconds"
+        )
+        self.cache.set(
+            self._key("open_until"),
+            time.time() + IMPORTER_CIRCUIT_BREAKER_TIMEOUT,
+            timeout=IMPORTER_CIRCUIT_BREAKER_TIMEOUT,
+        )
+
+    def retry_after(self) -> int:
+        """
+        Seconds for which the service is paused, 0 if the circuit is closed
+        """
+        if not IMPORTER_BACKPRESSURE or not self.circuit_breaker:
+            return 0
+        try:
+            open_until = self.cache.get(self._key("open_until"), 0)
+        except Exception as e:
+            logger.warning(f"Cannot read the health of {self.service}: {e}")
+            return 0
+        return max(int(open_until - time.time()) + 1, 0) if open_until else 0
+
+
+geoserver_controller = ServiceController(
+    "geoserver",
+    tasks={
+        "importer.publish_resource": IMPORTER_PUBLISHING_RATE_LIMIT,
+        "importer.publish_resources_batch": IMPORTER_PUBLISHING_RATE_LIMIT,
+        "importer.create_geonode_resource": IMPORTER_RESOURCE_CREATION_RATE_LIMIT,
+    },
+    max_latency=IMPORTER_BACKPRESSURE_MAX_LATENCY,
+    circuit_breaker=True,
+)
+
+# the ogr2ogr errors are mostly caused by the data, only the
+# connection errors are considered for the health of the datastore
+datastore_controller = ServiceController(
+    "datastore",
+    tasks={"importer.import_orchestrator": IMPORTER_GLOBAL_RATE_LIMIT},
+    error_markers=(
+        "could not connect",
+        "connection",
+        "timeout",
+        "too many clients",
+        "terminating",
+    ),
+)
@@ -1,16 +1,24 @@
 import logging
 import os
+import shutil
 from typing import Optional
 
-from celery import Task
+from celery.exceptions import Retry
+from celery.signals import before_task_publish, task_postrun, task_prerun
 from django.db import connections, transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.module_loading import import_string
 from django.utils.translation import gettext_lazy
 from dynamic_models.exceptions import DynamicModelError, InvalidFieldNameError
 from dynamic_models.models import FieldSchema, ModelSchema
+from geonode.assets.handlers import asset_handler_registry
+from geonode.assets.local import LocalAssetHandler
 from geonode.base.models import ResourceBase
 from geonode.resource.enumerator import ExecutionRequestAction as exa
+from geonode.resource.models import ExecutionRequest
+from geonode.storage.manager import StorageManager
+from geonode.upload.utils import UploadLimitValidator
 from importer.api.exception import (
     CopyResourceException,
     InvalidInputFileException,
@@ -27,19 +35,33 @@ from importer.handlers.utils import (
     evaluate_error,
     get_uuid,
 )
-from importer.orchestrator import orchestrator
-from importer.publisher import DataPublisher
+from importer.backpressure import geoserver_controller
+from importer.idempotency import IdempotentTask, is_redelivered
+from importer.metrics import metrics, step_timer
+from importer.orchestrator import execution_map, orchestrator
+from importer.publisher import DataPublisher, catalog_cache
 from importer.settings import (
+    IMPORTER_BATCH_PUBLISHING,
+    IMPORTER_CIRCUIT_BREAKER_MAX_RETRIES,
+    IMPORTER_FUSED_STEPS,
     IMPORTER_GLOBAL_RATE_LIMIT,
+    IMPORTER_METRICS,
     IMPORTER_PUBLISHING_RATE_LIMIT,
     IMPORTER_RESOURCE_CREATION_RATE_LIMIT,
 )
-from importer.utils import call_rollback_function, error_handler, find_key_recursively
+from importer.utils import (
+    call_rollback_function,
+    error_handler,
+    find_key_recursively,
+    flatten_kwargs,
+    get_dedupe_params,
+)
+from importer.tracing import SENT_AT_HEADER, TRACEPARENT_HEADER, tracer
 
 logger = logging.getLogger(__name__)
 
 
-class ErrorBaseTaskClass(Task):
+class ErrorBaseTaskClass(IdempotentTask):
     """
     Basic Error task class. Is common to all the base tasks of the import pahse
     it defines a on_failure method which set the task as "failed" with some extra information
@@ -55,6 +77,109 @@ class ErrorBaseTaskClass(Task):
         evaluate_error(self, exc, task_id, args, kwargs, einfo)
 
 
+@before_task_publish.connect
+def inject_trace_context(sender=None, headers=None, **extra):
+    """
+    The trace context is sent with the importer tasks, so the
+    steps of an execution are collected in the same trace
+    """
+    if headers is None or not str(sender).startswith("importer."):
+        return
+    tracer.inject(headers)
+
+
+@task_prerun.connect
+def start_task_span(sender=None, task_id=None, **extra):
+    if sender is None or not sender.name.startswith("importer."):
+        return
+    traceparent = getattr(sender.request, TRACEPARENT_HEADER, None)
+    sent_at = getattr(sender.request, SENT_AT_HEADER, None)
+    span = tracer.start_span(
+        sender.name,
+        traceparent=traceparent,
+        key=task_id,
+        task_id=task_id,
+        queue=(sender.request.delivery_info or {}).get("routing_key"),
+    )
+    if span is not None and sent_at:
+        # the time between the publishing and the execution of the task
+        tracer.add_span(
+            f"queue {sender.name}",
+            span.trace_id,
+            span.parent_id,
+            start=int(sent_at),
+            end=span.start,
+            task_id=task_id,
+        )
+        span.attributes["queue.wait_ms"] = (span.start - int(sent_at)) // 1_000_000
+
+
+@task_postrun.connect
+def end_task_span(sender=None, task_id=None, retval=None, state=None, **extra):
+    tracer.end_span(key=task_id, error=retval if state == "FAILURE" else None)
+
+
+@task_prerun.connect
+def register_execution_task(sender=None, task_id=None, args=None, kwargs=None, **extra):
+    """
+    Before running any importer task, the task is added to the
+    ledger of the execution which is used to evaluate its progress
+    """
+    if sender is None or not sender.name.startswith("importer."):
+        return
+    execution_map.begin(task_id)
+    catalog_cache.begin(task_id)
+    if IMPORTER_METRICS:
+        step_timer.start(task_id)
+    exec_id = get_uuid(args or []) or get_uuid((kwargs or {}).values())
+    if exec_id is None:
+        return
+    try:
+        orchestrator.register_execution_task(exec_id, task_id, task_name=sender.name)
+    except Exception as e:
+        logger.warning(f"Cannot register the task {task_id} for execution {exec_id}: {e}")
+
+
+@task_postrun.connect
+def release_execution_map(sender=None, task_id=None, **extra):
+    """
+    The ExecutionRequest and the GeoServer lookups loaded by the task
+    are released once it is completed
+    """
+    execution_map.end(task_id)
+    catalog_cache.end(task_id)
+
+
+@task_postrun.connect
+def record_execution_step(
+    sender=None, task_id=None, args=None, kwargs=None, state=None, **extra
+):
+    """
+    Save the duration and the DB queries of the task in the timeline
+    of the execution and in the aggregated metrics, only with IMPORTER_METRICS
+    """
+    step = step_timer.stop(task_id)
+    if step is None or not IMPORTER_METRICS:
+        return
+    status = (state or "unknown").lower()
+    metrics.observe(
+        "importer_task_duration_seconds",
+        step["duration"],
+        task=sender.name,
+        status=status,
+    )
+    metrics.inc("importer_task_db_queries_total", step["queries"], task=sender.name)
+    exec_id = get_uuid(args or []) or get_uuid((kwargs or {}).values())
+    if exec_id is None:
+        return
+    try:
+        orchestrator.merge_execution_request_output_params(
+            exec_id, "timeline", {task_id: {"task": sender.name, "status": status, **step}}
+        )
+    except Exception as e:
+        logger.warning(f"Cannot save the timeline of the execution {exec_id}: {e}")
+
+
 @importer_app.task(
     bind=True,
     base=ErrorBaseTaskClass,
@@ -98,13 +223,175 @@ def import_orchestrator(
             alternate=alternate,
             handler_module_path=handler,
             action=action,
-            kwargs=kwargs,
+            kwargs=flatten_kwargs(kwargs),
         )
 
     except Exception as e:
         raise StartImportException(detail=error_handler(e, execution_id))
 
 
+def call_next_step(task_params, kwargs=None):
+    """
+    Call the import_orchestrator to proceed with the next step of the layer.
+    With IMPORTER_FUSED_STEPS the orchestrator runs in the current worker
+    instead of doing a round-trip through its queue
+    """
+    if IMPORTER_FUSED_STEPS:
+        return import_orchestrator.apply(task_params, kwargs)
+    return import_orchestrator.apply_async(task_params, kwargs)
+
+
+@importer_app.task(
+    bind=True,
+    name="importer.stage_upload",
+    queue="importer.stage_upload",
+    max_retries=1,
+    rate_limit=IMPORTER_GLOBAL_RATE_LIMIT,
+    ignore_result=False,
+    task_track_started=True,
+)
+def stage_upload(self, execution_id: str, /, **kwargs):
+    """
+    Task to prepare the archives (zip/kmz) sent with the upload.
+    The archive is extracted in the asset directory, the handler is searched
+    between the extracted files and the asset is created. Once done
+    the import is started as for the other uploads.
+    NOTE: the handler is not known yet, so the errors are handled here
+
+            Parameters:
+                    execution_id (UUID): unique ID used to keep track of the execution request
+            Returns:
+                    None
+    """
+    storage_manager = None
+    asset = None
+    staging_dir = None
+    try:
+        orchestrator.update_execution_request_status(
+            execution_id=execution_id,
+            last_updated=timezone.now(),
+            func_name="stage_upload",
+            step=gettext_lazy("importer.stage_upload"),
+        )
+        _exec = orchestrator.get_execution_object(execution_id)
+        staging = _exec.input_params["staging"]
+        staging_dir = os.path.dirname(staging["archive"])
+
+        # cloning and unzip the archive
+        storage_manager = StorageManager(remote_files={"base_file": staging["archive"]})
+        storage_manager.clone_remote_files(
+            cloning_directory=LocalAssetHandler()._create_asset_dir(),
+            create_tempdir=False,
+        )
+        files = storage_manager.get_retrieved_paths()
+        _data = {
+            **staging["params"],
+            **{"original_zip_name": staging["original_zip_name"]},
+            **files,
+        }
+
+        handler = orchestrator.get_handler(_data)
+        if not handler:
+            raise InvalidInputFileException(
+                detail="No handlers found for this dataset type"
+            )
+
+        extracted_params, _data = handler.extract_params_from_data(_data)
+        extracted_params.update({"custom": _data.pop("custom", {})})
+
+        UploadLimitValidator(_exec.user).validate_files_sum_of_sizes(
+            storage_manager.data_retriever
+        )
+
+        asset = asset_handler_registry.get_default_handler().create(
+            title="Original",
+            owner=_exec.user,
+            description=None,
+            type=handler.id,
+            files=list(set(files.values())),
+            clone_files=False,
+        )
+
+        action = exa.IMPORT.value
+        step = next(iter(handler.get_task_list(action=action)))
+        orchestrator.update_execution_request_status(
+            execution_id=execution_id,
+            last_updated=timezone.now(),
+            func_name=step,
+            step=gettext_lazy(step),
+            source=extracted_params.get("source"),
+            input_params={
+                **{"files": files, "handler_module_path": str(handler)},
+                **extracted_params,
+                **get_dedupe_params(files, staging["params"].get("dedupe_policy")),
+                **{
+                    "asset_id": asset.id,
+                    "asset_module_path": f"{asset.__module__}.{asset.__class__.__name__}",
+                },
+            },
+        )
+    except Exception as e:
+        if asset:
+            try:
+                asset.delete()
+            except Exception as _exc:
+                logger.warning(_exc)
+        elif storage_manager is not None:
+            storage_manager.delete_retrieved_paths(force=True)
+        orchestrator.set_as_failed(execution_id, reason=error_handler(e, execution_id))
+        raise InvalidInputFileException(detail=error_handler(e, execution_id))
+    finally:
+        if staging_dir:
+            # the archive is no more needed once extracted
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    import_orchestrator.s(
+        files, str(execution_id), handler=str(handler), action=action
+    ).apply_async()
+
+    return self.name, execution_id
+
+
+@importer_app.task(
+    bind=True,
+    name="importer.dispatch_execution_group",
+    queue="importer.import_orchestrator",
+    max_retries=1,
+    ignore_result=False,
+    task_track_started=True,
+)
+def dispatch_execution_group(self, execution_id: str, /, **kwargs):
+    """
+    Task to start the children of a bulk import. The API sends only this
+    message, all the children are dispatched from here on the same
+    broker connection
+
+            Parameters:
+                    execution_id (UUID): unique ID of the parent execution
+            Returns:
+                    None
+    """
+    _exec = orchestrator.get_execution_object(execution_id)
+    children = ExecutionRequest.objects.filter(
+        exec_id__in=_exec.input_params.get("children", [])
+    )
+    with importer_app.producer_or_acquire() as producer:
+        for child in children.iterator():
+            if "staging" in child.input_params:
+                stage_upload.apply_async((str(child.exec_id),), producer=producer)
+                continue
+            import_orchestrator.apply_async(
+                (child.input_params.get("files"), str(child.exec_id)),
+                {
+                    "handler": child.input_params.get("handler_module_path"),
+                    "action": child.action,
+                },
+                producer=producer,
+            )
+
+    return self.name, execution_id
+
+
 @importer_app.task(
     bind=True,
     # base=ErrorBaseTaskClass,
@@ -134,7 +421,6 @@ def import_resource(self, execution_id, /, handler_module_path, action, **kwargs
             last_updated=timezone.now(),
             func_name="import_resource",
             step=gettext_lazy("importer.import_resource"),
-            celery_task_request=self.request,
         )
         _exec = orchestrator.get_execution_object(execution_id)
 
@@ -176,6 +462,7 @@ def import_resource(self, execution_id, /, handler_module_path, action, **kwargs
     bind=True,
     base=ErrorBaseTaskClass,
     name="importer.publish_resource",
+    idempotent=True,
     queue="importer.publish_resource",
     max_retries=3,
     rate_limit=IMPORTER_PUBLISHING_RATE_LIMIT,
@@ -206,8 +493,10 @@ def publish_resource(
             Returns:
                     None
     """
-    # Updating status to running
     try:
+        # the task is retried before starting if GeoServer is paused
+        wait_for_geoserver(self)
+        # Updating status to running
         kwargs = kwargs.get("kwargs") if "kwargs" in kwargs else kwargs
 
         orchestrator.update_execution_request_status(
@@ -215,7 +504,6 @@ def publish_resource(
             last_updated=timezone.now(),
             func_name="publish_resource",
             step=gettext_lazy("importer.publish_resource"),
-            celery_task_request=self.request,
         )
         _exec = orchestrator.get_execution_object(execution_id)
         _files = _exec.input_params.get("files")
@@ -225,9 +513,28 @@ def publish_resource(
 
         # extracting the crs and the resource name, are needed for publish the resource
         data = _publisher.extract_resource_to_publish(
-            _files, action, layer_name, alternate, **kwargs
+            _files, action, layer_name, alternate, execution_id=execution_id, **kwargs
         )
-        if data:
+        if data and is_batch_publishing(execution_id, _overwrite):
+            # the layer is published together with the other layers of the execution
+            # the last collected layer, schedule the publishing of the whole batch
+            batch = orchestrator.add_to_publishing_batch(
+                execution_id,
+                alternate,
+                {
+                    "resources": data,
+                    "step_name": step_name,
+                    "layer_name": layer_name,
+                    "action": action,
+                    "kwargs": kwargs,
+                },
+            )
+            if batch:
+                publish_resources_batch.apply_async(
+                    (execution_id,), {"handler_module_path": handler_module_path}
+                )
+            return self.name, execution_id
+        elif data:
             # we should not publish resource without a crs
             if not _overwrite or (
                 _overwrite and not _publisher.get_resource(alternate)
@@ -240,7 +547,6 @@ def publish_resource(
             orchestrator.update_execution_request_status(
                 execution_id=execution_id,
                 last_updated=timezone.now(),
-                celery_task_request=self.request,
             )
         else:
             logger.error(
@@ -264,10 +570,12 @@ def publish_resource(
         # for some reason celery will always put the kwargs into a key kwargs
         # so we need to remove it
 
-        import_orchestrator.apply_async(task_params, kwargs)
+        call_next_step(task_params, kwargs)
 
         return self.name, execution_id
 
+    except Retry:
+        raise
     except Exception as e:
         call_rollback_function(
             execution_id,
@@ -281,10 +589,111 @@ def publish_resource(
         raise PublishResourceException(detail=error_handler(e, execution_id))
 
 
+def wait_for_geoserver(task):
+    """
+    If the circuit breaker paused GeoServer, the publishing task is
+    retried once the pause ends instead of failing and rolling back the layer.
+    Once the retries are exhausted, MaxRetriesExceededError fails the task
+    and the layer is rolled back like for the other errors
+    """
+    retry_after = geoserver_controller.retry_after()
+    if retry_after:
+        logger.warning(f"GeoServer is paused, {task.name} retried in {retry_after} seconds")
+        raise task.retry(
+            countdown=retry_after, max_retries=IMPORTER_CIRCUIT_BREAKER_MAX_RETRIES
+        )
+
+
+def is_batch_publishing(execution_id, overwrite=False):
+    """
+    The layers are published in batch only for new multi-layer imports
+    """
+    if not IMPORTER_BATCH_PUBLISHING or overwrite:
+        return False
+    progress, _ = orchestrator.get_execution_progress(execution_id)
+    return progress.expected_layers > 1
+
+
+@importer_app.task(
+    bind=True,
+    base=ErrorBaseTaskClass,
+    name="importer.publish_resources_batch",
+    queue="importer.publish_resource",
+    max_retries=1,
+    rate_limit=IMPORTER_PUBLISHING_RATE_LIMIT,
+    ignore_result=False,
+    task_track_started=True,
+)
+def publish_resources_batch(
+    self,
+    execution_id: str,
+    /,
+    handler_module_path: str = None,
+    **kwargs,
+):
+    """
+    Task to publish in geoserver all the layers of an execution at once.
+    The layers are collected by the publish_resource task, once published
+    each layer continue with its next step
+
+            Parameters:
+                    execution_id (UUID): unique ID used to keep track of the execution request
+                    handler_module_path (str): the handler of the execution
+            Returns:
+                    None
+    """
+    _exec = orchestrator.get_execution_object(execution_id)
+    layers = _exec.output_params.get("publishing", {}).get("layers", {})
+    try:
+        wait_for_geoserver(self)
+        orchestrator.update_execution_request_status(
+            execution_id=execution_id,
+            last_updated=timezone.now(),
+            func_name="publish_resources_batch",
+            step=gettext_lazy("importer.publish_resource"),
+        )
+        _publisher = DataPublisher(handler_module_path)
+        _publisher.publish_resources(
+            [res for layer in layers.values() for res in layer["resources"]]
+        )
+    except Retry:
+        raise
+    except Exception as e:
+        for alternate, layer in layers.items():
+            call_rollback_function(
+                execution_id,
+                handlers_module_path=handler_module_path,
+                prev_action=layer["action"],
+                layer=layer["layer_name"],
+                alternate=alternate,
+                error=e,
+                **layer["kwargs"],
+            )
+        orchestrator.set_as_failed(execution_id, reason=str(e))
+        raise PublishResourceException(detail=error_handler(e, execution_id))
+
+    for alternate, layer in layers.items():
+        import_orchestrator.apply_async(
+            (
+                {},
+                execution_id,
+                handler_module_path,
+                layer["step_name"],
+                layer["layer_name"],
+                alternate,
+                layer["action"],
+            ),
+            layer["kwargs"],
+        )
+
+    return self.name, execution_id
+
+
 @importer_app.task(
     bind=True,
     base=ErrorBaseTaskClass,
     name="importer.create_geonode_resource",
+    idempotent=True,
     queue="importer.create_geonode_resource",
     max_retries=1,
     rate_limit=IMPORTER_RESOURCE_CREATION_RATE_LIMIT,
@@ -323,7 +732,6 @@ def create_geonode_resource(
             last_updated=timezone.now(),
             func_name="create_geonode_resource",
             step=gettext_lazy("importer.create_geonode_resource"),
-            celery_task_request=self.request,
         )
         _exec = orchestrator.get_execution_object(execution_id)
 
@@ -344,7 +752,17 @@ def create_geonode_resource(
         _overwrite = _exec.input_params.get("overwrite_existing_layer")
         _custom = _exec.input_params.get("custom")
 
-        if _overwrite:
+        resource = None
+        if not _overwrite and is_redelivered(self):
+            # the interrupted delivery could have already created the resource
+            resource = ResourceBase.objects.filter(
+                Q(alternate=alternate) | Q(alternate__endswith=f":{alternate}"),
+                resourcehandlerinfo__execution_request=_exec,
+            ).first()
+        reused = resource is not None
+        if reused:
+            logger.warning(f"The resource {alternate} is already created, reusing it")
+        elif _overwrite:
             resource = handler.overwrite_geonode_resource(
                 layer_name=layer_name,
                 alternate=alternate,
@@ -365,7 +783,7 @@ def create_geonode_resource(
             handler.overwrite_resourcehandlerinfo(
                 handler_module_path, resource, _exec, **kwargs
             )
-        else:
+        elif not reused:
             handler.create_resourcehandlerinfo(
                 handler_module_path, resource, _exec, **kwargs
             )
@@ -374,9 +792,9 @@ def create_geonode_resource(
         orchestrator.update_execution_request_obj(_exec, {"geonode_resource": resource})
 
         # at the end recall the import_orchestrator for the next step
-        import_orchestrator.apply_async(
+        call_next_step(
             (
-                _files,
+                {},
                 execution_id,
                 handler_module_path,
                 step_name,
@@ -403,6 +821,7 @@ def create_geonode_resource(
 @importer_app.task(
     base=ErrorBaseTaskClass,
     name="importer.copy_geonode_resource",
+    idempotent=True,
     queue="importer.copy_geonode_resource",
     max_retries=1,
     rate_limit=IMPORTER_RESOURCE_CREATION_RATE_LIMIT,
@@ -424,7 +843,6 @@ def copy_geonode_resource(
     )
     original_dataset_alternate = kwargs.get("kwargs").get("original_dataset_alternate")
     new_alternate = kwargs.get("kwargs").get("new_dataset_alternate")
-    from importer.celery_tasks import import_orchestrator
 
     try:
         resource = ResourceBase.objects.filter(alternate=original_dataset_alternate)
@@ -443,6 +861,9 @@ def copy_geonode_resource(
 
         if _exec.input_params.get("title"):
             data_to_update["title"] = _exec.input_params.get("title")
+        elif (_exec.output_params or {}).get("dedupe"):
+            # the dedupe copies of a multi-layer dataset keep the title of their original layer
+            data_to_update["title"] = resource.title
 
         handler = import_string(handler_module_path)()
 
@@ -482,7 +903,7 @@ def copy_geonode_resource(
         # so we need to remove it
         kwargs = kwargs.get("kwargs") if "kwargs" in kwargs else kwargs
 
-        import_orchestrator.apply_async(task_params, kwargs)
+        call_next_step(task_params, kwargs)
 
     except Exception as e:
         call_rollback_function(
@@ -583,6 +1004,7 @@ def create_dynamic_structure(
 @importer_app.task(
     base=ErrorBaseTaskClass,
     name="importer.copy_dynamic_model",
+    idempotent=True,
     queue="importer.copy_dynamic_model",
     task_track_started=True,
 )
@@ -593,8 +1015,6 @@ def copy_dynamic_model(
     Once the base resource is copied, is time to copy also the dynamic model
     """
 
-    from importer.celery_tasks import import_orchestrator
-
     try:
         orchestrator.update_execution_request_status(
             execution_id=exec_id,
@@ -651,7 +1071,7 @@ def copy_dynamic_model(
             action,
         )
 
-        import_orchestrator.apply_async(task_params, additional_kwargs)
+        call_next_step(task_params, additional_kwargs)
 
     except Exception as e:
         call_rollback_function(
@@ -670,6 +1090,7 @@ def copy_dynamic_model(
 @importer_app.task(
     base=ErrorBaseTaskClass,
     name="importer.copy_geonode_data_table",
+    idempotent=True,
     queue="importer.copy_geonode_data_table",
     task_track_started=True,
 )
@@ -693,8 +1114,6 @@ def copy_geonode_data_table(
 
         new_dataset_alternate = kwargs.get("kwargs").get("new_dataset_alternate")
 
-        from importer.celery_tasks import import_orchestrator
-
         db_name = os.getenv("DEFAULT_BACKEND_DATASTORE", "datastore")
         if os.getenv("IMPORTER_ENABLE_DYN_MODELS", False):
             schema_exists = ModelSchema.objects.filter(
@@ -705,8 +1124,9 @@ def copy_geonode_data_table(
 
         with transaction.atomic():
             with connections[db_name].cursor() as cursor:
+                # the table is created with its data at once, so if it exists is complete
                 cursor.execute(
-                    f'CREATE TABLE {new_dataset_alternate} AS TABLE "{original_dataset_alternate}";'
+                    f'CREATE TABLE IF NOT EXISTS {new_dataset_alternate} AS TABLE "{original_dataset_alternate}";'
                 )
 
         task_params = (
@@ -721,7 +1141,7 @@ def copy_geonode_data_table(
 
         kwargs = kwargs.get("kwargs") if "kwargs" in kwargs else kwargs
 
-        import_orchestrator.apply_async(task_params, kwargs)
+        call_next_step(task_params, kwargs)
 
     except Exception as e:
         call_rollback_function(
@@ -765,7 +1185,6 @@ def rollback(self, *args, **kwargs):
         last_updated=timezone.now(),
         func_name="rollback",
         step=gettext_lazy("importer.rollback"),
-        celery_task_request=self.request,
     )
 
     handler = import_string(handler_module_path)()
@@ -1,19 +1,104 @@
 from abc import ABC
+import codecs
 import logging
+import os
 from typing import List
 
 from geonode.resource.enumerator import ExecutionRequestAction as exa
 from geonode.layers.models import Dataset
 from importer.api.exception import ImportException
 from importer.utils import ImporterRequestAction as ira, find_key_recursively
-from django_celery_results.models import TaskResult
-from django.db.models import Q
 from geonode.resource.models import ExecutionRequest
 from geonode.base.models import ResourceBase
 
 
 logger = logging.getLogger(__name__)
 
+# bytes read from the file to evaluate the MAGIC_BYTES of the handlers
+HEADER_SIZE = 512
+
+
+def get_file_extension(_file):
+    name = _file if isinstance(_file, str) else getattr(_file, "name", None) or ""
+    name = os.path.basename(name)
+    return name.split(".")[-1].lower() if "." in name else None
+
+
+def read_file_header(_file, size=HEADER_SIZE):
+    """
+    Return the first bytes of the file path or of the uploaded file.
+    None if the file cannot be read, like for the paths not available yet
+    """
+    try:
+        if isinstance(_file, str):
+            if not os.path.isfile(_file):
+                return None
+            with open(_file, "rb") as fp:
+                return fp.read(size)
+        position = _file.tell()
+        header = _file.read(size)
+        _file.seek(position)
+        return header if isinstance(header, bytes) else header.encode()
+    except Exception:
+        return None
+
+
+class HandlerIndex:
+    """
+    Dispatch index of the registered handlers, built at registration time
+    from their supported_file_extension_config. Only the handlers which
+    declare the extension of the base_file are consulted, plus the ones
+    without any extension (like the remote handlers)
+    """
+
+    def __init__(self) -> None:
+        self.handlers = []
+        self.by_id = {}
+        self.by_ext = {}
+        self.generic = []
+
+    def add(self, handler):
+        position = len(self.handlers)
+        self.handlers.append(handler)
+        config = handler().supported_file_extension_config
+        if not isinstance(config, dict):
+            config = {}
+        if config.get("id") is not None:
+            # as for the registry, the first handler registered wins
+            self.by_id.setdefault(config["id"], handler)
+        extensions = config.get("ext") or []
+        for ext in extensions:
+            self.by_ext.setdefault(ext.lower(), []).append(position)
+        if not extensions:
+            self.generic.append(position)
+
+    def get(self, handler_id):
+        return self.by_id.get(handler_id)
+
+    def get_candidates(self, _data):
+        """
+        Yield the handlers that can plausibly handle the data, in registration order.
+        The header of the file is read once, only if a candidate defines MAGIC_BYTES
+        """
+        base = _data.get("base_file")
+        ext = get_file_extension(base) if base else None
+        if ext is None:
+            yield from self.handlers
+            return
+
+        header = None
+        for position in sorted(self.generic + self.by_ext.get(ext, [])):
+            handler = self.handlers[position]
+            if handler.MAGIC_BYTES:
+                if header is None:
+                    header = read_file_header(base) or b""
+                    if header.startswith(codecs.BOM_UTF8):
+                        header = header[len(codecs.BOM_UTF8):]
+                    header = header.lstrip()
+                if header and not header.startswith(handler.MAGIC_BYTES):
+                    continue
+            yield handler
+
 
 class BaseHandler(ABC):
     """
@@ -28,6 +113,12 @@ class BaseHandler(ABC):
 
     REGISTRY = []
 
+    INDEX = HandlerIndex()
+
+    # leading bytes of the files handled, if defined the files (with the
+    # whitespaces stripped) not starting with them are not consulted
+    MAGIC_BYTES = ()
+
     ACTIONS = {
         exa.IMPORT.value: (),
         exa.COPY.value: (),
@@ -36,6 +127,14 @@ class BaseHandler(ABC):
         ira.ROLLBACK.value: (),
     }
 
+    # steps that, with IMPORTER_FUSED_STEPS enabled, are executed in the same
+    # worker of the previous step. The steps with heavy I/O or a dedicated
+    # rate limit (like the import or the publishing) should keep their own queue
+    FUSABLE_STEPS = (
+        "importer.create_geonode_resource",
+        "importer.copy_geonode_resource",
+    )
+
     def __str__(self):
         return f"{self.__module__}.{self.__class__.__name__}"
 
@@ -45,11 +144,20 @@ class BaseHandler(ABC):
     @classmethod
     def register(cls):
         BaseHandler.REGISTRY.append(cls)
+        BaseHandler.INDEX.add(cls)
 
     @classmethod
     def get_registry(cls):
         return BaseHandler.REGISTRY
 
+    @classmethod
+    def get_candidates(cls, _data):
+        return BaseHandler.INDEX.get_candidates(_data)
+
+    @classmethod
+    def get_handler_by_id(cls, handler_id):
+        return BaseHandler.INDEX.get(handler_id)
+
     @classmethod
     def get_task_list(cls, action) -> tuple:
         if action not in cls.ACTIONS:
@@ -144,15 +252,7 @@ class BaseHandler(ABC):
         from importer.models import ResourceHandlerInfo
 
         # as last step, we delete the celery task to keep the number of rows under control
-        lower_exec_id = execution_id.replace("-", "_").lower()
-        TaskResult.objects.filter(
-            Q(task_args__icontains=lower_exec_id)
-            | Q(task_kwargs__icontains=lower_exec_id)
-            | Q(result__icontains=lower_exec_id)
-            | Q(task_args__icontains=execution_id)
-            | Q(task_kwargs__icontains=execution_id)
-            | Q(result__icontains=execution_id)
-        ).delete()
+        orchestrator.delete_execution_tasks(execution_id)
 
         _exec = orchestrator.get_execution_object(execution_id)
 
@@ -248,7 +348,7 @@ class BaseHandler(ABC):
         return NotImplementedError
 
     def get_ogr2ogr_task_group(
-        self, execution_id, files, layer, should_be_overwritten, alternate
+        self, execution_id, files, layer, should_be_overwritten, alternate, chunks=None
     ):
         """
         implement custom ogr2ogr task group
@@ -263,7 +363,9 @@ class BaseHandler(ABC):
         return
 
     def _get_execution_request_object(self, execution_id: str):
-        return ExecutionRequest.objects.filter(exec_id=execution_id).first()
+        from importer.orchestrator import orchestrator
+
+        return orchestrator.get_execution_object(execution_id, raise_exception=False)
 
     def overwrite_resourcehandlerinfo(
         self,
@@ -0,0 +1,287 @@
+import codecs
+import json
+import re
+
+"""
+Incremental reader of JSON documents.
+Is used to classify and validate the JSON uploads (like GeoJSON or 3DTiles)
+without loading the whole file in memory
+"""
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"\s*")
+_BRACKETS = re.compile(r"[{}\[\]]")
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SCALAR_ARRAY = re.compile(r'\[[^"{}\[\]]*\]')
+_SCALAR = re.compile(r"[^,:{}\[\]\s]+")
+
+
+class JSONStreamReader:
+    """
+    Read a JSON document chunk by chunk. The values are materialized
+    only if explicitly requested, the other values are skipped
+    by keeping track of the nesting level
+    """
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE) -> None:
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self._consumed = 0
+        self._capture = None
+        self._capture_start = 0
+        # the utf-8-sig decoder drops the BOM written by some editors at the start of the file
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._started = False
+
+    def _read_more(self) -> bool:
+        if self.eof:
+            return False
+        while True:
+            raw = self.fp.read(self.chunk_size)
+            data = raw
+            if isinstance(raw, bytes):
+                # a chunk can end in the middle of a char (or of the BOM)
+                data = self._decoder.decode(raw, final=not raw)
+            elif not self._started and raw.startswith("\ufeff"):
+                # the BOM is left in the text by the files opened as utf-8
+                data = raw[1:]
+            self._started = self._started or bool(raw)
+            if data or not raw:
+                break
+        if not data:
+            self.eof = True
+            return False
+        if self._capture is not None:
+            self._capture.append(self.buffer[self._capture_start:self.pos])
+            self._capture_start = 0
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """
+        Return the next char which is not a whitespace, None at the end of the file
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read_more():
+                return None
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expecting '{char}', found '{found}'")
+        self.pos += 1
+
+    def _match(self, regex):
+        while True:
+            match = regex.match(self.buffer, self.pos)
+            if match and (match.end() < len(self.buffer) or self.eof):
+                self.pos = match.end()
+                return match.group()
+            if not self._read_more():
+                if match:
+                    self.pos = match.end()
+                    return match.group()
+                raise ValueError("Unexpected end of the JSON document")
+
+    def read_string(self) -> str:
+        if self._peek() != '"':
+            raise ValueError("Expecting a string")
+        return json.loads(self._match(_STRING))
+
+    def skip_value(self):
+        """
+        Move after the next value without materializing it
+        """
+        char = self._peek()
+        if char is None:
+            raise ValueError("Unexpected end of the JSON document")
+        if char == '"':
+            self._match(_STRING)
+        elif char in "{[":
+            self._skip_container()
+        else:
+            json.loads(self._match(_SCALAR))
+        self._consumed += 1
+
+    def _skip_container(self):
+        depth = 0
+        while True:
+            # the brackets are counted in bulk between two strings, the single
+            # brackets are evaluated only where the container can be closed
+            quote = self.buffer.find('"', self.pos)
+            end = quote if quote != -1 else len(self.buffer)
+            closing = self.buffer.count("}", self.pos, end) + self.buffer.count(
+                "]", self.pos, end
+            )
+            if depth - closing > 0:
+                opening = self.buffer.count("{", self.pos, end) + self.buffer.count(
+                    "[", self.pos, end
+                )
+                depth += opening - closing
+            elif self._closes_container(self.buffer[self.pos:end], depth):
+                for match in _BRACKETS.finditer(self.buffer, self.pos, end):
+                    depth += 1 if match.group() in "{[" else -1
+                    if depth == 0:
+                        self.pos = match.end()
+                        return
+            else:
+                opening = self.buffer.count("{", self.pos, end) + self.buffer.count(
+                    "[", self.pos, end
+                )
+                depth += opening - closing
+            self.pos = end
+            if quote != -1:
+                self._match(_STRING)
+            elif not self._read_more():
+                raise ValueError("Unexpected end of the JSON document")
+
+    @staticmethod
+    def _closes_container(segment, depth) -> bool:
+        """
+        Evaluate if the depth reaches zero in the segment. The arrays of
+        scalars (like the coordinates) are balanced, so they are removed
+        before evaluating the single brackets. They are removed only once the
+        container is open, otherwise the container itself could be removed
+        """
+        count = 1 if depth > 0 else 0
+        while count:
+            segment, count = _SCALAR_ARRAY.subn("", segment)
+        for match in _BRACKETS.finditer(segment):
+            depth += 1 if match.group() in "{[" else -1
+            if depth == 0:
+                return True
+        return False
+
+    def read_value(self):
+        """
+        Materialize the next value
+        """
+        self._peek()
+        self._capture, self._capture_start = [], self.pos
+        try:
+            self.skip_value()
+            self._capture.append(self.buffer[self._capture_start:self.pos])
+            return json.loads("".join(self._capture))
+        finally:
+            self._capture = None
+
+    def iter_object(self):
+        """
+        Iterate the keys of the next object. For each key the value
+        can be consumed by the caller, otherwise is skipped
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            self._consumed += 1
+            return
+        while True:
+            key = self.read_string()
+            self._expect(":")
+            consumed = self._consumed
+            yield key
+            if consumed == self._consumed:
+                self.skip_value()
+            char = self._peek()
+            self.pos += 1
+            if char == "}":
+                break
+            if char != ",":
+                raise ValueError(f"Expecting ',' or '}}', found '{char}'")
+        self._consumed += 1
+
+    def iter_array(self):
+        """
+        Iterate the items of the next array, each item is materialized
+        """
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            self._consumed += 1
+            return
+        while True:
+            yield self.read_value()
+            char = self._peek()
+            self.pos += 1
+            if char == "]":
+                break
+            if char != ",":
+                raise ValueError(f"Expecting ',' or ']', found '{char}'")
+        self._consumed += 1
+
+    def ensure_end(self):
+        if self._peek() is not None:
+            raise ValueError("Extra data after the end of the JSON document")
+
+
+class _open_json:
+    """
+    Open the file path or rewind the file-like object once the read is completed
+    """
+
+    def __init__(self, _file) -> None:
+        self._file = _file
+        self._position = None
+
+    def __enter__(self):
+        if isinstance(self._file, str):
+            self._fp = open(self._file, "rb")
+            return self._fp
+        self._fp = self._file
+        if hasattr(self._fp, "tell") and hasattr(self._fp, "seek"):
+            self._position = self._fp.tell()
+        return self._fp
+
+    def __exit__(self, *args):
+        if isinstance(self._file, str):
+            self._fp.close()
+        elif self._position is not None:
+            self._fp.seek(self._position)
+
+
+def sniff_json(_file, keys, read_values=()) -> dict:
+    """
+    Look for the keys in the top-level object of the JSON file.
+    The reading stops as soon as all the keys are found. Only the values
+    of the keys in read_values are materialized, the others are None:
+    {'type': 'FeatureCollection'}
+    """
+    found = {}
+    with _open_json(_file) as fp:
+        reader = JSONStreamReader(fp)
+        for key in reader.iter_object():
+            if key not in keys:
+                continue
+            found[key] = reader.read_value() if key in read_values else None
+            if len(found) == len(keys):
+                break
+    return found
+
+
+def validate_json(_file, streamed_keys=()):
+    """
+    Validate the whole JSON file. The top-level arrays in streamed_keys
+    (like the GeoJSON features) are validated one item at a time,
+    so the memory needed is bounded by the size of the biggest item
+    """
+    with _open_json(_file) as fp:
+        reader = JSONStreamReader(fp)
+        if reader._peek() != "{":
+            reader.read_value()
+        else:
+            for key in reader.iter_object():
+                if key in streamed_keys and reader._peek() == "[":
+                    for _ in reader.iter_array():
+                        pass
+                else:
+                    reader.read_value()
+        reader.ensure_end()
+    return True
@@ -1,4 +1,3 @@
-import pyproj
 from importer.publisher import DataPublisher
 import json
 import logging
@@ -14,12 +13,18 @@ from geonode.resource.enumerator import ExecutionRequestAction as exa
 from geonode.resource.manager import resource_manager
 from geonode.resource.models import ExecutionRequest
 from importer.api.exception import ImportException
-from importer.celery_tasks import ErrorBaseTaskClass, import_orchestrator
+from importer.celery_tasks import ErrorBaseTaskClass, call_next_step
 from importer.handlers.base import BaseHandler
 from importer.handlers.geotiff.exceptions import InvalidGeoTiffException
-from importer.handlers.utils import create_alternate, should_be_imported
+from importer.handlers.utils import (
+    create_alternate,
+    identify_authority,
+    should_be_imported,
+)
+from importer.metrics import metrics
 from importer.models import ResourceHandlerInfo
 from importer.orchestrator import orchestrator
+from importer.settings import IMPORTER_IDEMPOTENT_TASKS
 from osgeo import gdal
 from importer.celery_app import importer_app
 from geonode.storage.manager import storage_manager
@@ -219,29 +224,7 @@ class BaseRasterFileHandler(BaseHandler):
         ]
 
     def identify_authority(self, layer):
-        try:
-            layer_wkt = layer.GetSpatialRef().ExportToWkt()
-            _name = "EPSG"
-            _code = pyproj.CRS(layer_wkt).to_epsg(min_confidence=20)
-            if _code is None:
-                layer_proj4 = layer.GetSpatialRef().ExportToProj4()
-                _code = pyproj.CRS(layer_proj4).to_epsg(min_confidence=20)
-                if _code is None:
-                    raise Exception(
-                        "CRS authority code not found, fallback to default behaviour"
-                    )
-        except Exception:
-            spatial_ref = layer.GetSpatialRef()
-            spatial_ref.AutoIdentifyEPSG()
-            _name = spatial_ref.GetAuthorityName(None) or spatial_ref.GetAttrValue(
-                "AUTHORITY", 0
-            )
-            _code = (
-                spatial_ref.GetAuthorityCode("PROJCS")
-                or spatial_ref.GetAuthorityCode("GEOGCS")
-                or spatial_ref.GetAttrValue("AUTHORITY", 1)
-            )
-        return f"{_name}:{_code}"
+        return identify_authority(layer.GetSpatialRef())
 
     def import_resource(self, files: dict, execution_id: str, **kwargs) -> str:
         """
@@ -256,6 +239,7 @@ class BaseRasterFileHandler(BaseHandler):
         orchestrator.update_execution_request_status(
             execution_id=str(execution_id), input_params=_input
         )
+        orchestrator.set_expected_layers(execution_id, 1)
 
         try:
             filename = Path(files.get("base_file")).stem
@@ -287,7 +271,7 @@ class BaseRasterFileHandler(BaseHandler):
                 else:
                     alternate = create_alternate(layer_name, execution_id)
 
-                import_orchestrator.apply_async(
+                call_next_step(
                     (
                         files,
                         execution_id,
@@ -357,7 +341,8 @@ class BaseRasterFileHandler(BaseHandler):
         self.handle_xml_file(saved_dataset, _exec)
         self.handle_sld_file(saved_dataset, _exec)
 
-        resource_manager.set_thumbnail(None, instance=saved_dataset)
+        with metrics.timer(step="set_thumbnail"):
+            resource_manager.set_thumbnail(None, instance=saved_dataset)
 
         ResourceBase.objects.filter(alternate=alternate).update(dirty_state=False)
 
@@ -390,9 +375,10 @@ class BaseRasterFileHandler(BaseHandler):
             self.handle_xml_file(dataset, _exec)
             self.handle_sld_file(dataset, _exec)
 
-            resource_manager.set_thumbnail(
-                dataset.uuid, instance=dataset, overwrite=True
-            )
+            with metrics.timer(step="set_thumbnail"):
+                resource_manager.set_thumbnail(
+                    dataset.uuid, instance=dataset, overwrite=True
+                )
             dataset.refresh_from_db()
             return dataset
         elif not dataset.exists() and _overwrite:
@@ -445,6 +431,9 @@ class BaseRasterFileHandler(BaseHandler):
             resource=resource,
             execution_request=execution_id,
             kwargs=kwargs.get("kwargs", {}),
+            content_hash=(execution_id.input_params or {}).get("content_hash")
+            if execution_id
+            else None,
         )
 
     def overwrite_resourcehandlerinfo(
@@ -463,6 +452,9 @@ class BaseRasterFileHandler(BaseHandler):
                 resource=resource,
                 execution_request=execution_id,
                 kwargs=kwargs.get("kwargs", {}) or kwargs,
+                content_hash=(execution_id.input_params or {}).get("content_hash")
+                if execution_id
+                else None,
             )
             return
         return self.create_resourcehandlerinfo(
@@ -489,9 +481,6 @@ class BaseRasterFileHandler(BaseHandler):
         resource.refresh_from_db()
         return resource
 
-    def _get_execution_request_object(self, execution_id: str):
-        return ExecutionRequest.objects.filter(exec_id=execution_id).first()
-
     @staticmethod
     def copy_original_file(dataset):
         """
@@ -524,7 +513,8 @@ class BaseRasterFileHandler(BaseHandler):
     name="importer.copy_raster_file",
     queue="importer.copy_raster_file",
     max_retries=1,
-    acks_late=False,
+    acks_late=IMPORTER_IDEMPOTENT_TASKS,
+    idempotent=True,
     ignore_result=False,
     task_track_started=True,
 )
@@ -567,6 +557,6 @@ def copy_raster_file(
         action,
     )
 
-    import_orchestrator.apply_async(task_params, additional_kwargs)
+    call_next_step(task_params, additional_kwargs)
 
     return "copy_raster", layer_name, alternate, exec_id
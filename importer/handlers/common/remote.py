@@ -107,6 +107,7 @@ class BaseRemoteResourceHandler(BaseHandler):
         orchestrator.update_execution_request_status(
             execution_id=str(execution_id), input_params=_input
         )
+        orchestrator.set_expected_layers(execution_id, 1)
 
         try:
             params = _exec.input_params.copy()
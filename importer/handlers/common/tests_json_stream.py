@@ -0,0 +1,112 @@
+import io
+import json
+from django.test import TestCase
+from importer.handlers.common.json_stream import (
+    JSONStreamReader,
+    sniff_json,
+    validate_json,
+)
+
+
+class TestJSONStream(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.feature = {
+            "type": "Feature",
+            "properties": {"name": 'with "}]" chars', "values": [1, 2, {"a": None}]},
+            "geometry": {"type": "Polygon", "coordinates": [[[1.5, 2.5], [3, -4e3]]]},
+        }
+        cls.payload = json.dumps(
+            {
+                "features": [cls.feature] * 20,
+                "crs": {"type": "name"},
+                "type": "FeatureCollection",
+            }
+        )
+
+    def test_sniff_json_should_skip_the_other_values(self):
+        actual = sniff_json(
+            io.BytesIO(self.payload.encode()), keys={"type"}, read_values=("type",)
+        )
+        self.assertDictEqual({"type": "FeatureCollection"}, actual)
+
+    def test_sniff_json_should_rewind_the_file(self):
+        _file = io.BytesIO(self.payload.encode())
+        sniff_json(_file, keys={"crs"})
+        self.assertEqual(0, _file.tell())
+
+    def test_reader_should_work_across_the_chunks(self):
+        for chunk_size in (1, 7, 1024):
+            reader = JSONStreamReader(io.StringIO(self.payload), chunk_size=chunk_size)
+            actual = {}
+            for key in reader.iter_object():
+                if key == "features":
+                    actual[key] = list(reader.iter_array())
+                elif key == "type":
+                    actual[key] = reader.read_value()
+            reader.ensure_end()
+            self.assertEqual([self.feature] * 20, actual["features"])
+            self.assertEqual("FeatureCollection", actual["type"])
+
+    def test_validate_json(self):
+        self.assertTrue(
+            validate_json(io.StringIO(self.payload), streamed_keys=("features",))
+        )
+
+    def test_validate_json_should_raise_for_invalid_documents(self):
+        for payload in (
+            '{"features": [{"a": 1},]}',
+            '{"features": [1, 2}',
+            '{"type": "Feature",}',
+            '{"type": "Feature"} extra',
+            '{"type": "Feature"',
+        ):
+            with self.assertRaises(ValueError):
+                validate_json(io.StringIO(payload), streamed_keys=("features",))
+
+    def test_reader_should_skip_the_utf8_bom(self):
+        for chunk_size in (1, 2, 7, 1024):
+            reader = JSONStreamReader(
+                io.BytesIO(b"\xef\xbb\xbf" + self.payload.encode()),
+                chunk_size=chunk_size,
+            )
+            actual = {key: reader.read_value() for key in reader.iter_object()}
+            self.assertEqual("FeatureCollection", actual["type"])
+        self.assertDictEqual(
+            {"type": "FeatureCollection"},
+            sniff_json(
+                io.BytesIO(b"\xef\xbb\xbf" + self.payload.encode()),
+                keys={"type"},
+                read_values=("type",),
+            ),
+        )
+        self.assertTrue(validate_json(io.StringIO("\ufeff" + self.payload)))
+
+    def test_reader_should_skip_the_arrays_of_scalars(self):
+        for payload in (
+            '{"a": [], "b": 1}',
+            '{"a": [1], "b": 1}',
+            '{"a": [[1, 2], [3]], "b": 1}',
+        ):
+            self.assertDictEqual(
+                {"b": 1},
+                sniff_json(io.StringIO(payload), keys={"b"}, read_values=("b",)),
+            )
+            self.assertTrue(validate_json(io.StringIO(payload)))
+
+    def test_reader_should_skip_a_top_level_bbox(self):
+        payload = json.dumps(
+            {
+                "bbox": [1.5, 2.5, 3, -4e3],
+                "type": "FeatureCollection",
+                "features": [self.feature] * 3,
+            }
+        )
+        self.assertDictEqual(
+            {"type": "FeatureCollection"},
+            sniff_json(io.StringIO(payload), keys={"type"}, read_values=("type",)),
+        )
+        self.assertTrue(
+            validate_json(io.StringIO(payload), streamed_keys=("features",))
+        )
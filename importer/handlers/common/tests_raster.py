@@ -60,7 +60,7 @@ class TestBaseRasterFileHandler(TestCase):
             if exec_id:
                 ExecutionRequest.objects.filter(exec_id=exec_id).delete()
 
-    @patch("importer.handlers.common.raster.import_orchestrator.apply_async")
+    @patch("importer.celery_tasks.import_orchestrator.apply_async")
     def test_import_resource_should_work(self, import_orchestrator):
         try:
             exec_id = orchestrator.create_execution_request(
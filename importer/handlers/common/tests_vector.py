@@ -215,15 +215,153 @@ class TestBaseVectorFileHandler(TestCase):
         self.assertIsInstance(actual, (Signature,))
         self.assertEqual("importer.import_with_ogr2ogr", actual.task)
 
+    def test_get_ogr2ogr_chunks_should_return_none_if_not_supported(self):
+        layer = MagicMock()
+        layer.GetFeatureCount.return_value = 1000
+        self.assertIsNone(self.handler.get_ogr2ogr_chunks(layer, chunk_size=100))
+
+    def test_get_ogr2ogr_chunks_should_split_the_layer_in_fid_ranges(self):
+        layer = MagicMock()
+        layer.GetFeatureCount.return_value = 250
+        layer.GetFIDColumn.return_value = "fid"
+        datasource = MagicMock()
+        # the FIDs do not start from 1
+        datasource.ExecuteSQL.return_value.GetNextFeature.return_value.GetField.side_effect = [
+            1001,
+            1250,
+        ]
+
+        actual = GPKGFileHandler().get_ogr2ogr_chunks(
+            layer, chunk_size=100, datasource=datasource
+        )
+
+        self.assertListEqual(
+            [
+                {"index": 0, "where": "fid < 1101", "size": 100, "append": False},
+                {"index": 1, "where": "fid >= 1101 AND fid < 1201", "size": 100, "append": True},
+                {"index": 2, "where": "fid >= 1201", "size": 50, "append": True},
+            ],
+            actual,
+        )
+        datasource.ReleaseResultSet.assert_called_once()
+        # small layers are imported with a single task
+        self.assertIsNone(
+            GPKGFileHandler().get_ogr2ogr_chunks(
+                layer, chunk_size=500, datasource=datasource
+            )
+        )
+
+    def test_get_ogr2ogr_chunks_should_return_none_without_the_fid_range(self):
+        layer = MagicMock()
+        layer.GetFeatureCount.return_value = 250
+        datasource = MagicMock()
+        datasource.ExecuteSQL.side_effect = Exception("not supported")
+
+        self.assertIsNone(
+            GPKGFileHandler().get_ogr2ogr_chunks(
+                layer, chunk_size=100, datasource=datasource
+            )
+        )
+
+    def test_get_ogr2ogr_task_group_with_chunks(self):
+        chunks = [
+            {"index": 1, "where": "fid >= 101 AND fid < 201", "size": 100, "append": True},
+            {"index": 2, "where": "fid >= 201", "size": 50, "append": True},
+        ]
+
+        actual = GPKGFileHandler().get_ogr2ogr_task_group(
+            str(uuid.uuid4()),
+            files=self.valid_files,
+            layer="dataset",
+            should_be_overwritten=False,
+            alternate="abc",
+            chunks=chunks,
+        )
+
+        # a flat group of the appended chunks, used as header of the chord
+        self.assertIsInstance(actual, group)
+        self.assertEqual(2, len(actual.tasks))
+        for task, chunk in zip(actual.tasks, chunks):
+            self.assertEqual("importer.import_with_ogr2ogr", task.task)
+            self.assertEqual(chunk, task.kwargs["chunk"])
+
+    @staticmethod
+    def _mock_ogr2ogr_process(stdout=b"", stderr=b""):
+        process = MagicMock()
+        process.stdout.read1.side_effect = [stdout, b""] if stdout else [b""]
+        process.stderr.read.return_value = stderr
+        return process
+
+    @patch("importer.handlers.common.vector.ImportProgressTracker.update")
+    @patch("importer.handlers.common.vector.Popen")
+    def test_import_with_ogr2ogr_should_send_the_progress_to_the_tracker(
+        self, _open, _update
+    ):
+        _open.return_value = self._mock_ogr2ogr_process(
+            stdout=b"0...10...20...30...40...50"
+        )
+
+        import_with_ogr2ogr(
+            execution_id=str(uuid.uuid4()),
+            files=self.valid_files,
+            original_name="dataset",
+            handler_module_path=str(self.handler),
+            ovverwrite_layer=False,
+            alternate="alternate",
+        )
+
+        # the last complete percentage of the output is sent, "50" can be a partial "500"
+        _update.assert_any_call(0.4)
+        self.assertEqual("done", _update.call_args.kwargs["status"])
+
+    @patch("importer.handlers.common.vector.call_rollback_function")
+    @patch("importer.handlers.common.vector.ImportProgressTracker.update")
+    @patch("importer.handlers.common.vector.Popen")
+    def test_import_with_ogr2ogr_with_errors_should_set_the_progress_as_failed(
+        self, _open, _update, _rollback
+    ):
+        _open.return_value = self._mock_ogr2ogr_process(
+            stdout=b"0...10...", stderr=b"ERROR: some error here"
+        )
+
+        with self.assertRaises(Exception):
+            import_with_ogr2ogr(
+                execution_id=str(uuid.uuid4()),
+                files=self.valid_files,
+                original_name="dataset",
+                handler_module_path=str(self.handler),
+                ovverwrite_layer=False,
+                alternate="alternate",
+            )
+
+        self.assertEqual("failed", _update.call_args.kwargs["status"])
+
+    @patch("importer.handlers.common.vector.Popen")
+    def test_import_with_ogr2ogr_with_chunk_should_filter_by_fid(self, _open):
+        _open.return_value = self._mock_ogr2ogr_process()
+
+        import_with_ogr2ogr(
+            execution_id=str(uuid.uuid4()),
+            files=self.valid_files,
+            original_name="dataset",
+            handler_module_path=str(self.handler),
+            ovverwrite_layer=False,
+            alternate="alternate",
+            chunk={"index": 1, "where": "fid >= 100", "size": 50, "append": True},
+        )
+
+        _call_as_string = _open.mock_calls[0][1][0]
+        self.assertTrue(
+            _call_as_string.endswith('-progress -where "fid >= 100" -append')
+        )
+
     @patch("importer.handlers.common.vector.Popen")
     def test_import_with_ogr2ogr_without_errors_should_call_the_right_command(
         self, _open
     ):
         _uuid = uuid.uuid4()
 
-        comm = MagicMock()
-        comm.communicate.return_value = b"", b""
-        _open.return_value = comm
+        _open.return_value = self._mock_ogr2ogr_process()
 
         _task, alternate, execution_id = import_with_ogr2ogr(
             execution_id=str(_uuid),
@@ -244,7 +382,7 @@ class TestBaseVectorFileHandler(TestCase):
             + os.getenv("DATABASE_HOST", "localhost")
             + " port=5432 user='geonode_data' password='geonode_data' \" \""
             + self.valid_files.get("base_file")
-            + '" -nln alternate "dataset"',
+            + '" -nln alternate "dataset" -progress',
             stdout=-1,
             stderr=-1,
             shell=True,  # noqa
@@ -254,9 +392,9 @@ class TestBaseVectorFileHandler(TestCase):
     def test_import_with_ogr2ogr_with_errors_should_raise_exception(self, _open):
         _uuid = uuid.uuid4()
 
-        comm = MagicMock()
-        comm.communicate.return_value = b"", b"ERROR: some error here"
-        _open.return_value = comm
+        _open.return_value = self._mock_ogr2ogr_process(
+            stderr=b"ERROR: some error here"
+        )
 
         with self.assertRaises(Exception):
             import_with_ogr2ogr(
@@ -274,7 +412,7 @@ class TestBaseVectorFileHandler(TestCase):
             + os.getenv("DATABASE_HOST", "localhost")
             + " port=5432 user='geonode_data' password='geonode_data' \" \""
             + self.valid_files.get("base_file")
-            + '" -nln alternate "dataset"',
+            + '" -nln alternate "dataset" -progress',
             stdout=-1,
             stderr=-1,
             shell=True,  # noqa
@@ -311,6 +449,103 @@ class TestBaseVectorFileHandler(TestCase):
         self.assertTrue("psql -d" in _call_as_string)
         self.assertFalse("-f PostgreSQL PG" in _call_as_string)
 
+    @patch.dict(os.environ, {"OGR2OGR_ENGINE": "gdal"}, clear=True)
+    @patch("importer.handlers.common.vector.Popen")
+    @patch("importer.handlers.common.vector.gdal.VectorTranslate")
+    def test_import_with_ogr2ogr_with_gdal_engine_should_not_spawn_a_process(
+        self, _translate, _open
+    ):
+        _uuid = uuid.uuid4()
+
+        _task, alternate, execution_id = import_with_ogr2ogr(
+            execution_id=str(_uuid),
+            files={"base_file": self.valid_gpkg},
+            original_name="stazioni_metropolitana",
+            handler_module_path=str(self.handler),
+            ovverwrite_layer=False,
+            alternate="alternate",
+        )
+
+        self.assertEqual("ogr2ogr", _task)
+        self.assertEqual(alternate, "alternate")
+        self.assertEqual(str(_uuid), execution_id)
+
+        _open.assert_not_called()
+        _translate.assert_called_once()
+        self.assertTrue(_translate.call_args[0][0].startswith("PG: dbname='test_geonode_data'"))
+
+    @patch.dict(os.environ, {"OGR2OGR_ENGINE": "gdal"}, clear=True)
+    @patch("importer.handlers.common.vector.call_rollback_function")
+    @patch("importer.handlers.common.vector.translate_with_gdal")
+    def test_import_with_ogr2ogr_with_gdal_engine_should_raise_the_collected_errors(
+        self, _translate, _rollback
+    ):
+        _translate.return_value = [
+            {"class": 3, "code": 1, "message": "some error here"}
+        ]
+
+        with self.assertRaises(Exception) as _exc:
+            import_with_ogr2ogr(
+                execution_id=str(uuid.uuid4()),
+                files=self.valid_files,
+                original_name="dataset",
+                handler_module_path=str(self.handler),
+                ovverwrite_layer=False,
+                alternate="alternate",
+            )
+
+        self.assertIn("some error here for layer alternate", str(_exc.exception))
+        _rollback.assert_called_once()
+
+    def test_create_vectortranslate_options(self):
+        actual = self.handler.create_vectortranslate_options(
+            self.valid_files, "dataset", True, "alternate"
+        )
+        self.assertEqual({"PG_USE_COPY": "YES"}, actual["config_options"])
+        self.assertEqual("PostgreSQL", actual["translate_options"]["format"])
+        self.assertEqual(["dataset"], actual["translate_options"]["layers"])
+        self.assertEqual("alternate", actual["translate_options"]["layerName"])
+        self.assertEqual("overwrite", actual["translate_options"]["accessMode"])
+
+    def test_create_inspection_manifest(self):
+        manifest = GPKGFileHandler().create_inspection_manifest(
+            {"base_file": self.valid_gpkg}
+        )
+        self.assertEqual(self.valid_gpkg, manifest["source"])
+        self.assertEqual(1, len(manifest["layers"]))
+        layer_info = manifest["layers"][0]
+        self.assertEqual("stazioni_metropolitana", layer_info["name"])
+        self.assertEqual("EPSG:32632", layer_info["crs"])
+        self.assertIn("Point", layer_info["geometry_type"])
+        self.assertTrue(layer_info["feature_count"] > 0)
+        self.assertNotIn("schema", layer_info)
+
+    def test_get_inspection_manifest_should_be_saved_in_the_execution(self):
+        exec_id = None
+        try:
+            files = {"base_file": self.valid_gpkg}
+            exec_id = orchestrator.create_execution_request(
+                user=get_user_model().objects.first(),
+                func_name="funct1",
+                step="step",
+                input_params={"files": files},
+            )
+            handler = GPKGFileHandler()
+            expected = handler.get_inspection_manifest(files, str(exec_id))
+
+            req = ExecutionRequest.objects.get(exec_id=exec_id)
+            self.assertDictEqual(expected, req.output_params["inspection"])
+
+            with patch.object(handler, "create_inspection_manifest") as _inspect:
+                layer_info = handler.get_layer_info(
+                    files, "stazioni_metropolitana", str(exec_id)
+                )
+                _inspect.assert_not_called()
+            self.assertEqual("EPSG:32632", layer_info["crs"])
+        finally:
+            if exec_id:
+                ExecutionRequest.objects.filter(exec_id=exec_id).delete()
+
     def test_select_valid_layers(self):
         """
         The function should return only the datasets with a geometry
@@ -1,13 +1,16 @@
 import ast
+import inspect
 from django.db import connections
 from importer.publisher import DataPublisher
 from importer.utils import call_rollback_function
 import json
 import logging
 import os
+import threading
+import time
 from subprocess import PIPE, Popen
-from typing import List
-from celery import chord, group
+from typing import List, Optional
+from celery import chain, chord, group
 
 from django.conf import settings
 from dynamic_models.models import ModelSchema
@@ -21,20 +24,29 @@ from importer.handlers.gpkg.tasks import SingleMessageErrorHandler
 from importer.handlers.utils import (
     GEOM_TYPE_MAPPING,
     STANDARD_TYPE_MAPPING,
+    ImportProgressTracker,
     drop_dynamic_model_schema,
 )
 from geonode.resource.manager import resource_manager
 from geonode.resource.models import ExecutionRequest
-from osgeo import ogr
+from osgeo import gdal, ogr
 from importer.api.exception import ImportException
+from importer.backpressure import datastore_controller
+from importer.idempotency import is_redelivered
 from importer.celery_app import importer_app
 from geonode.assets.utils import copy_assets_and_links, get_default_asset
 
-from importer.handlers.utils import create_alternate, should_be_imported
+from importer.handlers.utils import (
+    create_alternate,
+    identify_authority,
+    should_be_imported,
+)
+from importer.metrics import metrics
 from importer.models import ResourceHandlerInfo
 from importer.orchestrator import orchestrator
+from importer.settings import IMPORTER_IDEMPOTENT_TASKS, IMPORTER_OGR2OGR_CHUNK_SIZE
+from importer.tracing import tracer
 from django.db.models import Q
-import pyproj
 from geonode.geoserver.security import delete_dataset_cache, set_geowebcache_invalidate_cache
 
 logger = logging.getLogger(__name__)
@@ -54,6 +66,15 @@ class BaseVectorFileHandler(BaseHandler):
     def supported_file_extension_config(self):
         return NotImplementedError
 
+    @property
+    def can_import_in_chunks(self) -> bool:
+        """
+        True if the source format can be efficiently filtered by FID
+        so a big layer can be loaded in parallel by FID ranges.
+        To be override by the handlers that supports it
+        """
+        return False
+
     @staticmethod
     def get_geoserver_store_name(default=None):
         """
@@ -188,6 +209,37 @@ class BaseVectorFileHandler(BaseHandler):
 
         return options
 
+    @staticmethod
+    def create_vectortranslate_options(files, original_name, ovverwrite_layer, alternate):
+        """
+        Define the options used by gdal.VectorTranslate when the in-process
+        engine is enabled. Is the counterpart of create_ogr2ogr_command:
+        - open_options: -oo options used to open the source dataset
+        - config_options: --config options set for the translation
+        - translate_options: kwargs for gdal.VectorTranslateOptions
+        """
+        _datastore = settings.DATABASES["datastore"]
+
+        return {
+            "destination": "PG: dbname='%s' host=%s port=%s user='%s' password='%s'"
+            % (
+                _datastore["NAME"],
+                _datastore["HOST"],
+                _datastore.get("PORT", 5432),
+                _datastore["USER"],
+                _datastore["PASSWORD"],
+            ),
+            "open_options": [],
+            "config_options": {"PG_USE_COPY": "YES"},
+            "translate_options": {
+                "format": "PostgreSQL",
+                "layers": [original_name],
+                "layerName": alternate,
+                "accessMode": "overwrite" if ovverwrite_layer else None,
+                "layerCreationOptions": [],
+            },
+        }
+
     @staticmethod
     def delete_resource(instance):
         """
@@ -245,42 +297,90 @@ class BaseVectorFileHandler(BaseHandler):
                 }
             ]
 
-        layers = self.get_ogr2ogr_driver().Open(files.get("base_file"))
-        if not layers:
-            return []
+        manifest = self.get_inspection_manifest(files, kwargs.get("execution_id"))
         return [
             {
                 "name": alternate or layer_name,
-                "crs": self.identify_authority(_l) if _l.GetSpatialRef() else None,
+                "crs": _l.get("crs"),
             }
-            for _l in layers
-            if self.fixup_name(_l.GetName()) == layer_name
+            for _l in manifest.get("layers", [])
+            if self.fixup_name(_l.get("name")) == layer_name
         ]
 
-    def identify_authority(self, layer):
+    def inspect_layer(self, layer) -> dict:
+        """
+        Return the information of the layer needed by the import steps
+        """
         try:
-            layer_wkt = layer.GetSpatialRef().ExportToWkt()
-            _name = "EPSG"
-            _code = pyproj.CRS(layer_wkt).to_epsg(min_confidence=20)
-            if _code is None:
-                layer_proj4 = layer.GetSpatialRef().ExportToProj4()
-                _code = pyproj.CRS(layer_proj4).to_epsg(min_confidence=20)
-                if _code is None:
-                    raise Exception(
-                        "CRS authority code not found, fallback to default behaviour"
-                    )
+            crs = self.identify_authority(layer)
         except Exception:
-            spatial_ref = layer.GetSpatialRef()
-            spatial_ref.AutoIdentifyEPSG()
-            _name = spatial_ref.GetAuthorityName(None) or spatial_ref.GetAttrValue(
-                "AUTHORITY", 0
-            )
-            _code = (
-                spatial_ref.GetAuthorityCode("PROJCS")
-                or spatial_ref.GetAuthorityCode("GEOGCS")
-                or spatial_ref.GetAttrValue("AUTHORITY", 1)
+            crs = None
+        return {
+            "name": layer.GetName(),
+            "feature_count": layer.GetFeatureCount(),
+            "geometry_type": ogr.GeometryTypeToName(layer.GetGeomType()),
+            "crs": crs,
+        }
+
+    def create_inspection_manifest(self, files, layers=None) -> dict:
+        """
+        Inspect the layers of the source file. The manifest is saved in the
+        ExecutionRequest, so the next steps does not need to reopen the file:
+        {
+            "source": "/path/to/file.gpkg",
+            "layers": [
+                {
+                    "name": "layer", "feature_count": 10,
+                    "geometry_type": "Point", "crs": "EPSG:4326"
+                }
+            ]
+        }
+        """
+        if layers is None:
+            layers = self.get_ogr2ogr_driver().Open(files.get("base_file"))
+        return {
+            "source": files.get("base_file"),
+            "layers": [self.inspect_layer(_l) for _l in layers or []],
+        }
+
+    def get_inspection_manifest(self, files, execution_id=None) -> dict:
+        """
+        Return the manifest saved in the ExecutionRequest. If is not available
+        (or is related to another file), the source is inspected again
+        """
+        _exec = (
+            self._get_execution_request_object(execution_id) if execution_id else None
+        )
+        if _exec is not None:
+            manifest = (_exec.output_params or {}).get("inspection")
+            if manifest and manifest.get("source") == files.get("base_file"):
+                return manifest
+
+        manifest = self.create_inspection_manifest(files)
+        if _exec is not None:
+            orchestrator.merge_execution_request_output_params(
+                execution_id, "inspection", manifest
             )
-        return f"{_name}:{_code}"
+        return manifest
+
+    def get_layer_info(self, files, layer_name, execution_id=None):
+        """
+        Return the information of the selected layer from the inspection manifest
+        """
+        return next(
+            (
+                _l
+                for _l in self.get_inspection_manifest(files, execution_id).get(
+                    "layers", []
+                )
+                if layer_name in (_l["name"], _l["name"].lower())
+                or self.fixup_name(_l["name"]) == layer_name
+            ),
+            None,
+        )
+
+    def identify_authority(self, layer):
+        return identify_authority(layer.GetSpatialRef())
 
     def get_ogr2ogr_driver(self):
         """
@@ -295,7 +395,11 @@ class BaseVectorFileHandler(BaseHandler):
         data inside the geonode_data database
         """
         all_layers = self.get_ogr2ogr_driver().Open(files.get("base_file"))
-        layers = self._select_valid_layers(all_layers)
+        manifest = self.create_inspection_manifest(files, all_layers)
+        orchestrator.merge_execution_request_output_params(
+            execution_id, "inspection", manifest
+        )
+        layers = self._select_valid_layers(all_layers, manifest=manifest)
         # for the moment we skip the dyanamic model creation
         layer_count = len(layers)
         logger.info(f"Total number of layers available: {layer_count}")
@@ -304,6 +408,7 @@ class BaseVectorFileHandler(BaseHandler):
         orchestrator.update_execution_request_status(
             execution_id=str(execution_id), input_params=_input
         )
+        orchestrator.set_expected_layers(execution_id, layer_count)
         dynamic_model = None
         celery_group = None
         try:
@@ -312,6 +417,10 @@ class BaseVectorFileHandler(BaseHandler):
 
             # start looping on the layers available
 
+            # the priority is evaluated once, all the layers share it
+            task_options = orchestrator.get_task_options(
+                _exec, "importer.import_with_ogr2ogr", "importer.import_next_step"
+            )
             for index, layer in enumerate(layers, start=1):
                 layer_name = self.fixup_name(layer.GetName())
 
@@ -349,37 +458,65 @@ class BaseVectorFileHandler(BaseHandler):
                             _exec, layer_name, should_be_overwritten
                         )
 
+                    chunks = self.get_ogr2ogr_chunks(layer, datasource=all_layers)
+                    create_task = None
+                    if chunks:
+                        # the first chunk creates the table, so it runs before the chord
+                        # whose header appends the other chunks in parallel
+                        first_chunk, *chunks = chunks
+                        create_task = import_with_ogr2ogr.si(
+                            execution_id,
+                            None,
+                            layer.GetName().lower(),
+                            str(self),
+                            should_be_overwritten,
+                            alternate,
+                            chunk=first_chunk,
+                        ).set(link_error=["dynamic_model_error_callback"], **task_options)
+
                     ogr_res = self.get_ogr2ogr_task_group(
                         execution_id,
                         files,
                         layer.GetName().lower(),
                         should_be_overwritten,
                         alternate,
+                        chunks=chunks,
                     )
 
+                    # the header is kept flat, the errors are linked to each task of it
+                    ogr_tasks = ogr_res.tasks if isinstance(ogr_res, group) else [ogr_res]
+                    ogr_tasks = [
+                        task.set(link_error=["dynamic_model_error_callback"])
+                        for task in ogr_tasks
+                    ]
                     if os.getenv("IMPORTER_ENABLE_DYN_MODELS", False):
                         group_to_call = group(
                             celery_group.set(
                                 link_error=["dynamic_model_error_callback"]
                             ),
-                            ogr_res.set(link_error=["dynamic_model_error_callback"]),
+                            *ogr_tasks,
                         )
                     else:
-                        group_to_call = group(
-                            ogr_res.set(link_error=["dynamic_model_error_callback"]),
-                        )
+                        group_to_call = group(*ogr_tasks)
 
+                    next_step = import_next_step.s(
+                        execution_id,
+                        str(self),  # passing the handler module path
+                        "importer.import_resource",
+                        layer_name,
+                        alternate,
+                        **kwargs,
+                    )
                     # prepare the async chord workflow with the on_success and on_fail methods
-                    workflow = chord(group_to_call)(  # noqa
-                        import_next_step.s(
-                            execution_id,
-                            str(self),  # passing the handler module path
-                            "importer.import_resource",
-                            layer_name,
-                            alternate,
-                            **kwargs,
+                    if create_task is None:
+                        workflow = chord(group_to_call)(  # noqa
+                            next_step, **task_options
                         )
-                    )
+                    else:
+                        workflow = chain(  # noqa
+                            create_task,
+                            chord(group_to_call, next_step, **task_options),
+                        ).apply_async()
         except Exception as e:
             logger.error(e)
             if dynamic_model:
@@ -391,11 +528,24 @@ class BaseVectorFileHandler(BaseHandler):
             raise e
         return
 
-    def _select_valid_layers(self, all_layers):
+    def _select_valid_layers(self, all_layers, manifest=None):
+        """
+        Return the layers with a CRS. If the inspection manifest is provided,
+        the CRS already resolved in the manifest is used
+        """
+        layers_info = {
+            _l["name"]: _l for _l in (manifest or {}).get("layers", [])
+        }
         layers = []
         for layer in all_layers:
             try:
-                self.identify_authority(layer)
+                layer_info = layers_info.get(layer.GetName())
+                if layer_info is None:
+                    self.identify_authority(layer)
+                elif not layer_info.get("crs"):
+                    raise Exception(
+                        f"CRS authority code not found for the layer {layer.GetName()}"
+                    )
                 layers.append(layer)
             except Exception as e:
                 logger.error(e)
@@ -606,7 +756,8 @@ class BaseVectorFileHandler(BaseHandler):
         self.handle_xml_file(saved_dataset, _exec)
         self.handle_sld_file(saved_dataset, _exec)
 
-        resource_manager.set_thumbnail(None, instance=saved_dataset)
+        with metrics.timer(step="set_thumbnail"):
+            resource_manager.set_thumbnail(None, instance=saved_dataset)
 
         ResourceBase.objects.filter(alternate=alternate).update(dirty_state=False)
         
@@ -655,9 +806,10 @@ class BaseVectorFileHandler(BaseHandler):
             self.handle_xml_file(dataset, _exec)
             self.handle_sld_file(dataset, _exec)
 
-            resource_manager.set_thumbnail(
-                dataset.uuid, instance=dataset, overwrite=True
-            )
+            with metrics.timer(step="set_thumbnail"):
+                resource_manager.set_thumbnail(
+                    dataset.uuid, instance=dataset, overwrite=True
+                )
             dataset.refresh_from_db()
             return dataset
         elif not dataset.exists() and _overwrite:
@@ -710,6 +862,9 @@ class BaseVectorFileHandler(BaseHandler):
             resource=resource,
             execution_request=execution_id,
             kwargs=kwargs.get("kwargs", {}) or kwargs,
+            content_hash=(execution_id.input_params or {}).get("content_hash")
+            if execution_id
+            else None,
         )
 
     def overwrite_resourcehandlerinfo(
@@ -728,6 +883,9 @@ class BaseVectorFileHandler(BaseHandler):
                 resource=resource,
                 execution_request=execution_id,
                 kwargs=kwargs.get("kwargs", {}) or kwargs,
+                content_hash=(execution_id.input_params or {}).get("content_hash")
+                if execution_id
+                else None,
             )
             return
         return self.create_resourcehandlerinfo(
@@ -761,23 +919,118 @@ class BaseVectorFileHandler(BaseHandler):
         layer,
         should_be_overwritten: bool,
         alternate: str,
+        chunks: list = None,
     ):
         """
         In case the OGR2OGR is different from the default one, is enough to ovverride this method
-        and return the celery task object needed
+        and return the celery task object needed.
+        If chunks are provided, the table is already created (by the first chunk)
+        and a flat group appending the chunks in parallel is returned
         """
         handler_module_path = str(self)
-        return import_with_ogr2ogr.s(
-            execution_id,
-            files,
-            layer.lower(),
-            handler_module_path,
-            should_be_overwritten,
-            alternate,
+        # the files are read from the execution by the task, instead of sending them with each chunk
+        if not chunks:
+            return import_with_ogr2ogr.s(
+                execution_id,
+                None,
+                layer.lower(),
+                handler_module_path,
+                should_be_overwritten,
+                alternate,
+            )
+
+        return group(
+            import_with_ogr2ogr.si(
+                execution_id,
+                None,
+                layer.lower(),
+                handler_module_path,
+                False,
+                alternate,
+                chunk=_chunk,
+            )
+            for _chunk in chunks
         )
 
-    def _get_execution_request_object(self, execution_id: str):
-        return ExecutionRequest.objects.filter(exec_id=execution_id).first()
+    def get_ogr2ogr_fid_range(self, datasource, layer):
+        """
+        Return the min and the max FID of the layer, None if they cannot be read
+        """
+        fid_column = layer.GetFIDColumn() or "FID"
+        try:
+            result = datasource.ExecuteSQL(
+                f'SELECT MIN({fid_column}), MAX({fid_column}) FROM "{layer.GetName()}"'
+            )
+            try:
+                feature = result.GetNextFeature()
+                fid_range = (int(feature.GetField(0)), int(feature.GetField(1)))
+            finally:
+                datasource.ReleaseResultSet(result)
+        except Exception as e:
+            logger.warning(f"Cannot read the FID range of the layer {layer.GetName()}: {e}")
+            return None
+        return fid_range
+
+    def get_ogr2ogr_chunks(self, layer, chunk_size=None, datasource=None):
+        """
+        Split the layer in FID ranges of chunk_size FIDs, between the min and the
+        max FID of the layer. The first and the last range are open:
+        [
+            {'index': 0, 'where': 'fid < 101', 'size': 100, 'append': False},
+            {'index': 1, 'where': 'fid >= 101', 'size': 50, 'append': True}
+        ]
+        Returns None if the layer should be imported with a single task
+        """
+        chunk_size = chunk_size or IMPORTER_OGR2OGR_CHUNK_SIZE
+        copy_with_dump = ast.literal_eval(os.getenv("OGR2OGR_COPY_WITH_DUMP", "False"))
+        if (
+            not self.can_import_in_chunks
+            or chunk_size <= 0
+            or copy_with_dump
+            or datasource is None
+        ):
+            return None
+
+        feature_count = layer.GetFeatureCount()
+        if feature_count <= chunk_size:
+            return None
+
+        fid_range = self.get_ogr2ogr_fid_range(datasource, layer)
+        if fid_range is None:
+            return None
+        first_fid, last_fid = fid_range
+        # with sparse FIDs the ranges contain less than chunk_size features
+        bounds = list(range(first_fid + chunk_size, last_fid + 1, chunk_size))
+        if not bounds:
+            return None
+
+        fid_column = layer.GetFIDColumn() or "FID"
+        chunks = []
+        for index in range(len(bounds) + 1):
+            start = bounds[index - 1] if index > 0 else None
+            end = bounds[index] if index < len(bounds) else None
+            where = " AND ".join(
+                filter(
+                    None,
+                    [
+                        f"{fid_column} >= {start}" if start is not None else None,
+                        f"{fid_column} < {end}" if end is not None else None,
+                    ],
+                )
+            )
+            chunks.append(
+                {
+                    "index": index,
+                    "where": where,
+                    "size": (last_fid + 1 if end is None else end)
+                    - (first_fid if start is None else start),
+                    "append": index > 0,
+                }
+            )
+        logger.info(
+            f"Layer {layer.GetName()} with {feature_count} features is splitted in {len(chunks)} chunks"
+        )
+        return chunks
 
     def _get_type(self, _type: str):
         """
@@ -833,6 +1086,7 @@ class BaseVectorFileHandler(BaseHandler):
 @importer_app.task(
     base=ErrorBaseTaskClass,
     name="importer.import_next_step",
+    idempotent=True,
     queue="importer.import_next_step",
     task_track_started=True,
 )
@@ -848,16 +1102,12 @@ def import_next_step(
     """
     If the ingestion of the resource is successfuly, the next step for the layer is called
     """
-    from importer.celery_tasks import import_orchestrator
+    from importer.celery_tasks import call_next_step
 
     try:
-        _exec = orchestrator.get_execution_object(execution_id)
-
-        _files = _exec.input_params.get("files")
         # at the end recall the import_orchestrator for the next step
-
         task_params = (
-            _files,
+            {},
             execution_id,
             handlers_module_path,
             actual_step,
@@ -866,7 +1116,7 @@ def import_next_step(
             exa.IMPORT.value,
         )
 
-        import_orchestrator.apply_async(task_params, kwargs)
+        call_next_step(task_params, kwargs)
     except Exception as e:
         call_rollback_function(
             execution_id,
@@ -887,39 +1137,109 @@ def import_next_step(
     name="importer.import_with_ogr2ogr",
     queue="importer.import_with_ogr2ogr",
     max_retries=1,
-    acks_late=False,
+    acks_late=IMPORTER_IDEMPOTENT_TASKS,
+    idempotent=True,
     ignore_result=False,
     task_track_started=True,
 )
 def import_with_ogr2ogr(
     execution_id: str,
-    files: dict,
+    files: Optional[dict],
     original_name: str,
     handler_module_path: str,
     ovverwrite_layer=False,
     alternate=None,
+    chunk=None,
 ):
     """
     Perform the ogr2ogr command to import he gpkg inside geonode_data
     If the layer should be overwritten, the option is appended dynamically
+    If a chunk is provided, only the features of the chunk FID range are imported.
+    If the files are not provided, they are taken from the execution
     """
+    started = time.monotonic()
+    progress = None
+    if not chunk and is_redelivered(import_with_ogr2ogr):
+        # the interrupted delivery could have loaded part of the layer
+        ovverwrite_layer = True
     try:
+        if files is None:
+            files = orchestrator.get_execution_object(execution_id).input_params.get(
+                "files"
+            )
+        copy_with_dump = ast.literal_eval(os.getenv("OGR2OGR_COPY_WITH_DUMP", "False"))
+
+        layer_info = None
+        try:
+            handler = orchestrator.load_handler(handler_module_path)()
+            layer_info = handler.get_layer_info(files, original_name, execution_id)
+        except Exception as e:
+            logger.warning(f"Cannot read the inspection of the layer {original_name}: {e}")
+
+        progress = get_progress_tracker(
+            execution_id,
+            files,
+            original_name,
+            alternate,
+            chunk=chunk,
+            layer_info=layer_info,
+        )
+        progress.start()
+
+        if os.getenv("OGR2OGR_ENGINE", "subprocess").lower() == "gdal" and not copy_with_dump:
+            # the PGDump pipe into psql is available only with the subprocess engine
+            with tracer.span("ogr2ogr", layer=alternate, engine="gdal"):
+                errors = translate_with_gdal(
+                    files,
+                    original_name,
+                    handler_module_path,
+                    ovverwrite_layer,
+                    alternate,
+                    callback=progress.gdal_callback,
+                    chunk=chunk,
+                    execution_id=execution_id,
+                )
+            if errors:
+                logger.error(f"Original error returned: {errors}")
+                message = ", ".join([x["message"] for x in errors])
+                raise Exception(f"{message} for layer {alternate}")
+            progress.done()
+            datastore_controller.record(time.monotonic() - started)
+            return "ogr2ogr", alternate, execution_id
+
         ogr_exe = "/usr/bin/ogr2ogr"
 
-        options = orchestrator.load_handler(handler_module_path).create_ogr2ogr_command(
-            files, original_name, ovverwrite_layer, alternate
+        create_command = orchestrator.load_handler(
+            handler_module_path
+        ).create_ogr2ogr_command
+        options = create_command(
+            files,
+            original_name,
+            ovverwrite_layer,
+            alternate,
+            **_get_execution_kwargs(create_command, execution_id),
         )
+        if chunk:
+            options += f' -where "{chunk["where"]}"'
+            # the first chunk let the DB assign the FID, so the appended one wont collide
+            options += " -append" if chunk.get("append") else " -unsetFid"
+            if IMPORTER_IDEMPOTENT_TASKS:
+                # the chunk is loaded in a single transaction, a redelivery never finds it partially appended
+                options += " -gt unlimited"
         _datastore = settings.DATABASES["datastore"]
 
-        copy_with_dump = ast.literal_eval(os.getenv("OGR2OGR_COPY_WITH_DUMP", "False"))
-
-        if copy_with_dump:
+        if not copy_with_dump:
+            # with PGDump the stdout is the SQL sent to psql
+            options += " -progress"
+        else:
             options += f" | PGPASSWORD={_datastore['PASSWORD']} psql -d {_datastore['NAME']} -h {_datastore['HOST']} -p {_datastore.get('PORT', 5432)} -U {_datastore['USER']} -f -"
 
         commands = [ogr_exe] + options.split(" ")
 
-        process = Popen(" ".join(commands), stdout=PIPE, stderr=PIPE, shell=True)
-        stdout, stderr = process.communicate()
+        with tracer.span("ogr2ogr", layer=alternate, engine="subprocess"):
+            stderr = run_ogr2ogr(
+                " ".join(commands), progress=None if copy_with_dump else progress
+            )
         if (
             stderr is not None
             and stderr != b""
@@ -934,8 +1254,16 @@ def import_with_ogr2ogr(
             logger.error(f"Original error returned: {err}")
             message = normalize_ogr2ogr_error(err, original_name)
             raise Exception(f"{message} for layer {alternate}")
+        progress.done()
+        datastore_controller.record(time.monotonic() - started)
         return "ogr2ogr", alternate, execution_id
     except Exception as e:
+        if progress is not None:
+            progress.failed()
+        datastore_controller.record(
+            time.monotonic() - started,
+            error=datastore_controller.is_service_error(e),
+        )
         call_rollback_function(
             execution_id,
             handlers_module_path=handler_module_path,
@@ -948,8 +1276,166 @@ def import_with_ogr2ogr(
         raise Exception(e)
 
 
+def run_ogr2ogr(command, progress=None):
+    """
+    Run the ogr2ogr command and return its stderr. If the progress tracker
+    is provided, the output of "-progress" is sent to it while the command runs
+    """
+    process = Popen(command, stdout=PIPE, stderr=PIPE, shell=True)
+    if progress is None:
+        _, stderr = process.communicate()
+        return stderr
+    stderr = []
+    # the stderr is drained in another thread, so a full pipe cannot block ogr2ogr
+    reader = threading.Thread(
+        target=lambda: stderr.append(process.stderr.read()), daemon=True
+    )
+    reader.start()
+    for data in iter(lambda: process.stdout.read1(1024), b""):
+        progress.ogr2ogr_output(data)
+    process.wait()
+    reader.join()
+    return b"".join(stderr)
+
+
 def normalize_ogr2ogr_error(err, original_name):
     getting_errors = [y for y in err.split("\n") if "ERROR " in y]
     return ", ".join(
         [x.split(original_name)[0] for x in getting_errors if "ERROR" in x]
     )
+
+
+def _get_execution_kwargs(create_command, execution_id):
+    """
+    The execution_id is passed only to the handlers that accept it,
+    so the overrides with the four arguments signature keep working
+    """
+    try:
+        parameters = inspect.signature(create_command).parameters
+    except (TypeError, ValueError):
+        return {}
+    return {"execution_id": execution_id} if "execution_id" in parameters else {}
+
+
+def get_progress_tracker(
+    execution_id, files, original_name, alternate, chunk=None, layer_info=None
+):
+    """
+    Return the progress tracker of the layer, the totals are taken from
+    the inspection of the layer or read from the source before the import begins
+    """
+    _file = files.get("base_file")
+    name = alternate or original_name
+    if chunk:
+        # each chunk has its own progress, the size is the one of the FID range
+        return ImportProgressTracker(
+            execution_id, f"{name}_chunk_{chunk['index']}", chunk.get("size", 0)
+        )
+    if layer_info is not None:
+        try:
+            bytes_total = os.path.getsize(_file)
+        except Exception:
+            bytes_total = 0
+        return ImportProgressTracker(
+            execution_id, name, layer_info.get("feature_count", 0), bytes_total
+        )
+    source_layer = None
+    try:
+        source = ogr.Open(_file)
+        if source is not None:
+            source_layer = source.GetLayerByName(original_name) or next(
+                (x for x in source if x.GetName().lower() == original_name.lower()),
+                None,
+            )
+            return ImportProgressTracker.from_source(
+                execution_id, name, _file, source_layer
+            )
+    except Exception as e:
+        logger.warning(f"Cannot read the source layer {original_name}: {e}")
+    return ImportProgressTracker(execution_id, name)
+
+
+def translate_with_gdal(
+    files: dict,
+    original_name: str,
+    handler_module_path: str,
+    ovverwrite_layer=False,
+    alternate=None,
+    callback=None,
+    chunk=None,
+    execution_id=None,
+):
+    """
+    Run the same translation of the ogr2ogr command in-process
+    via gdal.VectorTranslate. Instead of parsing the stderr, the
+    errors are collected from the GDAL error handler and returned as:
+    [
+        {'class': 3, 'code': 1, 'message': 'error message'}
+    ]
+    an empty list means that the translation is completed successfully
+    """
+    create_options = orchestrator.load_handler(
+        handler_module_path
+    ).create_vectortranslate_options
+    options = create_options(
+        files,
+        original_name,
+        ovverwrite_layer,
+        alternate,
+        **_get_execution_kwargs(create_options, execution_id),
+    )
+    if callback is not None:
+        options["translate_options"]["callback"] = callback
+    if chunk:
+        options["translate_options"]["where"] = chunk["where"]
+        if chunk.get("append"):
+            options["translate_options"]["accessMode"] = "append"
+        else:
+            # the first chunk let the DB assign the FID, so the appended one wont collide
+            options["translate_options"]["options"] = ["-unsetFid"]
+        if IMPORTER_IDEMPOTENT_TASKS:
+            # the chunk is loaded in a single transaction, a redelivery never finds it partially appended
+            options["translate_options"].setdefault("options", []).extend(
+                ["-gt", "unlimited"]
+            )
+    errors = []
+
+    def _error_handler(err_class, err_no, message):
+        if err_class >= gdal.CE_Failure:
+            errors.append({"class": err_class, "code": err_no, "message": message})
+        else:
+            logger.debug(f"GDAL message for layer {alternate}: {message}")
+
+    for key, value in options["config_options"].items():
+        gdal.SetThreadLocalConfigOption(key, value)
+    gdal.PushErrorHandler(_error_handler)
+    try:
+        source = gdal.OpenEx(
+            files.get("base_file"),
+            gdal.OF_VECTOR,
+            open_options=options["open_options"],
+        )
+        if source is None:
+            if not errors:
+                errors.append(
+                    {"class": gdal.CE_Failure, "code": 0, "message": "Unable to open the source file"}
+                )
+            return errors
+
+        result = gdal.VectorTranslate(
+            options["destination"],
+            source,
+            options=gdal.VectorTranslateOptions(**options["translate_options"]),
+        )
+        if result is None and not errors:
+            errors.append(
+                {"class": gdal.CE_Failure, "code": 0, "message": "VectorTranslate failed"}
+            )
+        # dereferencing the datasets, flush and close them
+        result = None
+        source = None
+    finally:
+        gdal.PopErrorHandler()
+        for key in options["config_options"].keys():
+            gdal.SetThreadLocalConfigOption(key, None)
+    return errors
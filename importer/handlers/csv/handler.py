@@ -146,6 +146,26 @@ class CSVFileHandler(BaseVectorFileHandler):
             + additional_option
         )
 
+    @staticmethod
+    def create_vectortranslate_options(files, original_name, ovverwrite_layer, alternate):
+        """
+        Define the gdal.VectorTranslate options, equivalent
+        to the ones used in create_ogr2ogr_command
+        """
+        options = BaseVectorFileHandler.create_vectortranslate_options(
+            files, original_name, ovverwrite_layer, alternate
+        )
+        options["open_options"] += [
+            "KEEP_GEOM_COLUMNS=NO",
+            "GEOM_POSSIBLE_NAMES=geom*,the_geom*,wkt_geom",
+            "X_POSSIBLE_NAMES=x,long*",
+            "Y_POSSIBLE_NAMES=y,lat*",
+        ]
+        options["translate_options"]["layerCreationOptions"] += [
+            f"GEOMETRY_NAME={BaseVectorFileHandler().default_geometry_column_name}"
+        ]
+        return options
+
     def create_dynamic_model_fields(
         self,
         layer: str,
@@ -237,16 +257,14 @@ class CSVFileHandler(BaseVectorFileHandler):
                 }
             ]
 
-        layers = self.get_ogr2ogr_driver().Open(files.get("base_file"), 0)
-        if not layers:
-            return []
+        manifest = self.get_inspection_manifest(files, kwargs.get("execution_id"))
         return [
             {
                 "name": alternate or layer_name,
-                "crs": (self.identify_authority(_l)),
+                "crs": _l.get("crs"),
             }
-            for _l in layers
-            if self.fixup_name(_l.GetName()) == layer_name
+            for _l in manifest.get("layers", [])
+            if self.fixup_name(_l.get("name")) == layer_name
         ]
 
     def identify_authority(self, layer):
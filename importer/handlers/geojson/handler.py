@@ -1,8 +1,8 @@
-import json
 import logging
 import os
 from geonode.resource.enumerator import ExecutionRequestAction as exa
 from geonode.upload.utils import UploadLimitValidator
+from importer.handlers.common.json_stream import sniff_json, validate_json
 from importer.handlers.common.vector import BaseVectorFileHandler
 from osgeo import ogr
 from importer.utils import ImporterRequestAction as ira
@@ -18,6 +18,10 @@ class GeoJsonFileHandler(BaseVectorFileHandler):
     It must provide the task_lists required to comple the upload
     """
 
+    # https://datatracker.ietf.org/doc/html/rfc7946#section-2
+    # the GeoJSON text is always a JSON object
+    MAGIC_BYTES = (b"{",)
+
     ACTIONS = {
         exa.IMPORT.value: (
             "start_import",
@@ -64,13 +68,8 @@ class GeoJsonFileHandler(BaseVectorFileHandler):
             https://datatracker.ietf.org/doc/html/rfc7946#section-1.4
             """
             try:
-                _file = base
-                if isinstance(base, str):
-                    with open(base, "r") as f:
-                        _file = json.loads(f.read())
-                else:
-                    _file = json.loads(base.read())
-
+                # only the top-level "type" is read, the features are skipped
+                _file = sniff_json(base, keys={"type"}, read_values=("type",))
                 return _file.get("type", None) in ["FeatureCollection", "Feature"]
 
             except Exception:
@@ -102,8 +101,8 @@ class GeoJsonFileHandler(BaseVectorFileHandler):
             )
 
         try:
-            with open(_file, "r") as _readed_file:
-                json.loads(_readed_file.read())
+            # the features are validated one by one to not load the whole file
+            validate_json(_file, streamed_keys=("features",))
         except Exception:
             raise InvalidGeoJsonException("The provided GeoJson is not valid")
 
@@ -123,3 +122,17 @@ class GeoJsonFileHandler(BaseVectorFileHandler):
             files, original_name, ovverwrite_layer, alternate
         )
         return f"{base_command } -lco GEOMETRY_NAME={BaseVectorFileHandler().default_geometry_column_name}"
+
+    @staticmethod
+    def create_vectortranslate_options(files, original_name, ovverwrite_layer, alternate):
+        """
+        Define the gdal.VectorTranslate options, equivalent
+        to the ones used in create_ogr2ogr_command
+        """
+        options = BaseVectorFileHandler.create_vectortranslate_options(
+            files, original_name, ovverwrite_layer, alternate
+        )
+        options["translate_options"]["layerCreationOptions"] += [
+            f"GEOMETRY_NAME={BaseVectorFileHandler().default_geometry_column_name}"
+        ]
+        return options
@@ -57,6 +57,14 @@ class GPKGFileHandler(BaseVectorFileHandler):
         """
         return False
 
+    @property
+    def can_import_in_chunks(self) -> bool:
+        """
+        The GPKG driver can filter the features by FID
+        so big layers can be imported in parallel
+        """
+        return True
+
     @staticmethod
     def can_handle(_data) -> bool:
         """
@@ -1,13 +1,12 @@
 import logging
 
-from celery import Task
-
 from importer.handlers.utils import evaluate_error
+from importer.idempotency import IdempotentTask
 
 logger = logging.getLogger(__name__)
 
 
-class SingleMessageErrorHandler(Task):
+class SingleMessageErrorHandler(IdempotentTask):
     max_retries = 1
     track_started = True
 
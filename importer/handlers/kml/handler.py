@@ -136,3 +136,18 @@ class KMLFileHandler(BaseVectorFileHandler):
             files, original_name, ovverwrite_layer, alternate
         )
         return f"{base_command } -lco GEOMETRY_NAME={BaseVectorFileHandler().default_geometry_column_name} --config OGR_SKIP LibKML"
+
+    @staticmethod
+    def create_vectortranslate_options(files, original_name, ovverwrite_layer, alternate):
+        """
+        Define the gdal.VectorTranslate options, equivalent
+        to the ones used in create_ogr2ogr_command
+        """
+        options = BaseVectorFileHandler.create_vectortranslate_options(
+            files, original_name, ovverwrite_layer, alternate
+        )
+        options["config_options"]["OGR_SKIP"] = "LibKML"
+        options["translate_options"]["layerCreationOptions"] += [
+            f"GEOMETRY_NAME={BaseVectorFileHandler().default_geometry_column_name}"
+        ]
+        return options
@@ -52,6 +52,14 @@ class ShapeFileHandler(BaseVectorFileHandler):
             "optional": ["xml", "sld", "cpg", "cst"],
         }
 
+    @property
+    def can_import_in_chunks(self) -> bool:
+        """
+        The Shapefile driver can filter the features by FID
+        so big layers can be imported in parallel
+        """
+        return True
+
     @staticmethod
     def can_handle(_data) -> bool:
         """
@@ -145,7 +153,9 @@ class ShapeFileHandler(BaseVectorFileHandler):
         return ogr.GetDriverByName("ESRI Shapefile")
 
     @staticmethod
-    def create_ogr2ogr_command(files, original_name, ovverwrite_layer, alternate):
+    def create_ogr2ogr_command(
+        files, original_name, ovverwrite_layer, alternate, execution_id=None
+    ):
         """
         Define the ogr2ogr command to be executed.
         This is a default command that is needed to import a vector file
@@ -153,15 +163,14 @@ class ShapeFileHandler(BaseVectorFileHandler):
         base_command = BaseVectorFileHandler.create_ogr2ogr_command(
             files, original_name, ovverwrite_layer, alternate
         )
-        layers = ogr.Open(files.get("base_file"))
-        layer = layers.GetLayer(original_name)
+        geometry_type = ShapeFileHandler._get_geometry_type(
+            files, original_name, execution_id
+        )
 
         encoding = ShapeFileHandler._get_encoding(files)
 
         additional_options = []
-        if layer is not None and "Point" not in ogr.GeometryTypeToName(
-            layer.GetGeomType()
-        ):
+        if geometry_type is not None and "Point" not in geometry_type:
             additional_options.append("-nlt PROMOTE_TO_MULTI")
         if encoding:
             additional_options.append(f"--config SHAPE_ENCODING {encoding}")
@@ -171,6 +180,52 @@ class ShapeFileHandler(BaseVectorFileHandler):
             + " ".join(additional_options)
         )
 
+    @staticmethod
+    def create_vectortranslate_options(
+        files, original_name, ovverwrite_layer, alternate, execution_id=None
+    ):
+        """
+        Define the gdal.VectorTranslate options, equivalent
+        to the ones used in create_ogr2ogr_command
+        """
+        options = BaseVectorFileHandler.create_vectortranslate_options(
+            files, original_name, ovverwrite_layer, alternate
+        )
+        geometry_type = ShapeFileHandler._get_geometry_type(
+            files, original_name, execution_id
+        )
+
+        encoding = ShapeFileHandler._get_encoding(files)
+
+        if geometry_type is not None and "Point" not in geometry_type:
+            options["translate_options"]["geometryType"] = "PROMOTE_TO_MULTI"
+        if encoding:
+            options["config_options"]["SHAPE_ENCODING"] = encoding
+
+        options["translate_options"]["layerCreationOptions"] += [
+            "precision=no",
+            f"GEOMETRY_NAME={BaseVectorFileHandler().default_geometry_column_name}",
+        ]
+        return options
+
+    @staticmethod
+    def _get_geometry_type(files, original_name, execution_id=None):
+        """
+        Return the geometry type of the layer. If the import is in progress
+        is taken from the inspection manifest of the execution
+        """
+        if execution_id:
+            layer_info = ShapeFileHandler().get_layer_info(
+                files, original_name, execution_id
+            )
+            if layer_info is not None:
+                return layer_info.get("geometry_type")
+        layers = ogr.Open(files.get("base_file"))
+        layer = layers.GetLayer(original_name)
+        if layer is None:
+            return None
+        return ogr.GeometryTypeToName(layer.GetGeomType())
+
     @staticmethod
     def _get_encoding(files):
         if files.get("cpg_file"):
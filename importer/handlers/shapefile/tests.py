@@ -123,6 +123,22 @@ class TestShapeFileFileHandler(TestCase):
             _file.assert_called_once_with(cst_file, "r")
             self.assertIn("--config SHAPE_ENCODING UTF-8", actual)
 
+    def test_should_create_vectortranslate_options_with_encoding_from_cst(self):
+        shp_with_cst = self.valid_shp.copy()
+        cst_file = self.valid_shp["base_file"].replace("shp", "cst")
+        shp_with_cst["cst_file"] = cst_file
+        patch_location = "importer.handlers.shapefile.handler.open"
+        with patch(patch_location, new=mock_open(read_data="UTF-8")) as _file:
+            actual = self.handler.create_vectortranslate_options(
+                shp_with_cst, "a", False, "a"
+            )
+
+            _file.assert_called_once_with(cst_file, "r")
+            self.assertEqual("UTF-8", actual["config_options"]["SHAPE_ENCODING"])
+            self.assertIn(
+                "precision=no", actual["translate_options"]["layerCreationOptions"]
+            )
+
     @patch("importer.handlers.common.vector.Popen")
     def test_import_with_ogr2ogr_without_errors_should_call_the_right_command(
         self, _open
@@ -1,12 +1,18 @@
+from unittest.mock import patch
 from django.test import TestCase
 from geonode.base.populate_test_data import create_single_dataset
 from django.contrib.auth import get_user_model
 from dynamic_models.models import ModelSchema
 from importer.handlers.utils import (
+    ImportProgressTracker,
+    _identify_authority_from_wkt,
     create_alternate,
     drop_dynamic_model_schema,
+    identify_authority,
     should_be_imported,
 )
+from importer.models import CRSAuthority
+from osgeo import osr
 
 
 class TestHandlersUtils(TestCase):
@@ -69,3 +75,50 @@ class TestHandlersUtils(TestCase):
         drop_dynamic_model_schema(schema_model=_model_schema)
 
         self.assertFalse(ModelSchema.objects.filter(name="model_schema").exists())
+
+    @patch("importer.orchestrator.orchestrator.merge_execution_request_output_params")
+    def test_progress_tracker_should_throttle_the_updates(self, _merge):
+        tracker = ImportProgressTracker(
+            "exec_id", "layer", features_total=100, bytes_total=1000, interval=60
+        )
+        tracker.start()
+        tracker.update(0.5)
+        self.assertEqual(1, _merge.call_count)
+
+        tracker.done()
+        self.assertEqual(2, _merge.call_count)
+        _, key, payload = _merge.call_args[0]
+        self.assertEqual("progress", key)
+        self.assertEqual(100, payload["layer"]["features_read"])
+        self.assertEqual(1000, payload["layer"]["bytes_copied"])
+        self.assertEqual("done", payload["layer"]["status"])
+
+    @patch("importer.orchestrator.orchestrator.merge_execution_request_output_params")
+    def test_progress_tracker_gdal_callback_should_continue_the_translation(
+        self, _merge
+    ):
+        _merge.side_effect = Exception("db is down")
+        tracker = ImportProgressTracker("exec_id", "layer", features_total=10)
+        self.assertEqual(1, tracker.gdal_callback(0.1, None, None))
+
+    def test_identify_authority_should_be_memoized_and_saved(self):
+        spatial_ref = osr.SpatialReference()
+        spatial_ref.ImportFromEPSG(32632)
+        _identify_authority_from_wkt.cache_clear()
+
+        self.assertEqual("EPSG:32632", identify_authority(spatial_ref))
+        self.assertTrue(
+            CRSAuthority.objects.filter(authority="EPSG:32632").exists()
+        )
+
+        with patch("importer.handlers.utils._resolve_authority") as _resolve:
+            # resolved from the in-memory cache
+            self.assertEqual("EPSG:32632", identify_authority(spatial_ref))
+            # resolved from the table, as a new worker would do
+            _identify_authority_from_wkt.cache_clear()
+            self.assertEqual("EPSG:32632", identify_authority(spatial_ref))
+            _resolve.assert_not_called()
+
+    def test_identify_authority_without_crs_should_raise(self):
+        with self.assertRaises(Exception):
+            identify_authority(None)
@@ -9,6 +9,7 @@ from geonode.upload.utils import UploadLimitValidator
 from importer.handlers.tiles3d.utils import box_to_wgs84, sphere_to_wgs84
 from importer.orchestrator import orchestrator
 from importer.celery_tasks import import_orchestrator
+from importer.handlers.common.json_stream import sniff_json
 from importer.handlers.common.vector import BaseVectorFileHandler
 from importer.handlers.utils import create_alternate, should_be_imported
 from importer.utils import ImporterRequestAction as ira
@@ -24,6 +25,13 @@ class Tiles3DFileHandler(BaseVectorFileHandler):
     It must provide the task_lists required to comple the upload
     """
 
+    # required key described in the specification of 3dtiles
+    # https://docs.ogc.org/cs/22-025r4/22-025r4.html#toc92
+    MANDATORY_KEYS = ("asset", "geometricError", "root")
+
+    # the tileset is a JSON object
+    MAGIC_BYTES = (b"{",)
+
     ACTIONS = {
         exa.IMPORT.value: (
             "start_import",
@@ -61,7 +69,7 @@ class Tiles3DFileHandler(BaseVectorFileHandler):
             if not base:
                 return False
             ext = base.split(".")[-1] if isinstance(base, str) else base.name.split(".")[-1]
-            if ext in ["json"] and Tiles3DFileHandler.is_3dtiles_json(base):
+            if ext in ["json"] and Tiles3DFileHandler.has_3dtiles_keys(base):
                 return True
         except Exception:
             return False
@@ -101,13 +109,23 @@ class Tiles3DFileHandler(BaseVectorFileHandler):
 
         return True
         
+    @staticmethod
+    def has_3dtiles_keys(_file):
+        """
+        Check the mandatory keys of the 3dtiles by streaming the file,
+        so big JSON files of other formats are not loaded in memory
+        """
+        return len(sniff_json(_file, keys=Tiles3DFileHandler.MANDATORY_KEYS)) == len(
+            Tiles3DFileHandler.MANDATORY_KEYS
+        )
+
     @staticmethod
     def is_3dtiles_json(_file):
         with open(_file, "r") as _readed_file:
             _file = json.loads(_readed_file.read())
-            # required key described in the specification of 3dtiles
-            # https://docs.ogc.org/cs/22-025r4/22-025r4.html#toc92
-        is_valid = all(key in _file.keys() for key in ("asset", "geometricError", "root"))
+        is_valid = all(
+            key in _file.keys() for key in Tiles3DFileHandler.MANDATORY_KEYS
+        )
 
         if not is_valid:
             raise Invalid3DTilesException(
@@ -165,6 +183,7 @@ class Tiles3DFileHandler(BaseVectorFileHandler):
         orchestrator.update_execution_request_status(
             execution_id=str(execution_id), input_params=_input
         )
+        orchestrator.set_expected_layers(execution_id, 1)
         filename = (
             _exec.input_params.get("original_zip_name")
             or Path(files.get("base_file")).stem
@@ -1,4 +1,9 @@
 import hashlib
+import inspect
+import os
+import re
+import time
+from functools import lru_cache
 
 from django.contrib.auth import get_user_model
 from geonode.base.models import ResourceBase
@@ -8,7 +13,16 @@ from dynamic_models.schema import ModelSchemaEditor
 from django.utils.module_loading import import_string
 from uuid import UUID
 
+import pyproj
+from osgeo import osr
+
+from importer.metrics import metrics
 from importer.publisher import DataPublisher
+from importer.settings import (
+    IMPORTER_BATCH_PUBLISHING,
+    IMPORTER_CRS_CACHE_SIZE,
+    IMPORTER_PROGRESS_UPDATE_INTERVAL,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -98,6 +112,76 @@ def get_uuid(_list):
             continue
 
 
+def identify_authority(spatial_ref) -> str:
+    """
+    Return the authority code (like EPSG:4326) of the spatial reference.
+    The resolution is memoized by the normalized WKT in the worker
+    and saved in the CRSAuthority table for the other workers
+    """
+    if spatial_ref is None:
+        raise Exception("The CRS is not available")
+    return _identify_authority_from_wkt(" ".join(spatial_ref.ExportToWkt().split()))
+
+
+@lru_cache(maxsize=IMPORTER_CRS_CACHE_SIZE)
+def _identify_authority_from_wkt(wkt: str) -> str:
+    from importer.models import CRSAuthority
+
+    wkt_hash = hashlib.sha256(wkt.encode()).hexdigest()
+    try:
+        saved = CRSAuthority.objects.filter(wkt_hash=wkt_hash).first()
+        if saved is not None:
+            return saved.authority
+    except Exception as e:
+        logger.warning(f"Cannot read the CRS authority cache: {e}")
+
+    authority = _resolve_authority(wkt)
+    if "None" not in authority:
+        try:
+            CRSAuthority.objects.get_or_create(
+                wkt_hash=wkt_hash, defaults={"authority": authority}
+            )
+        except Exception as e:
+            logger.warning(f"Cannot save the CRS authority cache: {e}")
+    return authority
+
+
+def _resolve_authority(wkt: str) -> str:
+    spatial_ref = osr.SpatialReference(wkt)
+    try:
+        _name = "EPSG"
+        _code = pyproj.CRS(wkt).to_epsg(min_confidence=20)
+        if _code is None:
+            layer_proj4 = spatial_ref.ExportToProj4()
+            _code = pyproj.CRS(layer_proj4).to_epsg(min_confidence=20)
+            if _code is None:
+                raise Exception(
+                    "CRS authority code not found, fallback to default behaviour"
+                )
+    except Exception:
+        spatial_ref.AutoIdentifyEPSG()
+        _name = spatial_ref.GetAuthorityName(None) or spatial_ref.GetAttrValue(
+            "AUTHORITY", 0
+        )
+        _code = (
+            spatial_ref.GetAuthorityCode("PROJCS")
+            or spatial_ref.GetAuthorityCode("GEOGCS")
+            or spatial_ref.GetAttrValue("AUTHORITY", 1)
+        )
+    return f"{_name}:{_code}"
+
+
+def get_task_layer(celery_task, args, kwargs):
+    """
+    Return the alternate of the layer processed by the task, None if not available
+    """
+    try:
+        arguments = inspect.signature(celery_task.run).bind(*args, **kwargs).arguments
+    except (TypeError, ValueError):
+        return None
+    return arguments.get("alternate")
+
+
 def evaluate_error(celery_task, exc, task_id, args, kwargs, einfo):
     """
     Main error function used by the task for the "on_failure" function
@@ -105,7 +189,6 @@ def evaluate_error(celery_task, exc, task_id, args, kwargs, einfo):
     from importer.celery_tasks import orchestrator
 
     exec_id = orchestrator.get_execution_object(exec_id=get_uuid(args))
-    output_params = exec_id.output_params.copy()
 
     if exec_id.status == ExecutionRequest.STATUS_FAILED:
         logger.info("Execution is already in status FAILED")
@@ -113,28 +196,159 @@ def evaluate_error(celery_task, exc, task_id, args, kwargs, einfo):
 
     logger.error(f"Task FAILED with ID: {str(exec_id.exec_id)}, reason: {exc}")
 
-    handler = import_string(exec_id.input_params.get("handler_module_path"))
+    handler_module_path = exec_id.input_params.get("handler_module_path")
+    handler = import_string(handler_module_path)
 
     # creting the log message
     _log = handler.create_error_log(exc, celery_task.name, *args)
 
-    if output_params.get("errors"):
-        output_params.get("errors").append(_log)
-        output_params.get("failed_layers", []).append(args[-1] if args else [])
-        failed = list(set(output_params.get("failed_layers", [])))
-        output_params["failed_layers"] = failed
-    else:
-        output_params = {"errors": [_log], "failed_layers": [args[-1]]}
-
     celery_task.update_state(
         task_id=task_id,
         state="FAILURE",
         meta={"exec_id": str(exec_id.exec_id), "reason": _log},
     )
-    orchestrator.update_execution_request_status(
-        execution_id=str(exec_id.exec_id), output_params=output_params
+    orchestrator.add_execution_request_error(
+        str(exec_id.exec_id), _log, failed_layer=args[-1] if args else None
+    )
+
+    progress = orchestrator.increment_execution_progress(
+        str(exec_id.exec_id), "failed_layers"
     )
+    if IMPORTER_BATCH_PUBLISHING:
+        # the failed layer can be the last one awaited by the batch publishing
+        from importer.celery_tasks import publish_resources_batch
 
+        # without the layer, the failure is counted once per task
+        failed_layer = get_task_layer(celery_task, args, kwargs or {}) or task_id
+        if orchestrator.add_to_publishing_batch(
+            str(exec_id.exec_id), failed_layer=failed_layer
+        ):
+            publish_resources_batch.apply_async(
+                (str(exec_id.exec_id),),
+                {"handler_module_path": handler_module_path},
+            )
     orchestrator.evaluate_execution_progress(
-        get_uuid(args), _log=str(exc.detail if hasattr(exc, "detail") else exc.args[0])
+        get_uuid(args),
+        _log=str(exc.detail if hasattr(exc, "detail") else exc.args[0]),
+        progress=progress,
     )
+
+
+# the percentages printed by "ogr2ogr -progress": 0...10...20... 100 - done.
+OGR2OGR_PROGRESS = re.compile(rb"(\d+)(?=[.\s])")
+
+
+class ImportProgressTracker:
+    """
+    Stream the progress of the load of a layer into the output_params
+    of the ExecutionRequest under the "progress" key:
+    {
+        "progress": {
+            "layer_alternate": {
+                "features_total": 1000, "features_read": 500, "bytes_total": 2048,
+                "bytes_copied": 1024, "rows_per_sec": 250.0, "percentage": 50.0,
+                "elapsed": 2.0, "status": "running"
+            }
+        }
+    }
+    The updates are throttled to one every IMPORTER_PROGRESS_UPDATE_INTERVAL seconds
+    """
+
+    def __init__(
+        self,
+        execution_id: str,
+        layer: str,
+        features_total: int = 0,
+        bytes_total: int = 0,
+        interval: float = IMPORTER_PROGRESS_UPDATE_INTERVAL,
+    ):
+        self.execution_id = execution_id
+        self.layer = layer
+        self.features_total = max(features_total or 0, 0)
+        self.bytes_total = bytes_total or 0
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_update = None
+        self.complete = 0
+        self._output = b""
+
+    @classmethod
+    def from_source(cls, execution_id, layer, source_file, source_layer):
+        """
+        Initialize the tracker by reading the totals from the source
+        """
+        features_total = 0
+        bytes_total = 0
+        try:
+            features_total = source_layer.GetFeatureCount() if source_layer else 0
+            bytes_total = os.path.getsize(source_file)
+        except Exception as e:
+            logger.warning(f"Cannot evaluate the size of the layer {layer}: {e}")
+        return cls(execution_id, layer, features_total, bytes_total)
+
+    def update(self, complete: float, status="running", force=False):
+        self.complete = complete
+        now = time.monotonic()
+        if (
+            not force
+            and self.last_update is not None
+            and now - self.last_update < self.interval
+        ):
+            return
+        self.last_update = now
+        elapsed = max(now - self.started, 0.001)
+        features_read = int(self.features_total * complete)
+        try:
+            from importer.orchestrator import orchestrator
+
+            orchestrator.merge_execution_request_output_params(
+                self.execution_id,
+                "progress",
+                {
+                    self.layer: {
+                        "features_total": self.features_total,
+                        "features_read": features_read,
+                        "bytes_total": self.bytes_total,
+                        "bytes_copied": int(self.bytes_total * complete),
+                        "rows_per_sec": round(features_read / elapsed, 2),
+                        "percentage": round(complete * 100, 2),
+                        "elapsed": round(elapsed, 2),
+                        "status": status,
+                    }
+                },
+            )
+        except Exception as e:
+            # the progress must never break the import
+            logger.warning(f"Error during the progress update for {self.layer}: {e}")
+
+    def start(self):
+        self.update(0, force=True)
+
+    def done(self):
+        self.update(1, status="done", force=True)
+        metrics.inc("importer_features_total", self.features_total)
+        metrics.inc("importer_bytes_total", self.bytes_total)
+
+    def failed(self):
+        self.update(self.complete, status="failed", force=True)
+
+    def ogr2ogr_output(self, data: bytes):
+        """
+        Read the percentages from the output of "ogr2ogr -progress",
+        the output can be received in any number of parts
+        """
+        self._output += data
+        last = None
+        for last in OGR2OGR_PROGRESS.finditer(self._output):
+            pass
+        if last is None:
+            return
+        self._output = self._output[last.end():]
+        self.update(min(int(last.group(1)), 100) / 100)
+
+    def gdal_callback(self, complete, message, data):
+        """
+        Progress callback with the signature expected by gdal.VectorTranslate
+        """
+        self.update(complete)
+        return 1
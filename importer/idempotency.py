@@ -0,0 +1,82 @@
+import inspect
+import logging
+
+from celery import Task
+
+from importer.handlers.utils import get_uuid
+from importer.settings import IMPORTER_IDEMPOTENT_TASKS
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotentTask(Task):
+    """
+    Base task which makes the repeated deliveries of a step a no-op.
+    The step is identified by (exec_id, task name, layer), where the layer is the
+    alternate argument of the task (and the chunk, if any), and it is claimed
+    atomically before running:
+    - already completed: the delivery is ignored and the saved result returned
+    - claimed by another task: the step is dispatched twice, the delivery is ignored
+    - claimed by the same task: the delivery is the redelivery of an interrupted run,
+      the step runs again and the task can check it with is_redelivered
+    If the step fails the claim is released, so it can be retried or resumed.
+    Enabled with IMPORTER_IDEMPOTENT_TASKS for the tasks declared with idempotent=True
+    """
+
+    idempotent = False
+
+    def get_step_key(self, args, kwargs):
+        try:
+            arguments = inspect.signature(self.run).bind(*args, **kwargs).arguments
+        except TypeError:
+            return None
+        exec_id = get_uuid(args) or get_uuid(kwargs.values())
+        layer = arguments.get("alternate")
+        if not exec_id or not layer:
+            return None
+        chunk = arguments.get("chunk")
+        if chunk:
+            layer = f"{layer}:chunk_{chunk.get('index')}"
+        return str(exec_id), self.name, layer
+
+    def __call__(self, *args, **kwargs):
+        key = (
+            self.get_step_key(args, kwargs)
+            if self.idempotent and IMPORTER_IDEMPOTENT_TASKS
+            else None
+        )
+        if key is None:
+            return super().__call__(*args, **kwargs)
+
+        from importer.models import ExecutionStep
+
+        exec_id, step, layer = key
+        task_id = self.request.id
+        # the unique constraint let only one delivery create the claim
+        claim, created = ExecutionStep.objects.get_or_create(
+            exec_id=exec_id, step=step, layer=layer, defaults={"task_id": task_id}
+        )
+        if not created and (claim.completed or claim.task_id != task_id):
+            logger.warning(
+                f"Step {step} of the layer {layer} already performed for the execution {exec_id}, delivery ignored"
+            )
+            return claim.result
+        self.request.redelivered_step = not created
+
+        try:
+            result = super().__call__(*args, **kwargs)
+        except BaseException:
+            ExecutionStep.objects.filter(pk=claim.pk).delete()
+            raise
+        try:
+            ExecutionStep.objects.filter(pk=claim.pk).update(completed=True, result=result)
+        except (TypeError, ValueError):
+            ExecutionStep.objects.filter(pk=claim.pk).update(completed=True)
+        return result
+
+
+def is_redelivered(task) -> bool:
+    """
+    True if the task is running again a step interrupted before its completion
+    """
+    return bool(getattr(task.request, "redelivered_step", False))
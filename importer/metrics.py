@@ -0,0 +1,217 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.db import connections
+from django.utils import timezone
+
+from importer.settings import IMPORTER_METRICS, IMPORTER_METRICS_CACHE
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+
+class MetricsRegistry:
+    """
+    Aggregated metrics of the importer. The workers collect them in the
+    IMPORTER_METRICS_CACHE (shared with the web application, like redis)
+    and the web application exposes them in the Prometheus text format.
+    The histograms keep the count of each bucket, the sum is saved in milliseconds
+    since the cache can increment only integers
+    """
+
+    PREFIX = "importer:metrics"
+
+    HISTOGRAMS = {
+        "importer_task_duration_seconds": "Duration of the importer tasks",
+        "importer_step_duration_seconds": "Duration of the handler methods",
+        "importer_service_call_duration_seconds": "Duration of the calls to GeoServer and to the datastore",
+    }
+    COUNTERS = {
+        "importer_task_db_queries_total": "DB queries performed by the importer tasks",
+        "importer_layers_total": "Layers processed by the executions",
+        "importer_features_total": "Features loaded in the datastore",
+        "importer_bytes_total": "Bytes of the files loaded in the datastore",
+    }
+
+    def __init__(self) -> None:
+        self._series = set()
+
+    @property
+    def cache(self):
+        return caches[IMPORTER_METRICS_CACHE]
+
+    @staticmethod
+    def _labels(labels: dict) -> str:
+        return ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+
+    @staticmethod
+    def _braces(*labels) -> str:
+        labels = ",".join(filter(None, labels))
+        return f"{{{labels}}}" if labels else ""
+
+    def _key(self, name, labels, suffix):
+        return f"{self.PREFIX}:{name}:{{{labels}}}:{suffix}"
+
+    def _incr(self, key, value):
+        self.cache.add(key, 0, timeout=None)
+        if value:
+            self.cache.incr(key, value)
+
+    def _register(self, name, labels):
+        """
+        Keep the list of the series observed, used to render them
+        """
+        if (name, labels) in self._series:
+            return
+        registry_key = f"{self.PREFIX}:series"
+        series = self.cache.get(registry_key, [])
+        if (name, labels) not in series:
+            self.cache.set(registry_key, list(series) + [(name, labels)], timeout=None)
+        self._series.add((name, labels))
+
+    def observe(self, name, value, count=1, **labels):
+        """
+        Add count observations of value to the histogram
+        """
+        if not IMPORTER_METRICS:
+            return
+        _labels = self._labels(labels)
+        bucket = next((str(b) for b in DURATION_BUCKETS if value <= b), "+Inf")
+        try:
+            self._register(name, _labels)
+            self._incr(self._key(name, _labels, bucket), count)
+            self._incr(self._key(name, _labels, "count"), count)
+            self._incr(self._key(name, _labels, "sum_ms"), int(value * count * 1000))
+        except Exception as e:
+            logger.warning(f"Cannot record the metric {name}: {e}")
+
+    def inc(self, name, value=1, **labels):
+        if not IMPORTER_METRICS or not value:
+            return
+        _labels = self._labels(labels)
+        try:
+            self._register(name, _labels)
+            self._incr(self._key(name, _labels, "total"), int(value))
+        except Exception as e:
+            logger.warning(f"Cannot record the metric {name}: {e}")
+
+    @contextmanager
+    def timer(self, name="importer_step_duration_seconds", **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, **labels)
+
+    def timed(self, step):
+        """
+        Decorator recording the duration of the method in the
+        importer_step_duration_seconds histogram
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(step=step):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def render(self) -> str:
+        series = self.cache.get(f"{self.PREFIX}:series", [])
+        keys = []
+        for name, labels in series:
+            if name in self.HISTOGRAMS:
+                suffixes = [str(b) for b in DURATION_BUCKETS] + ["+Inf", "count", "sum_ms"]
+            else:
+                suffixes = ["total"]
+            keys += [self._key(name, labels, suffix) for suffix in suffixes]
+        values = self.cache.get_many(keys)
+
+        lines = []
+        for name, description in {**self.HISTOGRAMS, **self.COUNTERS}.items():
+            _series = [labels for _name, labels in series if _name == name]
+            if not _series:
+                continue
+            _type = "histogram" if name in self.HISTOGRAMS else "counter"
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {_type}"]
+            for labels in _series:
+                if _type == "counter":
+                    total = values.get(self._key(name, labels, "total"), 0)
+                    lines.append(f"{name}{self._braces(labels)} {total}")
+                    continue
+                cumulative = 0
+                for bucket in [str(b) for b in DURATION_BUCKETS] + ["+Inf"]:
+                    cumulative += values.get(self._key(name, labels, bucket), 0)
+                    le = self._braces(labels, f'le="{bucket}"')
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                _sum = values.get(self._key(name, labels, "sum_ms"), 0) / 1000
+                count = values.get(self._key(name, labels, "count"), 0)
+                lines.append(f"{name}_sum{self._braces(labels)} {_sum}")
+                lines.append(f"{name}_count{self._braces(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class QueryCounter:
+    """
+    DB execute wrapper counting the queries performed
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class StepTimer:
+    """
+    Measure the duration and the DB queries of the tasks run by the
+    worker. The tasks executed inline are measured on their own,
+    their queries are counted also by the task running them
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    @property
+    def _timers(self) -> dict:
+        if not hasattr(self._local, "timers"):
+            self._local.timers = {}
+        return self._local.timers
+
+    def start(self, task_id):
+        counter = QueryCounter()
+        for alias in connections:
+            connections[alias].execute_wrappers.append(counter)
+        self._timers[task_id] = (time.monotonic(), timezone.now(), counter)
+
+    def stop(self, task_id):
+        """
+        Return the step measured for the task, None if it was not started
+        """
+        timer = self._timers.pop(task_id, None)
+        if timer is None:
+            return None
+        started, started_at, counter = timer
+        for alias in connections:
+            wrappers = connections[alias].execute_wrappers
+            if counter in wrappers:
+                wrappers.remove(counter)
+        return {
+            "started": started_at.isoformat(),
+            "duration": round(time.monotonic() - started, 3),
+            "queries": counter.count,
+        }
+
+
+metrics = MetricsRegistry()
+step_timer = StepTimer()
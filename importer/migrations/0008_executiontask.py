@@ -0,0 +1,33 @@
+# Generated by Django 4.2.9 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("importer", "0007_align_resourcehandler_with_asset"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExecutionTask",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("exec_id", models.UUIDField(db_index=True)),
+                ("task_id", models.CharField(max_length=255, unique=True)),
+                (
+                    "task_name",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
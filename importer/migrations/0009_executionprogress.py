@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("importer", "0008_executiontask"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExecutionProgress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("exec_id", models.UUIDField(unique=True)),
+                ("expected_layers", models.PositiveIntegerField(default=0)),
+                ("completed_layers", models.PositiveIntegerField(default=0)),
+                ("failed_layers", models.PositiveIntegerField(default=0)),
+                ("finalized", models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.9 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("importer", "0009_executionprogress"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CRSAuthority",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("wkt_hash", models.CharField(max_length=64, unique=True)),
+                ("authority", models.CharField(max_length=64)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.9 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("importer", "0011_chunkedupload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="resourcehandlerinfo",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, db_index=True, default=None, max_length=64, null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.9 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("importer", "0012_resourcehandlerinfo_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExecutionCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("exec_id", models.UUIDField(db_index=True)),
+                ("layer_name", models.CharField(max_length=255)),
+                ("alternate", models.CharField(max_length=255)),
+                ("step", models.CharField(max_length=255)),
+                ("handler_module_path", models.CharField(max_length=250)),
+                ("action", models.CharField(max_length=50)),
+                ("kwargs", models.JSONField(default=dict)),
+                ("resumable", models.BooleanField(default=False)),
+                ("error", models.TextField(blank=True, default=None, null=True)),
+                ("last_updated", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "unique_together": {("exec_id", "layer_name")},
+            },
+        ),
+    ]
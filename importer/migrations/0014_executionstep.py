@@ -0,0 +1,45 @@
+# Generated by Django 4.2.9 on 2026-10-17 10:00
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("importer", "0013_executioncheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExecutionStep",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("exec_id", models.UUIDField(db_index=True)),
+                ("step", models.CharField(max_length=255)),
+                ("layer", models.CharField(max_length=512)),
+                ("task_id", models.CharField(blank=True, max_length=255, null=True)),
+                ("completed", models.BooleanField(default=False)),
+                (
+                    "result",
+                    models.JSONField(
+                        blank=True,
+                        default=None,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        null=True,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "unique_together": {("exec_id", "step", "layer")},
+            },
+        ),
+    ]
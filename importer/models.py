@@ -1,5 +1,8 @@
 import logging
+import uuid
 
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
@@ -44,3 +47,111 @@ class ResourceHandlerInfo(models.Model):
     kwargs = models.JSONField(
         verbose_name="Storing strictly related information of the handler", default=dict
     )
+    content_hash = models.CharField(
+        max_length=64, blank=True, null=True, default=None, db_index=True
+    )
+
+
+class ExecutionTask(models.Model):
+    """
+    Ledger of the celery tasks run for an ExecutionRequest.
+    Is used to retrieve the TaskResult of an execution by task_id
+    instead of scanning the task arguments
+    """
+
+    exec_id = models.UUIDField(blank=False, null=False, db_index=True)
+    task_id = models.CharField(max_length=255, blank=False, null=False, unique=True)
+    task_name = models.CharField(max_length=255, blank=True, null=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class ExecutionProgress(models.Model):
+    """
+    Layer counters of an ExecutionRequest. The counters are updated
+    atomically, so the last layer of the execution is detected without
+    counting the ResourceHandlerInfo and the last step is run only once
+    """
+
+    exec_id = models.UUIDField(blank=False, null=False, unique=True)
+    expected_layers = models.PositiveIntegerField(default=0)
+    completed_layers = models.PositiveIntegerField(default=0)
+    failed_layers = models.PositiveIntegerField(default=0)
+    finalized = models.BooleanField(default=False)
+
+
+class ExecutionCheckpoint(models.Model):
+    """
+    Last step completed by each layer of an ExecutionRequest.
+    If a layer fails for a transient error, like a GeoServer timeout,
+    the checkpoint is marked as resumable and the data already loaded is kept,
+    so the execution can be resumed from the step after the checkpoint
+    """
+
+    exec_id = models.UUIDField(blank=False, null=False, db_index=True)
+    layer_name = models.CharField(max_length=255, blank=False, null=False)
+    alternate = models.CharField(max_length=255, blank=False, null=False)
+    step = models.CharField(max_length=255, blank=False, null=False)
+    handler_module_path = models.CharField(max_length=250, blank=False, null=False)
+    action = models.CharField(max_length=50, blank=False, null=False)
+    kwargs = models.JSONField(default=dict)
+    resumable = models.BooleanField(default=False)
+    error = models.TextField(blank=True, null=True, default=None)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("exec_id", "layer_name")
+
+
+class ExecutionStep(models.Model):
+    """
+    Claim and completion of a step of a layer, used to make the
+    repeated deliveries of the same task a no-op (see IdempotentTask)
+    """
+
+    exec_id = models.UUIDField(blank=False, null=False, db_index=True)
+    step = models.CharField(max_length=255, blank=False, null=False)
+    layer = models.CharField(max_length=512, blank=False, null=False)
+    task_id = models.CharField(max_length=255, blank=True, null=True)
+    completed = models.BooleanField(default=False)
+    result = models.JSONField(
+        blank=True, null=True, default=None, encoder=DjangoJSONEncoder
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("exec_id", "step", "layer")
+
+
+class CRSAuthority(models.Model):
+    """
+    Authority code (like EPSG:4326) resolved for a CRS.
+    The CRS is identified by the hash of its normalized WKT, so the slow
+    lookup of the code is done only once for each projection
+    """
+
+    wkt_hash = models.CharField(max_length=64, blank=False, null=False, unique=True)
+    authority = models.CharField(max_length=64, blank=False, null=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class ChunkedUpload(models.Model):
+    """
+    Resumable upload session. The files are sent in chunks and written
+    directly in the asset directory, the import starts once finalized.
+    The state of each file is saved in files:
+    {
+        "base_file": {
+            "name": "file.gpkg", "size": 1024, "offset": 512,
+            "path": "/asset/dir/file.gpkg", "digests": ["sha256 of each chunk"]
+        }
+    }
+    """
+
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    asset_dir = models.CharField(max_length=512, blank=False, null=False)
+    files = models.JSONField(default=dict)
+    params = models.JSONField(default=dict)
+    exec_id = models.UUIDField(blank=True, null=True)
+    created = models.DateTimeField(auto_now_add=True)
+    last_updated = models.DateTimeField(auto_now=True)
@@ -1,13 +1,21 @@
 import logging
+import math
+import threading
+import time
+import warnings
 from typing import Optional
 from uuid import UUID
 
 from celery import states
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
 from django.utils import timezone
 from django.utils.module_loading import import_string
 from django_celery_results.models import TaskResult
+from geonode.resource.enumerator import ExecutionRequestAction as exa
 from geonode.resource.models import ExecutionRequest
 from geonode.storage.manager import storage_manager
 from rest_framework import serializers
@@ -16,11 +24,65 @@ from importer.api.exception import ImportException
 from importer.api.serializer import ImporterSerializer
 from importer.celery_app import importer_app
 from importer.handlers.base import BaseHandler
-from importer.utils import error_handler
+from importer.metrics import metrics
+from importer.settings import (
+    IMPORTER_DEDUPE_POLICY,
+    IMPORTER_FAIR_SCHEDULING,
+    IMPORTER_FUSED_STEPS,
+    IMPORTER_MAX_TASK_PRIORITY,
+    IMPORTER_RESUMABLE,
+    IMPORTER_STATUS_CACHE,
+    IMPORTER_TASK_PRIORITY_TTL,
+)
+from importer.utils import DedupePolicy, compute_content_hash, error_handler
 
 logger = logging.getLogger(__name__)
 
 
+class ExecutionRequestIdentityMap:
+    """
+    Keep the ExecutionRequest loaded during a celery task, so the same row
+    is read once per task instead of once per function. The map is active
+    only between the begin and the end of a task (the tasks executed inline
+    share the map of the task running them), outside of a task the
+    ExecutionRequest is always read from the DB.
+    The orchestrator invalidates the execution each time it is updated
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    @property
+    def active(self) -> bool:
+        return getattr(self._local, "owner", None) is not None
+
+    def begin(self, owner):
+        if not self.active:
+            self._local.owner = owner
+            self._local.objects = {}
+
+    def end(self, owner):
+        if getattr(self._local, "owner", None) == owner:
+            self._local.owner = None
+            self._local.objects = {}
+
+    def get(self, exec_id):
+        if not self.active:
+            return None
+        return self._local.objects.get(str(exec_id))
+
+    def add(self, _exec):
+        if self.active:
+            self._local.objects[str(_exec.exec_id)] = _exec
+
+    def invalidate(self, exec_id):
+        if self.active:
+            self._local.objects.pop(str(exec_id), None)
+
+
+execution_map = ExecutionRequestIdentityMap()
+
+
 class ImportOrchestrator:
     """'
     Main import object. Is responsible to handle all the execution steps
@@ -30,19 +92,27 @@ class ImportOrchestrator:
 
     """
 
+    # seconds for which the version of an execution is kept in the cache
+    VERSION_TIMEOUT = 60 * 60 * 24
+
+    def __init__(self) -> None:
+        # priority of the tasks of each user, with its expiration
+        self._priorities = {}
+        self._priorities_lock = threading.Lock()
+
     def get_handler(self, _data) -> Optional[BaseHandler]:
         """
         If is part of the supported format, return the handler which can handle the import
         otherwise return None
         """
-        for handler in BaseHandler.get_registry():
+        for handler in BaseHandler.get_candidates(_data):
             if handler.can_handle(_data):
                 return handler()
         logger.error("Handler not found")
         return None
 
     def get_serializer(self, _data) -> serializers.Serializer:
-        for handler in BaseHandler.get_registry():
+        for handler in BaseHandler.get_candidates(_data):
             _serializer = handler.has_serializer(_data)
             if _serializer:
                 return _serializer
@@ -56,21 +126,25 @@ class ImportOrchestrator:
             raise ImportException(detail=f"The handler is not available: {module_path}")
 
     def load_handler_by_id(self, handler_id):
-        for handler in BaseHandler.get_registry():
-            if handler().id == handler_id:
-                return handler
-        logger.error("Handler not found")
-        return None
+        handler = BaseHandler.get_handler_by_id(handler_id)
+        if handler is None:
+            logger.error("Handler not found")
+        return handler
 
-    def get_execution_object(self, exec_id):
+    def get_execution_object(self, exec_id, raise_exception=True):
         """
         Returns the ExecutionRequest object with the detail about the
-        current execution
+        current execution. Inside a task the object is taken from the execution_map
         """
-        req = ExecutionRequest.objects.filter(exec_id=exec_id)
-        if not req.exists():
-            raise ImportException("The selected UUID does not exists")
-        return req.first()
+        _exec = execution_map.get(exec_id)
+        if _exec is None:
+            _exec = ExecutionRequest.objects.filter(exec_id=exec_id).first()
+            if _exec is None:
+                if raise_exception:
+                    raise ImportException("The selected UUID does not exists")
+                return None
+            execution_map.add(_exec)
+        return _exec
 
     def perform_next_step(
         self,
@@ -94,9 +168,20 @@ class ImportOrchestrator:
                 step = _exec_obj.step
 
             # retrieve the task list for the resource_type
-            tasks = self.load_handler(handler_module_path).get_task_list(action=action)
+            handler = self.load_handler(handler_module_path)
+            tasks = handler.get_task_list(action=action)
             # getting the index
             _index = tasks.index(step) + 1
+            if IMPORTER_RESUMABLE and layer_name and alternate:
+                self.save_checkpoint(
+                    execution_id,
+                    step,
+                    layer_name,
+                    alternate,
+                    handler_module_path,
+                    action,
+                    kwargs.get("kwargs", {}),
+                )
             if _index == 1:
                 """
                 Means that the first task is available and we set the executions state as running
@@ -106,12 +191,19 @@ class ImportOrchestrator:
                     execution_id=str(_exec_obj.exec_id),
                     status=ExecutionRequest.STATUS_RUNNING,
                 )
+                if action == exa.IMPORT.value and self.apply_dedupe_policy(_exec_obj):
+                    return
             # finding in the task_list the last step done
             remaining_tasks = tasks[_index:] if not _index >= len(tasks) else []
             if not remaining_tasks:
                 # The list of task is empty, it means that the process is finished
+                progress = self.increment_execution_progress(
+                    execution_id, "completed_layers"
+                )
                 self.evaluate_execution_progress(
-                    execution_id, handler_module_path=handler_module_path
+                    execution_id,
+                    handler_module_path=handler_module_path,
+                    progress=progress,
                 )
                 return
             # getting the next step to perform
@@ -143,7 +235,17 @@ class ImportOrchestrator:
                 )
 
             # continuing to the next step
-            importer_app.tasks.get(next_step).apply_async(task_params, kwargs)
+            next_task = importer_app.tasks.get(next_step)
+            if self.can_fuse_step(handler, next_step):
+                # the step is executed in this worker, the errors are
+                # handled by the on_failure of the task as for the queued ones
+                next_task.apply(task_params, kwargs)
+            else:
+                next_task.apply_async(
+                    task_params,
+                    kwargs,
+                    **self.get_task_options(_exec_obj, next_task.queue or next_step),
+                )
             return execution_id
 
         except StopIteration:
@@ -155,6 +257,186 @@ class ImportOrchestrator:
             self.set_as_failed(execution_id, reason=error_handler(e, execution_id))
             raise e
 
+    def get_task_priority(self, _exec) -> int:
+        """
+        Fair-share priority of the tasks of the execution, the higher the sooner.
+        It decreases by one each time the layers still to be imported by the user
+        (in all their running executions) double, so a user with a single layer
+        to import is not queued behind another user loading hundreds of layers.
+        The priority is kept for IMPORTER_TASK_PRIORITY_TTL seconds, so the
+        pending layers are not counted again at each dispatch
+        """
+        from importer.models import ExecutionProgress
+
+        with self._priorities_lock:
+            priority, expire_at = self._priorities.get(_exec.user_id, (None, 0))
+        if priority is not None and expire_at > time.monotonic():
+            return priority
+
+        running = ExecutionRequest.objects.filter(
+            user=_exec.user, status=ExecutionRequest.STATUS_RUNNING
+        ).values("exec_id")
+        pending = ExecutionProgress.objects.filter(
+            Q(exec_id=_exec.exec_id) | Q(exec_id__in=running)
+        ).aggregate(
+            total=Sum(
+                F("expected_layers") - F("completed_layers") - F("failed_layers")
+            )
+        )["total"]
+        priority = max(
+            IMPORTER_MAX_TASK_PRIORITY - int(math.log2(max(pending or 1, 1))), 0
+        )
+        with self._priorities_lock:
+            self._priorities[_exec.user_id] = (
+                priority,
+                time.monotonic() + IMPORTER_TASK_PRIORITY_TTL,
+            )
+        return priority
+
+    @staticmethod
+    def get_queue_max_priority(queue) -> Optional[int]:
+        """
+        Return the max priority declared for the queue,
+        None if the queue does not support the priorities
+        """
+        for _queue in importer_app.conf.task_queues or ():
+            if _queue.name == queue:
+                if _queue.max_priority is not None:
+                    return _queue.max_priority
+                return (_queue.queue_arguments or {}).get("x-max-priority")
+        return None
+
+    def get_task_options(self, _exec, *queues) -> dict:
+        """
+        Options used to send the tasks of the execution to the queues.
+        The priority is clamped to the max priority of the queues, and
+        not sent if any of them does not support the priorities
+        """
+        if not IMPORTER_FAIR_SCHEDULING or not queues:
+            return {}
+        max_priorities = [self.get_queue_max_priority(queue) for queue in queues]
+        if None in max_priorities:
+            return {}
+        return {"priority": min(self.get_task_priority(_exec), *max_priorities)}
+
+    def can_fuse_step(self, handler, step) -> bool:
+        """
+        The step can be executed inline only if the fused mode is
+        enabled and the handler marks it as fusable
+        """
+        return IMPORTER_FUSED_STEPS and step in getattr(handler, "FUSABLE_STEPS", ())
+
+    def get_duplicated_resources(self, content_hash, user) -> list:
+        """
+        Return the resources of the user created by the last import of the same content
+        """
+        from importer.models import ResourceHandlerInfo
+
+        infos = (
+            ResourceHandlerInfo.objects.filter(
+                content_hash=content_hash, resource__owner=user
+            )
+            .select_related("resource")
+            .order_by("-pk")
+        )
+        last = infos.first()
+        if last is None:
+            return []
+        if last.execution_request_id is None:
+            return [last]
+        return list(infos.filter(execution_request=last.execution_request_id))
+
+    def _save_content_hash(self, _exec):
+        """
+        Compute the content hash of the files of the execution and save it
+        in the input_params, it is saved in the ResourceHandlerInfo later
+        """
+        try:
+            content_hash = compute_content_hash(_exec.input_params.get("files") or {})
+        except OSError as e:
+            logger.warning(f"Cannot compute the content hash of the files: {e}")
+            return None
+        _exec.input_params = {**_exec.input_params, "content_hash": content_hash}
+        self.update_execution_request_status(
+            execution_id=str(_exec.exec_id), input_params=_exec.input_params
+        )
+        return content_hash
+
+    def apply_dedupe_policy(self, _exec) -> bool:
+        """
+        If the same content is already imported by the user, apply the dedupe
+        policy of the execution. Return True if the import must not continue
+        """
+        policy = _exec.input_params.get("dedupe_policy") or IMPORTER_DEDUPE_POLICY
+        content_hash = _exec.input_params.get("content_hash")
+        overwrite = _exec.input_params.get("overwrite_existing_layer")
+        if policy == DedupePolicy.NONE.value or str(overwrite).lower() == "true":
+            return False
+        if not content_hash and "dedupe_policy" in _exec.input_params:
+            # the hash of the uploaded files is computed here, out of the web request
+            content_hash = self._save_content_hash(_exec)
+        if not content_hash:
+            return False
+
+        duplicated = self.get_duplicated_resources(content_hash, _exec.user)
+        if not duplicated:
+            return False
+
+        execution_id = str(_exec.exec_id)
+        resources = [str(info.resource.uuid) for info in duplicated]
+        logger.info(
+            f"The execution {execution_id} is a duplicate of {resources}, policy: {policy}"
+        )
+        if policy == DedupePolicy.REJECT.value:
+            self.set_as_failed(
+                execution_id,
+                reason=f"The same data is already imported in the resources: {', '.join(resources)}",
+            )
+            return True
+
+        self.merge_execution_request_output_params(
+            execution_id, "dedupe", {"policy": policy, "duplicate_of": resources}
+        )
+        # the uploaded files are not needed, the existing resources are used instead
+        if _exec.input_params.get("asset_module_path"):
+            import_string(_exec.input_params["asset_module_path"]).objects.filter(
+                pk=_exec.input_params.get("asset_id")
+            ).delete()
+
+        if policy == DedupePolicy.LINK.value:
+            self.update_execution_request_status(
+                execution_id=execution_id, geonode_resource=duplicated[0].resource
+            )
+            self.set_as_completed(execution_id)
+            return True
+
+        # the existing resources are copied with the copy flow, one per layer
+        self.set_expected_layers(execution_id, len(duplicated))
+        input_params = dict(_exec.input_params)
+        if len(duplicated) == 1:
+            # the copy step names the new resource after the title of the execution
+            input_params.setdefault("title", duplicated[0].resource.title)
+        self.update_execution_request_status(
+            execution_id=execution_id,
+            input_params=input_params,
+            action=exa.COPY.value,
+            func_name="start_copy",
+            step="start_copy",
+        )
+        for info in duplicated:
+            importer_app.tasks.get("importer.import_orchestrator").apply_async(
+                (
+                    {},
+                    execution_id,
+                    info.handler_module_path,
+                    "start_copy",
+                    info.resource.title,
+                    info.resource.alternate,
+                    exa.COPY.value,
+                )
+            )
+        return True
+
     def set_as_failed(self, execution_id, reason=None, delete_file=True):
         """
         Utility method to set the ExecutionRequest object to fail
@@ -166,8 +448,8 @@ class ImportOrchestrator:
             last_updated=timezone.now(),
             log=reason,
         )
-        # delete
-        if delete_file:
+        # delete, the staged files of a resumable execution are kept
+        if delete_file and not self.is_resumable(execution_id):
             exec_obj = self.get_execution_object(execution_id)
             # cleanup asset in case of fail
             if exec_obj.input_params.get("asset_module_path", None):
@@ -175,6 +457,7 @@ class ImportOrchestrator:
                 asset = asset_handler.objects.filter(pk=exec_obj.input_params["asset_id"])
                 if asset.exists():
                     asset.first().delete()
+        self.evaluate_execution_group(execution_id)
 
     def set_as_partially_failed(self, execution_id, reason=None):
         """
@@ -187,6 +470,7 @@ class ImportOrchestrator:
             last_updated=timezone.now(),
             log=f"The execution is completed, but the following layers are not imported: \n {', '.join(reason)}. Check the logs for additional infos",
         )
+        self.evaluate_execution_group(execution_id)
 
     def set_as_completed(self, execution_id):
         """
@@ -198,37 +482,156 @@ class ImportOrchestrator:
             finished=timezone.now(),
             last_updated=timezone.now(),
         )
+        if IMPORTER_RESUMABLE:
+            from importer.models import ExecutionCheckpoint
 
-    def evaluate_execution_progress(
-        self, execution_id, _log=None, handler_module_path=None
+            ExecutionCheckpoint.objects.filter(exec_id=str(execution_id)).delete()
+        self.evaluate_execution_group(execution_id)
+
+    def save_checkpoint(
+        self,
+        execution_id,
+        step,
+        layer_name,
+        alternate,
+        handler_module_path,
+        action,
+        kwargs=None,
     ):
-        from importer.models import ResourceHandlerInfo
+        """
+        Save the last step completed by the layer
+        """
+        from importer.models import ExecutionCheckpoint
+
+        ExecutionCheckpoint.objects.update_or_create(
+            exec_id=str(execution_id),
+            layer_name=layer_name,
+            defaults={
+                "step": step,
+                "alternate": alternate,
+                "handler_module_path": handler_module_path,
+                "action": action,
+                "kwargs": kwargs or {},
+                "resumable": False,
+                "error": None,
+            },
+        )
+
+    def mark_as_resumable(self, execution_id, layer_name, error=None) -> bool:
+        """
+        Mark the checkpoint of the failed layer as resumable.
+        Return False if the layer has no checkpoint, so it must be rolled back
+        """
+        from importer.models import ExecutionCheckpoint
+
+        return (
+            ExecutionCheckpoint.objects.filter(
+                exec_id=str(execution_id), layer_name=layer_name
+            ).update(resumable=True, error=error)
+            > 0
+        )
+
+    def is_resumable(self, execution_id) -> bool:
+        if not IMPORTER_RESUMABLE:
+            return False
+        from importer.models import ExecutionCheckpoint
+
+        return ExecutionCheckpoint.objects.filter(
+            exec_id=str(execution_id), resumable=True
+        ).exists()
+
+    def resume_execution(self, execution_id) -> list:
+        """
+        Resume the failed layers of the execution from their last completed step,
+        reusing the data already loaded and the staged files.
+        Return the name of the layers resumed
+        """
+        from importer.models import (
+            ExecutionCheckpoint,
+            ExecutionProgress,
+            ExecutionTask,
+        )
+
+        execution_id = str(execution_id)
+        checkpoints = list(
+            ExecutionCheckpoint.objects.filter(exec_id=execution_id, resumable=True)
+        )
+        if not checkpoints:
+            return []
+        _exec = self.get_execution_object(execution_id)
+
+        # the failed tasks must not be evaluated again with the progress of the execution
+        failed_tasks = self.get_execution_tasks(execution_id).filter(
+            status=states.FAILURE
+        )
+        ExecutionTask.objects.filter(
+            task_id__in=list(failed_tasks.values_list("task_id", flat=True))
+        ).delete()
+        failed_tasks.delete()
+        # nothing is running, so the layers neither completed nor resumed are the failed ones.
+        # A layer can be counted more than once, like when more chunks of it fail
+        ExecutionProgress.objects.filter(exec_id=execution_id).update(
+            failed_layers=Greatest(
+                F("expected_layers") - F("completed_layers") - len(checkpoints), 0
+            ),
+            finalized=False,
+        )
+
+        resumed = {c.layer_name for c in checkpoints} | {c.alternate for c in checkpoints}
+        output_params = _exec.output_params or {}
+        output_params["failed_layers"] = [
+            layer
+            for layer in output_params.get("failed_layers", [])
+            if layer not in resumed
+        ]
+        self.update_execution_request_status(
+            execution_id=execution_id,
+            status=ExecutionRequest.STATUS_RUNNING,
+            finished=None,
+            log="",
+            last_updated=timezone.now(),
+            output_params=output_params,
+        )
+        ExecutionCheckpoint.objects.filter(
+            pk__in=[c.pk for c in checkpoints]
+        ).update(resumable=False, error=None)
+
+        import_orchestrator = importer_app.tasks.get("importer.import_orchestrator")
+        for checkpoint in checkpoints:
+            logger.info(
+                f"Resuming the layer {checkpoint.layer_name} of the execution {execution_id} from {checkpoint.step}"
+            )
+            import_orchestrator.apply_async(
+                (
+                    {},
+                    execution_id,
+                    checkpoint.handler_module_path,
+                    checkpoint.step,
+                    checkpoint.layer_name,
+                    checkpoint.alternate,
+                    checkpoint.action,
+                ),
+                checkpoint.kwargs,
+                **self.get_task_options(_exec, "importer.import_orchestrator"),
+            )
+        return [checkpoint.layer_name for checkpoint in checkpoints]
 
+    @metrics.timed("evaluate_execution_progress")
+    def evaluate_execution_progress(
+        self, execution_id, _log=None, handler_module_path=None, progress=None
+    ):
         """
         The execution id is a mandatory argument for the task
         We use that to filter out all the task execution that are still in progress.
         if any is failed, we raise it.
         """
-
-        _exec = self.get_execution_object(execution_id)
-        expected_dataset = _exec.input_params.get("total_layers", 0)
-        actual_dataset = ResourceHandlerInfo.objects.filter(
-            execution_request=_exec
-        ).count()
-        is_last_dataset = actual_dataset >= expected_dataset
+        if progress is None:
+            progress, _ = self.get_execution_progress(execution_id)
+        expected_dataset = progress.expected_layers
+        is_last_dataset = progress.completed_layers >= expected_dataset
         execution_id = str(execution_id)  # force it as string to be sure
-        lower_exec_id = execution_id.replace("-", "_").lower()
-        exec_result = TaskResult.objects.filter(
-            Q(task_args__icontains=lower_exec_id)
-            | Q(task_kwargs__icontains=lower_exec_id)
-            | Q(result__icontains=lower_exec_id)
-            | Q(task_args__icontains=execution_id)
-            | Q(task_kwargs__icontains=execution_id)
-            | Q(result__icontains=execution_id)
-        )
-        _has_data = ResourceHandlerInfo.objects.filter(
-            execution_request__exec_id=execution_id
-        ).exists()
+        exec_result = self.get_execution_tasks(execution_id)
+        _has_data = progress.completed_layers > 0
 
         # .all() is needed since we want to have the last status on the DB without take in consideration the cache
         if (
@@ -255,7 +658,8 @@ class ImportOrchestrator:
                 )
                 logger.error(log)
                 self.set_as_partially_failed(execution_id=execution_id, reason=log)
-                self._last_step(execution_id, handler_module_path)
+                if self._claim_last_step(execution_id):
+                    self._last_step(execution_id, handler_module_path)
 
             elif is_last_dataset:
                 self.set_as_failed(execution_id=execution_id, reason=_log)
@@ -266,6 +670,119 @@ class ImportOrchestrator:
                 is_last_dataset, _log, execution_id, handler_module_path
             )
 
+    def set_expected_layers(self, execution_id, expected_layers: int):
+        """
+        Set the number of layers that the execution is going to import
+        """
+        from importer.models import ExecutionProgress
+
+        ExecutionProgress.objects.update_or_create(
+            exec_id=str(execution_id), defaults={"expected_layers": expected_layers}
+        )
+
+    def get_execution_progress(self, execution_id):
+        """
+        Return the layer counters of the execution and if they have been just created.
+        Counters of executions started before their introduction (or without
+        an import step, like the copy) are initialized from the ExecutionRequest
+        """
+        from importer.models import ExecutionProgress, ResourceHandlerInfo
+
+        progress = ExecutionProgress.objects.filter(exec_id=str(execution_id)).first()
+        if progress is not None:
+            return progress, False
+
+        _exec = self.get_execution_object(execution_id)
+        return ExecutionProgress.objects.get_or_create(
+            exec_id=str(execution_id),
+            defaults={
+                "expected_layers": _exec.input_params.get("total_layers", 0),
+                "completed_layers": ResourceHandlerInfo.objects.filter(
+                    execution_request=_exec
+                ).count(),
+            },
+        )
+
+    def increment_execution_progress(self, execution_id, counter: str):
+        """
+        Atomically increment the selected counter (completed_layers or failed_layers)
+        and return the updated values
+        """
+        from importer.models import ExecutionProgress
+
+        metrics.inc("importer_layers_total", status=counter.replace("_layers", ""))
+        progress, created = self.get_execution_progress(execution_id)
+        if created and counter == "completed_layers":
+            # the initialization already counted the resource of the actual layer
+            return progress
+        ExecutionProgress.objects.filter(pk=progress.pk).update(
+            **{counter: F(counter) + 1}
+        )
+        progress.refresh_from_db()
+        return progress
+
+    def _claim_last_step(self, execution_id) -> bool:
+        """
+        Only the first caller can run the last step of the execution.
+        The update is atomic, so if two layers are completed at the same
+        time, the last step is not performed twice
+        """
+        from importer.models import ExecutionProgress
+
+        return (
+            ExecutionProgress.objects.filter(
+                exec_id=str(execution_id), finalized=False
+            ).update(finalized=True)
+            == 1
+        )
+
+    def get_execution_tasks(self, execution_id):
+        """
+        Return the TaskResult of the celery tasks run for the execution.
+        The tasks are taken from the ExecutionTask ledger, the scan of
+        the task arguments is kept only for the executions started before it
+        """
+        from importer.models import ExecutionTask
+
+        execution_id = str(execution_id)
+        ledger = ExecutionTask.objects.filter(exec_id=execution_id)
+        if ledger.exists():
+            return TaskResult.objects.filter(
+                task_id__in=ledger.values_list("task_id", flat=True)
+            )
+
+        lower_exec_id = execution_id.replace("-", "_").lower()
+        return TaskResult.objects.filter(
+            Q(task_args__icontains=lower_exec_id)
+            | Q(task_kwargs__icontains=lower_exec_id)
+            | Q(result__icontains=lower_exec_id)
+            | Q(task_args__icontains=execution_id)
+            | Q(task_kwargs__icontains=execution_id)
+            | Q(result__icontains=execution_id)
+        )
+
+    def register_execution_task(self, execution_id, task_id, task_name=None):
+        """
+        Add the celery task to the ledger of the execution
+        """
+        from importer.models import ExecutionTask
+
+        ExecutionTask.objects.get_or_create(
+            task_id=task_id,
+            defaults={"exec_id": str(execution_id), "task_name": task_name},
+        )
+
+    def delete_execution_tasks(self, execution_id):
+        """
+        Remove the TaskResult of the execution and its ledger
+        to keep the number of rows under control
+        """
+        from importer.models import ExecutionStep, ExecutionTask
+
+        self.get_execution_tasks(execution_id).delete()
+        ExecutionTask.objects.filter(exec_id=str(execution_id)).delete()
+        ExecutionStep.objects.filter(exec_id=str(execution_id)).delete()
+
     def _evaluate_last_dataset(
         self, is_last_dataset, _log, execution_id, handler_module_path
     ):
@@ -273,6 +790,11 @@ class ImportOrchestrator:
             if _log and "ErrorDetail" in _log:
                 self.set_as_failed(execution_id=execution_id, reason=_log)
             else:
+                if not self._claim_last_step(execution_id):
+                    logger.info(
+                        f"Last step for the execution with ID {execution_id} already performed"
+                    )
+                    return
                 logger.info(
                     f"Execution with ID {execution_id} is completed. All tasks are done"
                 )
@@ -311,6 +833,92 @@ class ImportOrchestrator:
         )
         return execution.exec_id
 
+    def create_execution_group(self, user, children: list, source=None) -> UUID:
+        """
+        Create the parent execution of a bulk import and its children
+        with a single insert. Each child is the payload of create_execution_request.
+        The parent keeps the list of the children and their aggregated progress
+        """
+        parent = ExecutionRequest(
+            user=user,
+            func_name="bulk_import",
+            step="importer.bulk_import",
+            action=children[0].get("action") if children else None,
+            status=ExecutionRequest.STATUS_RUNNING,
+            source=source,
+        )
+        requests = [
+            ExecutionRequest(
+                user=user,
+                func_name=child["func_name"],
+                step=child["step"],
+                input_params={
+                    **child.get("input_params", {}),
+                    "parent": str(parent.exec_id),
+                },
+                action=child.get("action"),
+                name=child.get("name"),
+                source=source,
+            )
+            for child in children
+        ]
+        parent.input_params = {"children": [str(x.exec_id) for x in requests]}
+        parent.output_params = {
+            "group": {"total": len(requests), "finished": 0, "failed": 0}
+        }
+        with transaction.atomic():
+            ExecutionRequest.objects.bulk_create([parent] + requests)
+        return parent.exec_id
+
+    def evaluate_execution_group(self, execution_id):
+        """
+        If the execution is part of a bulk import, update the aggregated
+        progress of the parent. The parent is completed once all
+        the children are completed, and is failed if any child is failed
+        """
+        parent_id = (
+            ExecutionRequest.objects.filter(exec_id=str(execution_id))
+            .values_list("input_params__parent", flat=True)
+            .first()
+        )
+        if not parent_id:
+            return
+        with transaction.atomic():
+            parent = (
+                ExecutionRequest.objects.select_for_update()
+                .filter(exec_id=parent_id)
+                .first()
+            )
+            if parent is None:
+                return
+            children = parent.input_params.get("children", [])
+            statuses = dict(
+                ExecutionRequest.objects.filter(exec_id__in=children)
+                .values_list("status")
+                .annotate(total=Count("exec_id"))
+            )
+            group = {
+                "total": len(children),
+                "finished": statuses.get(ExecutionRequest.STATUS_FINISHED, 0),
+                "failed": statuses.get(ExecutionRequest.STATUS_FAILED, 0),
+            }
+            payload = {
+                "output_params": {**(parent.output_params or {}), "group": group},
+                "last_updated": timezone.now(),
+            }
+            if group["finished"] + group["failed"] >= group["total"]:
+                payload["finished"] = timezone.now()
+                payload["status"] = ExecutionRequest.STATUS_FINISHED
+                if group["failed"]:
+                    payload["status"] = ExecutionRequest.STATUS_FAILED
+                    payload["log"] = (
+                        f"{group['failed']} of {group['total']} imports are failed. "
+                        "Check the children executions for additional infos"
+                    )
+            ExecutionRequest.objects.filter(pk=parent.pk).update(**payload)
+        execution_map.invalidate(parent_id)
+        self.notify_execution_update(parent_id)
+
     def update_execution_request_status(
         self,
         execution_id,
@@ -320,21 +928,169 @@ class ImportOrchestrator:
     ):
         """
         Update the execution request status and also the legacy upload status if the
-        feature toggle is enabled
+        feature toggle is enabled.
+        celery_task_request is deprecated and ignored, the task arguments are
+        not copied anymore into the TaskResult
         """
+        if celery_task_request is not None:
+            warnings.warn(
+                "celery_task_request is deprecated and ignored",
+                DeprecationWarning,
+                stacklevel=2,
+            )
         if status is not None:
             kwargs["status"] = status
 
         ExecutionRequest.objects.filter(exec_id=execution_id).update(**kwargs)
+        execution_map.invalidate(execution_id)
+        self.notify_execution_update(execution_id)
+
+    @staticmethod
+    def _get_version_key(execution_id):
+        return f"importer:execution:{execution_id}:version"
+
+    def notify_execution_update(self, execution_id):
+        """
+        Increment the version of the execution in the IMPORTER_STATUS_CACHE,
+        used by the status stream to know when the execution changes
+        without reading the ExecutionRequest
+        """
+        if not IMPORTER_STATUS_CACHE:
+            return
+        key = self._get_version_key(execution_id)
+        try:
+            _cache = caches[IMPORTER_STATUS_CACHE]
+            _cache.add(key, 0, timeout=self.VERSION_TIMEOUT)
+            _cache.incr(key)
+        except Exception as e:
+            logger.warning(f"Cannot notify the update of the execution {execution_id}: {e}")
+
+    def get_execution_cursor(self, execution_id) -> str:
+        """
+        Return a cursor which changes each time the execution is updated.
+        Without the IMPORTER_STATUS_CACHE the cursor is evaluated from the
+        status, the step and the last update of the ExecutionRequest
+        """
+        if IMPORTER_STATUS_CACHE:
+            version = caches[IMPORTER_STATUS_CACHE].get(
+                self._get_version_key(execution_id), 0
+            )
+            return str(version)
+        values = (
+            ExecutionRequest.objects.filter(exec_id=str(execution_id))
+            .values_list("status", "step", "last_updated")
+            .first()
+        )
+        if values is None:
+            return ""
+        status, step, last_updated = values
+        return f"{status}:{step}:{last_updated.timestamp() if last_updated else ''}"
 
-        if celery_task_request:
-            TaskResult.objects.filter(task_id=celery_task_request.id).update(
-                task_args=celery_task_request.args
+    def merge_execution_request_output_params(self, execution_id, key, payload: dict):
+        """
+        Merge the payload under the selected key of the output_params.
+        Multiple tasks of the same execution can write the output_params
+        at the same time, so the row is locked to not lose the other updates
+        """
+        with transaction.atomic():
+            _exec = (
+                ExecutionRequest.objects.select_for_update()
+                .filter(exec_id=execution_id)
+                .first()
             )
+            if _exec is None:
+                return
+            output_params = _exec.output_params or {}
+            output_params[key] = {**output_params.get(key, {}), **payload}
+            ExecutionRequest.objects.filter(pk=_exec.pk).update(
+                output_params=output_params
+            )
+        execution_map.invalidate(execution_id)
+        self.notify_execution_update(execution_id)
+
+    def add_execution_request_error(self, execution_id, log, failed_layer=None):
+        """
+        Append the error and the failed layer to the output_params.
+        The row is locked, so the other keys written in the meanwhile
+        by the running tasks are not lost. Return the updated output_params
+        """
+        with transaction.atomic():
+            _exec = (
+                ExecutionRequest.objects.select_for_update()
+                .filter(exec_id=execution_id)
+                .first()
+            )
+            if _exec is None:
+                return {}
+            output_params = _exec.output_params or {}
+            output_params["errors"] = output_params.get("errors", []) + [log]
+            failed = output_params.get("failed_layers", [])
+            if failed_layer is not None:
+                failed = list(set(failed + [failed_layer]))
+            output_params["failed_layers"] = failed
+            ExecutionRequest.objects.filter(pk=_exec.pk).update(
+                output_params=output_params,
+                last_updated=timezone.now(),
+            )
+        execution_map.invalidate(execution_id)
+        return output_params
+
+    def add_to_publishing_batch(
+        self, execution_id, alternate=None, payload=None, failed_layer=None
+    ):
+        """
+        Collect the resource of a layer which is ready to be published
+        under the "publishing" key of the output_params, or the failed layer.
+        When all the layers are collected (or failed) the batch is claimed and
+        returned, so only one caller is going to publish it. Otherwise None is returned.
+        The layers are counted once, even if more tasks of the same layer fail
+        """
+        progress, _ = self.get_execution_progress(execution_id)
+        with transaction.atomic():
+            _exec = (
+                ExecutionRequest.objects.select_for_update()
+                .filter(exec_id=execution_id)
+                .first()
+            )
+            if _exec is None:
+                return None
+            output_params = _exec.output_params or {}
+            batch = output_params.get("publishing", {"claimed": False, "layers": {}})
+            batch.setdefault("failed", [])
+            if alternate is not None:
+                batch["layers"][alternate] = payload
+            is_new_failure = (
+                failed_layer is not None and failed_layer not in batch["failed"]
+            )
+            if is_new_failure:
+                batch["failed"].append(failed_layer)
+            progress.refresh_from_db()
+            is_complete = (
+                len(set(batch["layers"]) | set(batch["failed"]))
+                >= progress.expected_layers
+            )
+            to_publish = None
+            if batch["layers"] and is_complete and not batch["claimed"]:
+                batch["claimed"] = True
+                to_publish = batch["layers"]
+            if alternate is not None or is_new_failure or to_publish:
+                output_params["publishing"] = batch
+                ExecutionRequest.objects.filter(pk=_exec.pk).update(
+                    output_params=output_params
+                )
+                execution_map.invalidate(execution_id)
+            return to_publish
 
     def update_execution_request_obj(self, _exec_obj, payload):
         ExecutionRequest.objects.filter(pk=_exec_obj.pk).update(**payload)
-        _exec_obj.refresh_from_db()
+        if execution_map.get(_exec_obj.exec_id) is _exec_obj:
+            # the object of the execution_map is updated without reading it again
+            for key, value in payload.items():
+                setattr(_exec_obj, key, value)
+        else:
+            execution_map.invalidate(_exec_obj.exec_id)
+            _exec_obj.refresh_from_db()
+        self.notify_execution_update(_exec_obj.exec_id)
         return _exec_obj
 
     def _last_step(self, execution_id, handler_module_path):
@@ -1,5 +1,8 @@
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from geonode import settings
@@ -9,11 +12,98 @@ from geonode.utils import OGC_Servers_Handler
 from django.utils.module_loading import import_string
 
 from importer.api.exception import PublishResourceException
+from importer.backpressure import geoserver_controller
+from importer.settings import (
+    IMPORTER_GEOSERVER_CACHE_TTL,
+    IMPORTER_PUBLISHING_WORKERS,
+)
 
 
 logger = logging.getLogger(__name__)
 
 
+class CatalogCache:
+    """
+    Pool of the geoserver catalogs, one for each thread. The catalog (and so
+    its keep-alive HTTP session) is reused by all the tasks run by the thread,
+    but is never shared between threads since the catalog is not thread-safe.
+    The store lookups are cached for ttl seconds only between the begin and
+    the end of a task, since the changes made by the other workers cannot
+    invalidate them. Outside of a task they are not cached.
+    The shared lookups (like the workspace, which is never deleted by the
+    importer) are cached for ttl seconds by the whole process
+    """
+
+    def __init__(self, ttl=IMPORTER_GEOSERVER_CACHE_TTL) -> None:
+        self.ttl = ttl
+        self._local = threading.local()
+        self._shared = {}
+        self._lock = threading.Lock()
+
+    def get_catalog(self, service_url, username, password) -> Catalog:
+        if not hasattr(self._local, "catalogs"):
+            self._local.catalogs = {}
+        key = (service_url, username)
+        if key not in self._local.catalogs:
+            self._local.catalogs[key] = Catalog(
+                service_url=service_url, username=username, password=password
+            )
+        return self._local.catalogs[key]
+
+    @property
+    def active(self) -> bool:
+        return getattr(self._local, "owner", None) is not None
+
+    def begin(self, owner):
+        if not self.active:
+            self._local.owner = owner
+            self._local.lookups = {}
+
+    def end(self, owner):
+        if getattr(self._local, "owner", None) == owner:
+            self._local.owner = None
+            self._local.lookups = {}
+
+    def _get_lookups(self, shared):
+        if shared:
+            return self._shared
+        return self._local.lookups if self.active else None
+
+    def get(self, key, loader, shared=False):
+        """
+        Return the cached value for the key, if expired or not available the
+        loader is called. Empty values are not cached
+        """
+        lookups = self._get_lookups(shared)
+        if lookups is not None:
+            value, expire_at = lookups.get(key, (None, 0))
+            if value is not None and expire_at > time.monotonic():
+                return value
+        value = loader()
+        if value is not None:
+            self.set(key, value, shared=shared)
+        return value
+
+    def set(self, key, value, shared=False):
+        lookups = self._get_lookups(shared)
+        if lookups is not None:
+            with self._lock:
+                lookups[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            for lookups in (self._shared, self._get_lookups(shared=False)):
+                if lookups is None:
+                    continue
+                if key is None:
+                    lookups.clear()
+                else:
+                    lookups.pop(key, None)
+
+
+catalog_cache = CatalogCache()
+
+
 class DataPublisher:
     """
     Given a list of resources, will publish them on GeoServer
@@ -23,10 +113,13 @@ class DataPublisher:
         ogc_server_settings = OGC_Servers_Handler(settings.OGC_SERVER)["default"]
 
         _user, _password = ogc_server_settings.credentials
+        self._credentials = {
+            "service_url": ogc_server_settings.rest,
+            "username": _user,
+            "password": _password,
+        }
 
-        self.cat = Catalog(
-            service_url=ogc_server_settings.rest, username=_user, password=_password
-        )
+        self.cat = catalog_cache.get_catalog(**self._credentials)
         self.workspace = self._get_default_workspace(create=True)
 
         self.store = None
@@ -63,31 +156,51 @@ class DataPublisher:
     def publish_resources(self, resources: List[str]):
         """
         Given a list of strings (which rappresent the table on geoserver)
-        Will publish the resorces on geoserver
+        Will publish the resorces on geoserver.
+        The store is resolved once, if more than one resource is provided
+        they are published in parallel using at most IMPORTER_PUBLISHING_WORKERS threads,
+        each one with its own catalog
         """
-        self.get_or_create_store(default=resources[0]["name"])
-        result = self.handler.publish_resources(
-            resources=resources,
-            catalog=self.cat,
-            store=self.store,
-            workspace=self.workspace,
-        )
-        self.sanity_checks(resources)
+        with geoserver_controller.measure(calls=len(resources)):
+            self.get_or_create_store(default=resources[0]["name"])
+            max_workers = min(IMPORTER_PUBLISHING_WORKERS, len(resources))
+            if max_workers <= 1:
+                result = self.handler.publish_resources(
+                    resources=resources,
+                    catalog=self.cat,
+                    store=self.store,
+                    workspace=self.workspace,
+                )
+            else:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    result = all(
+                        executor.map(
+                            lambda _resource: self.handler.publish_resources(
+                                resources=[_resource],
+                                catalog=catalog_cache.get_catalog(**self._credentials),
+                                store=self.store,
+                                workspace=self.workspace,
+                            ),
+                            resources,
+                        )
+                    )
+            self.sanity_checks(resources)
         return result
 
     def overwrite_resources(self, resources: List[str]):
         """
         We dont need to do anything for now. The data is replaced via ogr2ogr
         """
-        for _resource in resources:
-            self.get_or_create_store(default=_resource["name"])
-            result = self.handler.overwrite_geoserver_resource(
-                resource=_resource,
-                catalog=self.cat,
-                store=self.store,
-                workspace=self.workspace,
-            )
-        self.sanity_checks(resources)
+        with geoserver_controller.measure(calls=len(resources)):
+            for _resource in resources:
+                self.get_or_create_store(default=_resource["name"])
+                result = self.handler.overwrite_geoserver_resource(
+                    resource=_resource,
+                    catalog=self.cat,
+                    store=self.store,
+                    workspace=self.workspace,
+                )
+            self.sanity_checks(resources)
         return result
 
     def delete_resource(self, resource_name):
@@ -109,6 +222,7 @@ class DataPublisher:
             )
         if store:
             self.cat.delete(store, purge="all", recurse=True)
+            catalog_cache.invalidate(("store", store.workspace.name, store.name))
 
     def get_or_create_store(self, default=None):
         """
@@ -127,15 +241,22 @@ class DataPublisher:
             # from geoserver. This is usually used for raster layers
             # for raster we dont want to create the store upfront since the pulishing
             # is going to create it
-            self.store = self.cat.get_store(name=store_name, workspace=self.workspace)
+            self.store = self._get_store(store_name)
             return
 
-        self.store = self.cat.get_store(name=store_name, workspace=self.workspace)
+        self.store = self._get_store(store_name)
         if not self.store:
             logger.warning(f"The store does not exists: {store_name} creating...")
             self.store = create_geoserver_db_featurestore(
                 store_name=store_name, workspace=self.workspace.name
             )
+            catalog_cache.set(("store", self.workspace.name, store_name), self.store)
+
+    def _get_store(self, store_name):
+        return catalog_cache.get(
+            ("store", self.workspace.name, store_name),
+            lambda: self.cat.get_store(name=store_name, workspace=self.workspace),
+        )
 
     def publish_geoserver_view(
         self, layer_name, crs, view_name, sql=None, geometry=None
@@ -160,36 +281,66 @@ class DataPublisher:
         """
         Will evaluate if the SRID is correctly created
         For each resource. This is a quick test to be sure
-        that the resource is correctly set/created
+        that the resource is correctly set/created.
+        The resources are read with a new catalog, so the responses cached
+        by the catalog of the thread are not used
         """
+        catalog = Catalog(**self._credentials)
 
+        published = (
+            self._list_store_resources(catalog) if len(resources) > 1 else {}
+        )
         for _resource in resources:
-            possible_layer_name = [
-                _resource.get("name"),
-                _resource.get("name").split(":")[-1],
-                f"{self.workspace.name}:{_resource.get('name')}",
-            ]
-            res = list(
-                filter(
-                    None,
-                    (
-                        self.cat.get_resource(x, workspace=self.workspace)
-                        for x in possible_layer_name
-                    ),
+            _published = published.get(_resource.get("name").split(":")[-1])
+            res = [_published] if _published else []
+            if not res:
+                possible_layer_name = [
+                    _resource.get("name"),
+                    _resource.get("name").split(":")[-1],
+                    f"{self.workspace.name}:{_resource.get('name')}",
+                ]
+                res = list(
+                    filter(
+                        None,
+                        (
+                            catalog.get_resource(x, workspace=self.workspace)
+                            for x in possible_layer_name
+                        ),
+                    )
                 )
-            )
             if not res or (res and not res[0].projection):
                 raise PublishResourceException(
                     f"The SRID for the resource {_resource} is not correctly set, Please check Geoserver logs"
                 )
 
+    def _list_store_resources(self, catalog):
+        """
+        Return the resources published in the store by name,
+        with a single catalog listing
+        """
+        if not self.store:
+            return {}
+        try:
+            return {
+                res.name: res
+                for res in catalog.get_resources(
+                    stores=[self.store], workspaces=[self.workspace]
+                )
+            }
+        except Exception as e:
+            logger.warning(f"Cannot list the resources of the store: {e}")
+            return {}
+
     def _get_default_workspace(self, create=True):
         """Return the default geoserver workspace
         The workspace can be created it if needed.
         """
         name = getattr(settings, "DEFAULT_WORKSPACE", "geonode")
-        workspace = self.cat.get_workspace(name)
+        workspace = catalog_cache.get(
+            ("workspace", name), lambda: self.cat.get_workspace(name), shared=True
+        )
         if workspace is None and create:
             uri = f"http://www.geonode.org/{name}"
             workspace = self.cat.create_workspace(name, uri)
+            catalog_cache.set(("workspace", name), workspace, shared=True)
         return workspace
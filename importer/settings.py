@@ -1,3 +1,4 @@
+import ast
 import os
 
 """
@@ -10,6 +11,166 @@ IMPORTER_RESOURCE_CREATION_RATE_LIMIT = os.getenv(
 )
 IMPORTER_RESOURCE_COPY_RATE_LIMIT = os.getenv("IMPORTER_RESOURCE_COPY_RATE_LIMIT", 10)
 
+"""
+min interval in seconds between two progress updates of the vector import
+"""
+IMPORTER_PROGRESS_UPDATE_INTERVAL = float(
+    os.getenv("IMPORTER_PROGRESS_UPDATE_INTERVAL", 5)
+)
+
+"""
+max number of features loaded by a single ogr2ogr task.
+Bigger layers are splitted in FID ranges loaded in parallel. 0 means disabled
+"""
+IMPORTER_OGR2OGR_CHUNK_SIZE = int(os.getenv("IMPORTER_OGR2OGR_CHUNK_SIZE", 0))
+
+"""
+max seconds for which the geoserver store lookups are reused within a task,
+and the workspace lookup by the whole worker
+"""
+IMPORTER_GEOSERVER_CACHE_TTL = int(os.getenv("IMPORTER_GEOSERVER_CACHE_TTL", 60))
+
+"""
+if enabled, the layers of a multi-layer upload are published on geoserver
+all together in a single step, using at most IMPORTER_PUBLISHING_WORKERS threads
+"""
+IMPORTER_BATCH_PUBLISHING = ast.literal_eval(
+    os.getenv("IMPORTER_BATCH_PUBLISHING", "False")
+)
+IMPORTER_PUBLISHING_WORKERS = int(os.getenv("IMPORTER_PUBLISHING_WORKERS", 4))
+
+"""
+max number of CRS authority codes kept in memory by each worker.
+The resolved codes are saved also in the CRSAuthority table
+"""
+IMPORTER_CRS_CACHE_SIZE = int(os.getenv("IMPORTER_CRS_CACHE_SIZE", 256))
+
+"""
+max number of files accepted by a single bulk import and the comma separated
+list of the server directories from which the bulk import can read the files.
+If no directory is set, only the files sent with the request are accepted
+"""
+IMPORTER_BULK_IMPORT_MAX_FILES = int(os.getenv("IMPORTER_BULK_IMPORT_MAX_FILES", 500))
+IMPORTER_BULK_IMPORT_ALLOWED_DIRS = [
+    _dir.strip()
+    for _dir in os.getenv("IMPORTER_BULK_IMPORT_ALLOWED_DIRS", "").split(",")
+    if _dir.strip()
+]
+
+"""
+seconds after the last chunk received for which a chunked upload can be resumed.
+Once expired, the upload and the files not yet imported are deleted
+"""
+IMPORTER_CHUNKED_UPLOAD_EXPIRY = int(
+    os.getenv("IMPORTER_CHUNKED_UPLOAD_EXPIRY", 24 * 60 * 60)
+)
+
+"""
+enable the long-poll and the Server-Sent Events of the status endpoint. Each open
+request holds a web worker up to IMPORTER_STATUS_STREAM_TIMEOUT seconds, so it must
+be enabled only with an ASGI or an asynchronous (like gevent) server.
+When disabled the status endpoint always answers immediately
+"""
+IMPORTER_STATUS_STREAM = ast.literal_eval(os.getenv("IMPORTER_STATUS_STREAM", "False"))
+
+"""
+cache alias (shared between the workers and the web application, like redis or
+memcached) used to notify the updates of the executions to the status stream.
+If not set, the stream reads the status of the execution each IMPORTER_STATUS_POLL_INTERVAL.
+IMPORTER_STATUS_STREAM_TIMEOUT is the max seconds for which a stream (or a long-poll) is kept open
+"""
+IMPORTER_STATUS_CACHE = os.getenv("IMPORTER_STATUS_CACHE", None)
+IMPORTER_STATUS_POLL_INTERVAL = float(os.getenv("IMPORTER_STATUS_POLL_INTERVAL", 1))
+IMPORTER_STATUS_STREAM_TIMEOUT = int(os.getenv("IMPORTER_STATUS_STREAM_TIMEOUT", 10))
+
+"""
+default policy applied when the user uploads data already imported:
+none, reject, link or copy. Can be overridden by the dedupe_policy param of the upload
+"""
+IMPORTER_DEDUPE_POLICY = os.getenv("IMPORTER_DEDUPE_POLICY", "none")
+
+"""
+if enabled, the orchestration between two steps runs in the worker which completed
+the previous step, and the steps marked as FUSABLE_STEPS by the handler are executed
+inline in the same worker instead of being sent to their queue
+"""
+IMPORTER_FUSED_STEPS = ast.literal_eval(os.getenv("IMPORTER_FUSED_STEPS", "False"))
+
+"""
+if enabled, the tasks are sent with a priority which decreases with the layers that
+the user is still importing, so the small uploads are not queued behind the big ones.
+Requires the priority queues of RabbitMQ (x-max-priority), the highest priority
+sent is IMPORTER_MAX_TASK_PRIORITY, clamped to the max priority of each queue.
+The priority of a user is evaluated at most once each IMPORTER_TASK_PRIORITY_TTL seconds
+"""
+IMPORTER_FAIR_SCHEDULING = ast.literal_eval(
+    os.getenv("IMPORTER_FAIR_SCHEDULING", "False")
+)
+IMPORTER_MAX_TASK_PRIORITY = int(os.getenv("IMPORTER_MAX_TASK_PRIORITY", 8))
+IMPORTER_TASK_PRIORITY_TTL = float(os.getenv("IMPORTER_TASK_PRIORITY_TTL", 5))
+
+"""
+if enabled, the latency and the errors of GeoServer and of the datastore are measured
+in windows of IMPORTER_BACKPRESSURE_WINDOW seconds (shared by the workers through the
+IMPORTER_BACKPRESSURE_CACHE) and the rate limits above are scaled accordingly.
+If the GeoServer error rate reaches IMPORTER_BACKPRESSURE_MAX_ERROR_RATE the publishing
+is paused for IMPORTER_CIRCUIT_BREAKER_TIMEOUT seconds: the tasks are retried at most
+IMPORTER_CIRCUIT_BREAKER_MAX_RETRIES times instead of failing
+"""
+IMPORTER_BACKPRESSURE = ast.literal_eval(os.getenv("IMPORTER_BACKPRESSURE", "False"))
+IMPORTER_BACKPRESSURE_CACHE = os.getenv("IMPORTER_BACKPRESSURE_CACHE", "default")
+IMPORTER_BACKPRESSURE_WINDOW = int(os.getenv("IMPORTER_BACKPRESSURE_WINDOW", 30))
+IMPORTER_BACKPRESSURE_MAX_LATENCY = float(
+    os.getenv("IMPORTER_BACKPRESSURE_MAX_LATENCY", 5)
+)
+IMPORTER_BACKPRESSURE_MAX_ERROR_RATE = float(
+    os.getenv("IMPORTER_BACKPRESSURE_MAX_ERROR_RATE", 0.5)
+)
+IMPORTER_CIRCUIT_BREAKER_TIMEOUT = int(os.getenv("IMPORTER_CIRCUIT_BREAKER_TIMEOUT", 60))
+IMPORTER_CIRCUIT_BREAKER_MAX_RETRIES = int(
+    os.getenv("IMPORTER_CIRCUIT_BREAKER_MAX_RETRIES", 10)
+)
+
+"""
+if enabled, the duration and the DB queries of each task are saved in the
+timeline of the execution (output_params) and the aggregated metrics are
+collected in the IMPORTER_METRICS_CACHE (shared by the workers and the web application).
+The metrics are exposed in the Prometheus format to the superusers, or to the
+clients sending the IMPORTER_METRICS_TOKEN as bearer token
+"""
+IMPORTER_METRICS = ast.literal_eval(os.getenv("IMPORTER_METRICS", "False"))
+IMPORTER_METRICS_CACHE = os.getenv("IMPORTER_METRICS_CACHE", "default")
+IMPORTER_METRICS_TOKEN = os.getenv("IMPORTER_METRICS_TOKEN", None)
+
+"""
+if enabled, the trace context is propagated in the headers of the importer tasks,
+so the spans of the tasks (with the time spent in queue), of the GeoServer calls and
+of ogr2ogr are collected in a single trace for each upload.
+The spans are exported in the OTLP/JSON format, appended to IMPORTER_TRACING_FILE
+and/or sent to the OTLP/HTTP collector IMPORTER_TRACING_ENDPOINT (like http://collector:4318/v1/traces)
+"""
+IMPORTER_TRACING = ast.literal_eval(os.getenv("IMPORTER_TRACING", "False"))
+IMPORTER_TRACING_FILE = os.getenv("IMPORTER_TRACING_FILE", None)
+IMPORTER_TRACING_ENDPOINT = os.getenv("IMPORTER_TRACING_ENDPOINT", None)
+IMPORTER_TRACING_SERVICE_NAME = os.getenv("IMPORTER_TRACING_SERVICE_NAME", "geonode-importer")
+
+"""
+if enabled, the last step completed by each layer is saved. When a layer fails
+for a transient error (like a GeoServer timeout) the rollback is skipped, the data
+already loaded and the staged files are kept and the execution can be resumed
+from the failed step with POST /api/v2/uploads/upload/resume/<execution_id>
+"""
+IMPORTER_RESUMABLE = ast.literal_eval(os.getenv("IMPORTER_RESUMABLE", "False"))
+
+"""
+if enabled, the steps of each layer are claimed and their completion saved,
+so a task delivered again (worker lost, broker redelivery) does not repeat
+the step. The tasks loading the data are acknowledged late, once completed
+"""
+IMPORTER_IDEMPOTENT_TASKS = ast.literal_eval(
+    os.getenv("IMPORTER_IDEMPOTENT_TASKS", "False")
+)
+
 SYSTEM_HANDLERS = [
     'importer.handlers.gpkg.handler.GPKGFileHandler',
     'importer.handlers.geojson.handler.GeoJsonFileHandler',
@@ -0,0 +1,75 @@
+import time
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+from unittest.mock import PropertyMock, patch
+from importer.backpressure import ServiceController
+
+
+@patch("importer.backpressure.IMPORTER_BACKPRESSURE", True)
+@patch("importer.backpressure.IMPORTER_BACKPRESSURE_WINDOW", 30)
+@patch("importer.backpressure.importer_app.control.rate_limit")
+class TestServiceController(SimpleTestCase):
+    def setUp(self):
+        self.controller = ServiceController(
+            "geoserver",
+            tasks={"importer.publish_resource": 5},
+            max_latency=2,
+            circuit_breaker=True,
+        )
+        self.cache = LocMemCache(f"test_{time.time()}", {})
+        patcher = patch.object(
+            ServiceController, "cache", new_callable=PropertyMock, return_value=self.cache
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _record_window(self, window, calls, errors=0, elapsed=0.1):
+        with patch("importer.backpressure.time.time", return_value=window * 30):
+            for index in range(calls):
+                self.controller.record(elapsed, error=index < errors)
+
+    def test_healthy_service_should_increase_the_rate_limit(self, rate_limit):
+        self._record_window(1, calls=10)
+        self._record_window(2, calls=1)
+
+        self.assertEqual(1.25, self.controller.get_factor())
+        rate_limit.assert_called_once_with("importer.publish_resource", "375.0/m")
+
+    def test_slow_service_should_halve_the_rate_limit(self, rate_limit):
+        self._record_window(1, calls=10, elapsed=3)
+        self._record_window(2, calls=1)
+
+        self.assertEqual(0.5, self.controller.get_factor())
+        rate_limit.assert_called_once_with("importer.publish_resource", "150.0/m")
+        self.assertEqual(0, self.controller.retry_after())
+
+    def test_failing_service_should_open_the_circuit(self, rate_limit):
+        self._record_window(1, calls=10, errors=6)
+        self._record_window(2, calls=1)
+
+        self.assertEqual(0.5, self.controller.get_factor())
+        with patch("importer.backpressure.time.time", return_value=61):
+            self.assertEqual(60, self.controller.retry_after())
+
+    def test_few_calls_should_not_change_the_rate_limit(self, rate_limit):
+        self._record_window(1, calls=2, errors=2)
+        self._record_window(2, calls=1)
+
+        self.assertEqual(1, self.controller.get_factor())
+        rate_limit.assert_not_called()
+        self.assertEqual(0, self.controller.retry_after())
+
+    def test_measure_should_record_only_the_service_errors(self, rate_limit):
+        controller = ServiceController(
+            "datastore", tasks={}, error_markers=("could not connect",)
+        )
+        with patch.object(controller, "record") as record:
+            with self.assertRaises(Exception):
+                with controller.measure():
+                    raise Exception("invalid geometry")
+            self.assertFalse(record.call_args.kwargs["error"])
+
+            with self.assertRaises(Exception):
+                with controller.measure():
+                    raise Exception("could not connect to server")
+            self.assertTrue(record.call_args.kwargs["error"])
@@ -0,0 +1,76 @@
+import uuid
+from unittest.mock import MagicMock, patch
+from importer.celery_app import importer_app
+from importer.celery_tasks import ErrorBaseTaskClass
+from importer.idempotency import is_redelivered
+from importer.models import ExecutionStep
+from importer.tests.utils import ImporterBaseTestSupport
+
+side_effect = MagicMock()
+
+
+@importer_app.task(
+    bind=True,
+    base=ErrorBaseTaskClass,
+    name="importer.test_idempotent_step",
+    idempotent=True,
+)
+def idempotent_step(self, execution_id, layer_name, alternate, chunk=None):
+    side_effect(is_redelivered(self))
+    return "done", execution_id
+
+
+@patch("importer.idempotency.IMPORTER_IDEMPOTENT_TASKS", True)
+class TestIdempotentTask(ImporterBaseTestSupport):
+    def setUp(self):
+        self.exec_id = str(uuid.uuid4())
+        side_effect.reset_mock(side_effect=True)
+
+    def test_completed_step_should_not_run_again(self):
+        idempotent_step.apply((self.exec_id, "layer", "alternate"), task_id="first")
+        result = idempotent_step.apply(
+            (self.exec_id, "layer", "alternate"), task_id="second"
+        )
+
+        side_effect.assert_called_once_with(False)
+        self.assertEqual(["done", self.exec_id], result.result)
+        step = ExecutionStep.objects.get(exec_id=self.exec_id)
+        self.assertTrue(step.completed)
+        self.assertEqual("alternate", step.layer)
+
+    def test_interrupted_step_should_run_again_if_redelivered(self):
+        ExecutionStep.objects.create(
+            exec_id=self.exec_id,
+            step="importer.test_idempotent_step",
+            layer="alternate",
+            task_id="first",
+        )
+        # another task with the same step is ignored
+        idempotent_step.apply((self.exec_id, "layer", "alternate"), task_id="second")
+        side_effect.assert_not_called()
+
+        idempotent_step.apply((self.exec_id, "layer", "alternate"), task_id="first")
+        side_effect.assert_called_once_with(True)
+
+    @patch("importer.celery_tasks.evaluate_error")
+    def test_failed_step_should_release_the_claim(self, evaluate_error):
+        side_effect.side_effect = Exception("error")
+        idempotent_step.apply((self.exec_id, "layer", "alternate"), task_id="first")
+        self.assertFalse(ExecutionStep.objects.filter(exec_id=self.exec_id).exists())
+
+    def test_chunks_should_be_different_steps(self):
+        for index in range(2):
+            idempotent_step.apply(
+                (self.exec_id, "layer", "alternate"),
+                {"chunk": {"index": index}},
+                task_id=f"chunk_{index}",
+            )
+        self.assertEqual(2, side_effect.call_count)
+        self.assertEqual(
+            {"alternate:chunk_0", "alternate:chunk_1"},
+            set(
+                ExecutionStep.objects.filter(exec_id=self.exec_id).values_list(
+                    "layer", flat=True
+                )
+            ),
+        )
@@ -0,0 +1,63 @@
+import time
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+from unittest.mock import PropertyMock, patch
+from importer.metrics import MetricsRegistry
+
+
+@patch("importer.metrics.IMPORTER_METRICS", True)
+class TestMetricsRegistry(SimpleTestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.cache = LocMemCache(f"test_{time.time()}", {})
+        patcher = patch.object(
+            MetricsRegistry, "cache", new_callable=PropertyMock, return_value=self.cache
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_render_should_return_the_histograms(self):
+        for value in (0.3, 20):
+            self.registry.observe(
+                "importer_task_duration_seconds", value, task="importer.import_resource"
+            )
+
+        rendered = self.registry.render()
+
+        self.assertIn("# TYPE importer_task_duration_seconds histogram", rendered)
+        labels = 'task="importer.import_resource"'
+        for line in (
+            f'importer_task_duration_seconds_bucket{{{labels},le="0.1"}} 0',
+            f'importer_task_duration_seconds_bucket{{{labels},le="0.5"}} 1',
+            f'importer_task_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+            f"importer_task_duration_seconds_sum{{{labels}}} 20.3",
+            f"importer_task_duration_seconds_count{{{labels}}} 2",
+        ):
+            self.assertIn(line, rendered)
+
+    def test_render_should_return_the_counters(self):
+        self.registry.inc("importer_features_total", 100)
+        self.registry.inc("importer_features_total", 50)
+        self.registry.inc("importer_layers_total", status="completed")
+
+        rendered = self.registry.render()
+
+        self.assertIn("# TYPE importer_features_total counter", rendered)
+        self.assertIn("importer_features_total 150", rendered)
+        self.assertIn('importer_layers_total{status="completed"} 1', rendered)
+
+    def test_timed_should_observe_the_duration(self):
+        @self.registry.timed("set_thumbnail")
+        def method():
+            return "done"
+
+        self.assertEqual("done", method())
+        self.assertIn(
+            'importer_step_duration_seconds_count{step="set_thumbnail"} 1',
+            self.registry.render(),
+        )
+
+    @patch("importer.metrics.IMPORTER_METRICS", False)
+    def test_disabled_metrics_should_not_be_collected(self):
+        self.registry.inc("importer_features_total", 100)
+        self.assertEqual("\n", self.registry.render())
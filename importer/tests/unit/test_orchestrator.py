@@ -1,5 +1,7 @@
 import os
+import tempfile
 import uuid
+import requests
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.test import override_settings
@@ -9,10 +11,12 @@ from importer.api.exception import ImportException
 from importer.api.serializer import ImporterSerializer
 from importer.handlers.base import BaseHandler
 from importer.handlers.shapefile.serializer import ShapeFileSerializer
-from importer.orchestrator import ImportOrchestrator
+from importer.models import ExecutionTask, ResourceHandlerInfo
+from importer.orchestrator import ImportOrchestrator, execution_map
 from django.utils import timezone
 from django_celery_results.models import TaskResult
 from geonode.assets.handlers import asset_handler_registry
+from geonode.base.populate_test_data import create_single_dataset
 
 from geonode.resource.models import ExecutionRequest
 
@@ -36,6 +40,28 @@ class TestsImporterOrchestrator(GeoNodeBaseTestSupport):
         actual = self.orchestrator.get_handler(_data)
         self.assertIsNone(actual)
 
+    @patch("importer.handlers.gpkg.handler.GPKGFileHandler.can_handle")
+    def test_get_handler_should_consult_only_the_handlers_of_the_extension(
+        self, can_handle
+    ):
+        actual = self.orchestrator.get_handler({"base_file": "file.tif"})
+        self.assertEqual(
+            "importer.handlers.geotiff.handler.GeoTiffFileHandler", str(actual)
+        )
+        can_handle.assert_not_called()
+
+    @patch("importer.handlers.geojson.handler.GeoJsonFileHandler.can_handle")
+    def test_get_handler_should_skip_the_files_without_the_magic_bytes(
+        self, can_handle
+    ):
+        with tempfile.NamedTemporaryFile(suffix=".json") as _file:
+            _file.write(b"  not a json object")
+            _file.flush()
+            actual = self.orchestrator.get_handler({"base_file": _file.name})
+
+        self.assertIsNone(actual)
+        can_handle.assert_not_called()
+
     def test_get_serializer_should_return_the_default_one_for_if_not_specified(self):
         actual = self.orchestrator.get_serializer({"base_file": "file.gpkg"})
         self.assertEqual(type(ImporterSerializer), type(actual))
@@ -62,6 +88,115 @@ class TestsImporterOrchestrator(GeoNodeBaseTestSupport):
         actual = self.orchestrator.load_handler_by_id("gpkg")
         self.assertIsInstance(actual(), BaseHandler)
 
+    def test_load_handler_by_id_should_return_none_if_not_registered(self):
+        self.assertIsNone(self.orchestrator.load_handler_by_id("not_registered"))
+
+    def test_execution_group_should_aggregate_the_children(self):
+        user = get_user_model().objects.first()
+        parent_id = self.orchestrator.create_execution_group(
+            user,
+            children=[
+                {"func_name": "start_import", "step": "start_import", "name": name}
+                for name in ("first", "second")
+            ],
+            source="bulk",
+        )
+        parent = ExecutionRequest.objects.get(exec_id=parent_id)
+        first, second = parent.input_params["children"]
+        try:
+            self.orchestrator.set_as_completed(first)
+            parent.refresh_from_db()
+            self.assertEqual(ExecutionRequest.STATUS_RUNNING, parent.status)
+            self.assertDictEqual(
+                {"total": 2, "finished": 1, "failed": 0}, parent.output_params["group"]
+            )
+
+            self.orchestrator.set_as_failed(second, reason="error")
+            parent.refresh_from_db()
+            self.assertEqual(ExecutionRequest.STATUS_FAILED, parent.status)
+            self.assertDictEqual(
+                {"total": 2, "finished": 1, "failed": 1}, parent.output_params["group"]
+            )
+        finally:
+            ExecutionRequest.objects.filter(
+                exec_id__in=[parent_id, first, second]
+            ).delete()
+
+    def test_execution_cursor_should_change_on_each_update(self):
+        exec_id = self.orchestrator.create_execution_request(
+            user=get_user_model().objects.first(),
+            func_name="start_import",
+            step="start_import",
+        )
+        cursor = self.orchestrator.get_execution_cursor(exec_id)
+        self.assertEqual(cursor, self.orchestrator.get_execution_cursor(exec_id))
+
+        self.orchestrator.update_execution_request_status(
+            execution_id=str(exec_id), status=ExecutionRequest.STATUS_RUNNING
+        )
+        self.assertNotEqual(cursor, self.orchestrator.get_execution_cursor(exec_id))
+
+    @patch("importer.orchestrator.IMPORTER_STATUS_CACHE", "default")
+    @patch("importer.orchestrator.caches")
+    def test_execution_cursor_should_use_the_status_cache(self, _caches):
+        _caches.__getitem__.return_value.get.return_value = 3
+        self.assertEqual("3", self.orchestrator.get_execution_cursor("exec_id"))
+
+        self.orchestrator.notify_execution_update("exec_id")
+        _caches.__getitem__.return_value.incr.assert_called_once_with(
+            "importer:execution:exec_id:version"
+        )
+
+    def test_get_execution_object_should_use_the_execution_map_in_a_task(self):
+        exec_id = str(
+            self.orchestrator.create_execution_request(
+                user=get_user_model().objects.first(),
+                func_name="test",
+                step="test",
+            )
+        )
+        execution_map.begin("task_id")
+        try:
+            _exec = self.orchestrator.get_execution_object(exec_id)
+            with self.assertNumQueries(0):
+                self.assertIs(_exec, self.orchestrator.get_execution_object(exec_id))
+
+            # the update invalidates the execution
+            self.orchestrator.update_execution_request_status(
+                exec_id, status=ExecutionRequest.STATUS_RUNNING
+            )
+            actual = self.orchestrator.get_execution_object(exec_id)
+            self.assertIsNot(_exec, actual)
+            self.assertEqual(ExecutionRequest.STATUS_RUNNING, actual.status)
+
+            # the inline tasks do not release the map of the running task
+            execution_map.begin("inline_task_id")
+            execution_map.end("inline_task_id")
+            self.assertIs(actual, execution_map.get(exec_id))
+        finally:
+            execution_map.end("task_id")
+
+        self.assertFalse(execution_map.active)
+        self.assertIsNot(actual, self.orchestrator.get_execution_object(exec_id))
+
+    def test_update_execution_request_obj_should_update_the_mapped_object(self):
+        exec_id = str(
+            self.orchestrator.create_execution_request(
+                user=get_user_model().objects.first(),
+                func_name="test",
+                step="test",
+            )
+        )
+        execution_map.begin("task_id")
+        try:
+            _exec = self.orchestrator.get_execution_object(exec_id)
+            self.orchestrator.update_execution_request_obj(_exec, {"step": "next"})
+            self.assertEqual("next", _exec.step)
+            self.assertIs(_exec, self.orchestrator.get_execution_object(exec_id))
+        finally:
+            execution_map.end("task_id")
+        self.assertEqual("next", ExecutionRequest.objects.get(exec_id=exec_id).step)
+
     def test_get_execution_object_raise_exp_if_not_exists(self):
         with self.assertRaises(ImportException) as _exc:
             self.orchestrator.get_execution_object(str(uuid.uuid4()))
@@ -127,6 +262,142 @@ class TestsImporterOrchestrator(GeoNodeBaseTestSupport):
         mock_celery.assert_called_once()
         mock_celery.assert_called_with("importer.import_resource")
 
+    @patch("importer.orchestrator.IMPORTER_FUSED_STEPS", True)
+    @patch("importer.orchestrator.importer_app.tasks.get")
+    def test_perform_next_step_should_run_the_fusable_steps_inline(
+        self, mock_celery
+    ):
+        _id = self.orchestrator.create_execution_request(
+            user=get_user_model().objects.first(),
+            func_name="publish_resource",
+            step="importer.publish_resource",
+            input_params={
+                "files": {"base_file": "/tmp/file.txt"},
+                "store_spatial_files": True,
+            },
+        )
+        self.orchestrator.perform_next_step(
+            _id,
+            "import",
+            step="importer.publish_resource",
+            handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+            layer_name="layer",
+            alternate="alternate",
+        )
+        mock_celery.assert_called_once_with("importer.create_geonode_resource")
+        mock_celery.return_value.apply.assert_called_once()
+        mock_celery.return_value.apply_async.assert_not_called()
+
+    @patch("importer.orchestrator.IMPORTER_FUSED_STEPS", True)
+    @patch("importer.orchestrator.importer_app.tasks.get")
+    def test_perform_next_step_should_queue_the_not_fusable_steps(
+        self, mock_celery
+    ):
+        _id = self.orchestrator.create_execution_request(
+            user=get_user_model().objects.first(),
+            func_name="start_import",
+            step="start_import",
+            input_params={
+                "files": {"base_file": "/tmp/file.txt"},
+                "store_spatial_files": True,
+            },
+        )
+        self.orchestrator.perform_next_step(
+            _id,
+            "import",
+            step="start_import",
+            handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+        )
+        mock_celery.assert_called_once_with("importer.import_resource")
+        mock_celery.return_value.apply_async.assert_called_once()
+        mock_celery.return_value.apply.assert_not_called()
+
+    @patch("importer.orchestrator.IMPORTER_TASK_PRIORITY_TTL", 0)
+    def test_get_task_priority_should_decrease_with_the_pending_layers(self):
+        user = get_user_model().objects.first()
+        small = self.orchestrator.create_execution_request(
+            user=user, func_name="test", step="test"
+        )
+        self.orchestrator.set_expected_layers(small, 1)
+        small = self.orchestrator.get_execution_object(small)
+        ExecutionRequest.objects.filter(user=user).exclude(pk=small.pk).update(
+            status=ExecutionRequest.STATUS_FINISHED
+        )
+        self.assertEqual(8, self.orchestrator.get_task_priority(small))
+
+        # another running execution of the same user with 300 layers
+        big = self.orchestrator.create_execution_request(
+            user=user, func_name="test", step="test"
+        )
+        self.orchestrator.set_expected_layers(big, 300)
+        self.orchestrator.update_execution_request_status(
+            big, status=ExecutionRequest.STATUS_RUNNING
+        )
+        self.assertEqual(0, self.orchestrator.get_task_priority(small))
+
+    def test_get_task_priority_should_be_evaluated_once_per_user(self):
+        _exec = self.orchestrator.get_execution_object(
+            self.orchestrator.create_execution_request(
+                user=get_user_model().objects.first(), func_name="test", step="test"
+            )
+        )
+        priority = self.orchestrator.get_task_priority(_exec)
+        with self.assertNumQueries(0):
+            self.assertEqual(priority, self.orchestrator.get_task_priority(_exec))
+
+    @patch("importer.orchestrator.IMPORTER_FAIR_SCHEDULING", True)
+    def test_get_task_options_should_clamp_the_priority_to_the_queues(self):
+        _exec = self.orchestrator.get_execution_object(
+            self.orchestrator.create_execution_request(
+                user=get_user_model().objects.first(), func_name="test", step="test"
+            )
+        )
+        queues = {"importer.import_resource": 8, "importer.import_next_step": 3}
+        with patch.object(
+            self.orchestrator, "get_task_priority", return_value=8
+        ), patch.object(
+            self.orchestrator, "get_queue_max_priority", side_effect=queues.get
+        ):
+            self.assertDictEqual(
+                {"priority": 8},
+                self.orchestrator.get_task_options(_exec, "importer.import_resource"),
+            )
+            self.assertDictEqual(
+                {"priority": 3},
+                self.orchestrator.get_task_options(
+                    _exec, "importer.import_resource", "importer.import_next_step"
+                ),
+            )
+            # the queue does not support the priorities
+            self.assertDictEqual(
+                {},
+                self.orchestrator.get_task_options(_exec, "importer.import_orchestrator"),
+            )
+
+    @patch("importer.orchestrator.IMPORTER_FAIR_SCHEDULING", True)
+    @patch("importer.orchestrator.importer_app.tasks.get")
+    def test_perform_next_step_should_send_the_task_priority(self, mock_celery):
+        _id = self.orchestrator.create_execution_request(
+            user=get_user_model().objects.first(),
+            func_name="start_import",
+            step="start_import",
+            input_params={"files": {"base_file": "/tmp/file.txt"}},
+        )
+        with patch.object(
+            self.orchestrator, "get_task_priority", return_value=5
+        ), patch.object(self.orchestrator, "get_queue_max_priority", return_value=8):
+            self.orchestrator.perform_next_step(
+                _id,
+                "import",
+                step="start_import",
+                handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+            )
+        mock_celery.return_value.apply_async.assert_called_once_with(
+            (str(_id), "importer.handlers.gpkg.handler.GPKGFileHandler", "import"),
+            {},
+            priority=5,
+        )
+
     @override_settings(MEDIA_ROOT="/tmp/")
     @patch("importer.orchestrator.importer_app.tasks.get")
     def test_perform_last_import_step(self, mock_celery):
@@ -273,6 +544,50 @@ class TestsImporterOrchestrator(GeoNodeBaseTestSupport):
         # cleanup
         req.delete()
 
+    def test_update_execution_request_status_should_ignore_the_celery_task_request(
+        self,
+    ):
+        _uuid = self.orchestrator.create_execution_request(
+            user=get_user_model().objects.first(),
+            func_name="name",
+            step="step",
+        )
+
+        with self.assertWarns(DeprecationWarning):
+            self.orchestrator.update_execution_request_status(
+                execution_id=_uuid,
+                step="step_here",
+                celery_task_request=object(),
+            )
+        self.assertEqual("step_here", ExecutionRequest.objects.get(exec_id=_uuid).step)
+
+    def test_merge_execution_request_output_params(self):
+        _uuid = self.orchestrator.create_execution_request(
+            user=get_user_model().objects.first(),
+            func_name="name",
+            step="importer.import_resource",
+        )
+        self.orchestrator.update_execution_request_status(
+            execution_id=_uuid, output_params={"errors": ["error"]}
+        )
+
+        self.orchestrator.merge_execution_request_output_params(
+            _uuid, "progress", {"layer_a": {"percentage": 10}}
+        )
+        self.orchestrator.merge_execution_request_output_params(
+            _uuid, "progress", {"layer_b": {"percentage": 20}}
+        )
+
+        req = ExecutionRequest.objects.get(exec_id=_uuid)
+        self.assertEqual(["error"], req.output_params["errors"])
+        self.assertDictEqual(
+            {"layer_a": {"percentage": 10}, "layer_b": {"percentage": 20}},
+            req.output_params["progress"],
+        )
+
+        # cleanup
+        req.delete()
+
     def test_evaluate_execution_progress_should_continue_if_some_task_is_not_finished(
         self,
     ):
@@ -376,3 +691,346 @@ class TestsImporterOrchestrator(GeoNodeBaseTestSupport):
         finally:
             if success_entry:
                 success_entry.delete()
+
+    def test_get_execution_tasks_should_use_the_ledger(self):
+        exec_id = str(
+            self.orchestrator.create_execution_request(
+                user=get_user_model().objects.first(),
+                func_name="test",
+                step="test",
+            )
+        )
+        try:
+            in_ledger = TaskResult.objects.create(
+                task_id="task_id_in_ledger", status="SUCCESS", task_args="[]"
+            )
+            # matching by arguments, but not part of the ledger
+            not_in_ledger = TaskResult.objects.create(
+                task_id="task_id_not_in_ledger", status="STARTED", task_args=exec_id
+            )
+            self.orchestrator.register_execution_task(exec_id, "task_id_in_ledger")
+
+            actual = self.orchestrator.get_execution_tasks(exec_id)
+            self.assertListEqual(
+                ["task_id_in_ledger"], list(actual.values_list("task_id", flat=True))
+            )
+
+            self.orchestrator.delete_execution_tasks(exec_id)
+            self.assertFalse(TaskResult.objects.filter(task_id="task_id_in_ledger").exists())
+            self.assertFalse(ExecutionTask.objects.filter(exec_id=exec_id).exists())
+        finally:
+            in_ledger.delete()
+            not_in_ledger.delete()
+
+    def test_increment_execution_progress_should_be_atomic(self):
+        exec_id = str(
+            self.orchestrator.create_execution_request(
+                user=get_user_model().objects.first(),
+                func_name="test",
+                step="test",
+            )
+        )
+        self.orchestrator.set_expected_layers(exec_id, 2)
+
+        progress = self.orchestrator.increment_execution_progress(
+            exec_id, "completed_layers"
+        )
+        self.assertEqual(2, progress.expected_layers)
+        self.assertEqual(1, progress.completed_layers)
+
+        progress = self.orchestrator.increment_execution_progress(
+            exec_id, "failed_layers"
+        )
+        self.assertEqual(1, progress.completed_layers)
+        self.assertEqual(1, progress.failed_layers)
+
+    @patch("importer.orchestrator.ImportOrchestrator._last_step")
+    def test_evaluate_execution_progress_should_run_the_last_step_once(
+        self, _last_step
+    ):
+        exec_id = str(
+            self.orchestrator.create_execution_request(
+                user=get_user_model().objects.first(),
+                func_name="test",
+                step="test",
+            )
+        )
+        self.orchestrator.set_expected_layers(exec_id, 1)
+        progress = self.orchestrator.increment_execution_progress(
+            exec_id, "completed_layers"
+        )
+
+        # two layers evaluated at the same time as last one
+        self.orchestrator.evaluate_execution_progress(exec_id, progress=progress)
+        self.orchestrator.evaluate_execution_progress(exec_id, progress=progress)
+
+        _last_step.assert_called_once()
+        req = ExecutionRequest.objects.get(exec_id=exec_id)
+        self.assertEqual(ExecutionRequest.STATUS_FINISHED, req.status)
+
+    def test_add_to_publishing_batch_should_return_the_complete_batch_once(self):
+        exec_id = str(
+            self.orchestrator.create_execution_request(
+                user=get_user_model().objects.first(),
+                func_name="test",
+                step="test",
+            )
+        )
+        self.orchestrator.set_expected_layers(exec_id, 3)
+
+        self.assertIsNone(
+            self.orchestrator.add_to_publishing_batch(exec_id, "layer1", {"a": 1})
+        )
+        self.assertIsNone(
+            self.orchestrator.add_to_publishing_batch(exec_id, "layer2", {"a": 2})
+        )
+        # two chunks of the third layer failed, the layer is counted once
+        self.assertIsNone(
+            self.orchestrator.add_to_publishing_batch(exec_id, failed_layer="layer3")
+        )
+        self.assertIsNone(
+            self.orchestrator.add_to_publishing_batch(exec_id, failed_layer="layer3")
+        )
+        # the fourth layer is failed, so the batch is complete
+        batch = self.orchestrator.add_to_publishing_batch(exec_id, failed_layer="layer4")
+
+        self.assertDictEqual({"layer1": {"a": 1}, "layer2": {"a": 2}}, batch)
+        self.assertIsNone(self.orchestrator.add_to_publishing_batch(exec_id))
+
+    def _create_duplicated_execution(self, policy):
+        user = get_user_model().objects.first()
+        resource = create_single_dataset(name=f"test_dataset_{uuid.uuid4()}", owner=user)
+        ResourceHandlerInfo.objects.create(
+            resource=resource,
+            handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+            content_hash="hash",
+        )
+        exec_id = str(
+            self.orchestrator.create_execution_request(
+                user=user,
+                func_name="start_import",
+                step="start_import",
+                input_params={
+                    "files": {"base_file": "/tmp/file.gpkg"},
+                    "content_hash": "hash",
+                    "dedupe_policy": policy,
+                },
+            )
+        )
+        return exec_id, resource
+
+    @patch("importer.orchestrator.importer_app.tasks.get")
+    def test_perform_next_step_should_import_again_without_dedupe_policy(
+        self, mock_celery
+    ):
+        exec_id, _ = self._create_duplicated_execution("none")
+        self.orchestrator.perform_next_step(
+            exec_id,
+            "import",
+            step="start_import",
+            handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+        )
+        mock_celery.assert_called_once_with("importer.import_resource")
+
+    @patch("importer.orchestrator.importer_app.tasks.get")
+    def test_dedupe_policy_should_compute_the_content_hash_in_the_worker(
+        self, mock_celery
+    ):
+        exec_id, _ = self._create_duplicated_execution("reject")
+        _exec = ExecutionRequest.objects.get(exec_id=exec_id)
+        _exec.input_params.pop("content_hash")
+        _exec.save()
+        with patch(
+            "importer.orchestrator.compute_content_hash", return_value="hash"
+        ) as _hash:
+            self.orchestrator.perform_next_step(
+                exec_id,
+                "import",
+                step="start_import",
+                handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+            )
+            _hash.assert_called_once_with({"base_file": "/tmp/file.gpkg"})
+        mock_celery.assert_not_called()
+        req = ExecutionRequest.objects.get(exec_id=exec_id)
+        self.assertEqual("hash", req.input_params["content_hash"])
+        self.assertEqual(ExecutionRequest.STATUS_FAILED, req.status)
+
+    @patch("importer.orchestrator.importer_app.tasks.get")
+    def test_dedupe_policy_reject_should_fail_the_execution(self, mock_celery):
+        exec_id, resource = self._create_duplicated_execution("reject")
+        self.orchestrator.perform_next_step(
+            exec_id,
+            "import",
+            step="start_import",
+            handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+        )
+        mock_celery.assert_not_called()
+        req = ExecutionRequest.objects.get(exec_id=exec_id)
+        self.assertEqual(ExecutionRequest.STATUS_FAILED, req.status)
+        self.assertIn(str(resource.uuid), req.log)
+
+    @patch("importer.orchestrator.importer_app.tasks.get")
+    def test_dedupe_policy_link_should_point_to_the_existing_resource(
+        self, mock_celery
+    ):
+        exec_id, resource = self._create_duplicated_execution("link")
+        self.orchestrator.perform_next_step(
+            exec_id,
+            "import",
+            step="start_import",
+            handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+        )
+        mock_celery.assert_not_called()
+        req = ExecutionRequest.objects.get(exec_id=exec_id)
+        self.assertEqual(ExecutionRequest.STATUS_FINISHED, req.status)
+        self.assertEqual(resource.pk, req.geonode_resource.pk)
+        self.assertDictEqual(
+            {"policy": "link", "duplicate_of": [str(resource.uuid)]},
+            req.output_params["dedupe"],
+        )
+
+    @patch("importer.orchestrator.importer_app.tasks.get")
+    def test_dedupe_policy_copy_should_start_the_copy_flow(self, mock_celery):
+        exec_id, resource = self._create_duplicated_execution("copy")
+        self.orchestrator.perform_next_step(
+            exec_id,
+            "import",
+            step="start_import",
+            handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+        )
+        mock_celery.assert_called_once_with("importer.import_orchestrator")
+        mock_celery.return_value.apply_async.assert_called_once_with(
+            (
+                {},
+                exec_id,
+                "importer.handlers.gpkg.handler.GPKGFileHandler",
+                "start_copy",
+                resource.title,
+                resource.alternate,
+                "copy",
+            )
+        )
+        req = ExecutionRequest.objects.get(exec_id=exec_id)
+        self.assertEqual("copy", req.action)
+        self.assertEqual("start_copy", req.step)
+        self.assertEqual(resource.title, req.input_params["title"])
+
+    @patch("importer.orchestrator.IMPORTER_RESUMABLE", True)
+    @patch("importer.utils.IMPORTER_RESUMABLE", True)
+    @patch("importer.celery_tasks.import_orchestrator.apply_async")
+    def test_transient_failure_should_be_resumed_from_the_checkpoint(
+        self, apply_async
+    ):
+        from importer.models import ExecutionCheckpoint
+        from importer.utils import call_rollback_function
+
+        handler = "importer.handlers.gpkg.handler.GPKGFileHandler"
+        exec_id = str(
+            self.orchestrator.create_execution_request(
+                user=get_user_model().objects.first(),
+                func_name="test",
+                step="test",
+            )
+        )
+        self.orchestrator.set_expected_layers(exec_id, 1)
+        self.orchestrator.save_checkpoint(
+            exec_id,
+            "importer.import_resource",
+            "layer",
+            "alternate",
+            handler,
+            "import",
+            {"foo": "bar"},
+        )
+
+        # the transient error does not rollback the layer
+        call_rollback_function(
+            exec_id,
+            handlers_module_path=handler,
+            prev_action="import",
+            layer="layer",
+            alternate="alternate",
+            error=requests.exceptions.ReadTimeout("Read timed out"),
+        )
+        apply_async.assert_not_called()
+        self.assertTrue(self.orchestrator.is_resumable(exec_id))
+
+        # two chunks of the same layer failed
+        self.orchestrator.increment_execution_progress(exec_id, "failed_layers")
+        self.orchestrator.increment_execution_progress(exec_id, "failed_layers")
+        self.orchestrator.set_as_failed(exec_id, reason="timeout")
+
+        self.assertEqual(["layer"], self.orchestrator.resume_execution(exec_id))
+        apply_async.assert_called_once_with(
+            (
+                {},
+                exec_id,
+                handler,
+                "importer.import_resource",
+                "layer",
+                "alternate",
+                "import",
+            ),
+            {"foo": "bar"},
+        )
+        req = ExecutionRequest.objects.get(exec_id=exec_id)
+        self.assertEqual(ExecutionRequest.STATUS_RUNNING, req.status)
+        progress, _ = self.orchestrator.get_execution_progress(exec_id)
+        self.assertEqual(0, progress.failed_layers)
+        self.assertFalse(progress.finalized)
+        self.assertFalse(ExecutionCheckpoint.objects.get(exec_id=exec_id).resumable)
+        # nothing left to resume
+        self.assertEqual([], self.orchestrator.resume_execution(exec_id))
+
+    @patch("importer.orchestrator.IMPORTER_RESUMABLE", True)
+    @patch("importer.utils.IMPORTER_RESUMABLE", True)
+    @patch("importer.celery_tasks.import_orchestrator.apply_async")
+    def test_layer_without_checkpoint_should_be_rolled_back(self, apply_async):
+        from importer.utils import call_rollback_function
+
+        exec_id = str(
+            self.orchestrator.create_execution_request(
+                user=get_user_model().objects.first(),
+                func_name="test",
+                step="test",
+            )
+        )
+        call_rollback_function(
+            exec_id,
+            handlers_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+            prev_action="import",
+            layer="layer",
+            alternate="alternate",
+            error=ConnectionRefusedError("could not connect to server"),
+        )
+        apply_async.assert_called_once()
+        self.assertFalse(self.orchestrator.is_resumable(exec_id))
+
+    def test_is_transient_error_should_classify_by_exception_type(self):
+        from geoserver.catalog import FailedRequestError
+        from importer.api.exception import PublishResourceException
+        from importer.utils import is_transient_error
+
+        self.assertTrue(is_transient_error(requests.exceptions.ConnectTimeout()))
+        self.assertTrue(is_transient_error(ConnectionResetError()))
+        self.assertTrue(
+            is_transient_error(
+                FailedRequestError("Failed to create FeatureStore test : 503, unavailable")
+            )
+        )
+        self.assertFalse(
+            is_transient_error(
+                FailedRequestError("Failed to create FeatureStore test : 400, timeout")
+            )
+        )
+        self.assertFalse(is_transient_error(Exception("Read timed out")))
+        self.assertFalse(is_transient_error(Exception("Invalid connection parameters")))
+        self.assertFalse(is_transient_error(None))
+        # the error wrapped by the task
+        try:
+            try:
+                raise requests.exceptions.ReadTimeout()
+            except Exception as e:
+                raise PublishResourceException(detail=str(e))
+        except PublishResourceException as e:
+            self.assertTrue(is_transient_error(e))
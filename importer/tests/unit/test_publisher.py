@@ -1,8 +1,9 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from django.test import TestCase
 from mock import patch
 from importer import project_dir
-from importer.publisher import DataPublisher
+from importer.publisher import CatalogCache, DataPublisher
 from unittest.mock import MagicMock
 
 
@@ -98,3 +99,112 @@ class TestDataPublisher(TestCase):
 
         self.assertTrue(result)
         publish_featuretype.assert_called_once()
+
+    @patch("importer.publisher.Catalog.get_resources")
+    @patch("importer.publisher.Catalog.get_resource")
+    @patch("importer.publisher.Catalog.publish_featuretype")
+    def test_publish_resources_should_publish_the_batch_with_one_listing(
+        self, publish_featuretype, get_resource, get_resources
+    ):
+        publish_featuretype.return_value = True
+        resources = [
+            {"crs": "EPSG:32632", "name": f"stazioni_metropolitana_{x}"}
+            for x in range(3)
+        ]
+        published = []
+        for _resource in resources:
+            res = MagicMock(projection="EPSG:32632")
+            res.name = _resource["name"]
+            published.append(res)
+        get_resources.return_value = published
+
+        result = self.publisher.publish_resources(resources=resources)
+
+        self.assertTrue(result)
+        self.assertEqual(3, publish_featuretype.call_count)
+        get_resources.assert_called_once()
+        get_resource.assert_not_called()
+
+    def test_catalog_should_be_reused_between_publishers(self):
+        other = DataPublisher(handler_module_path=None)
+        self.assertIs(self.publisher.cat, other.cat)
+
+    def test_catalog_should_not_be_shared_between_threads(self):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            other = executor.submit(DataPublisher, None).result()
+        self.assertIsNot(self.publisher.cat, other.cat)
+
+    @patch("importer.publisher.IMPORTER_PUBLISHING_WORKERS", 3)
+    @patch("importer.publisher.Catalog.get_resources")
+    @patch("importer.publisher.Catalog.publish_featuretype", autospec=True)
+    def test_publish_resources_in_parallel_should_use_a_catalog_per_thread(
+        self, publish_featuretype, get_resources
+    ):
+        catalogs = set()
+        publish_featuretype.side_effect = lambda cat, *args, **kwargs: catalogs.add(
+            id(cat)
+        )
+        resources = [
+            {"crs": "EPSG:32632", "name": f"stazioni_metropolitana_{x}"}
+            for x in range(3)
+        ]
+        self.publisher.sanity_checks = MagicMock()
+
+        self.publisher.publish_resources(resources=resources)
+
+        self.assertEqual(3, publish_featuretype.call_count)
+        self.assertNotIn(id(self.publisher.cat), catalogs)
+
+    def test_catalog_cache_should_expire_the_lookups(self):
+        cache = CatalogCache(ttl=60)
+        loader = MagicMock(return_value="workspace")
+        cache.begin("task")
+
+        self.assertEqual("workspace", cache.get("key", loader))
+        self.assertEqual("workspace", cache.get("key", loader))
+        loader.assert_called_once()
+
+        cache.invalidate("key")
+        cache.get("key", loader)
+        self.assertEqual(2, loader.call_count)
+
+        expired = CatalogCache(ttl=-1)
+        expired.begin("task")
+        expired.get("key", loader)
+        expired.get("key", loader)
+        self.assertEqual(4, loader.call_count)
+
+    def test_catalog_cache_should_keep_the_lookups_only_during_the_task(self):
+        cache = CatalogCache(ttl=60)
+        loader = MagicMock(return_value="store")
+
+        cache.get("key", loader)
+        cache.get("key", loader)
+        self.assertEqual(2, loader.call_count)
+
+        cache.begin("task")
+        cache.get("key", loader)
+        cache.get("key", loader)
+        self.assertEqual(3, loader.call_count)
+        cache.end("task")
+
+        # the next task reads the store again from GeoServer
+        cache.begin("other_task")
+        cache.get("key", loader)
+        self.assertEqual(4, loader.call_count)
+        cache.end("other_task")
+
+    def test_catalog_cache_should_share_the_workspace_between_the_tasks(self):
+        cache = CatalogCache(ttl=60)
+        loader = MagicMock(return_value="workspace")
+
+        cache.get("key", loader, shared=True)
+        cache.begin("task")
+        cache.get("key", loader, shared=True)
+        cache.end("task")
+        cache.get("key", loader, shared=True)
+        loader.assert_called_once()
+
+        cache.invalidate("key")
+        cache.get("key", loader, shared=True)
+        self.assertEqual(2, loader.call_count)
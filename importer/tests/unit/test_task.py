@@ -1,13 +1,18 @@
 import os
 import shutil
+import tempfile
+import zipfile
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.test.utils import override_settings
+from django.utils.module_loading import import_string
 from unittest.mock import patch
+from celery.exceptions import MaxRetriesExceededError, Retry
 from importer.api.exception import InvalidInputFileException
 
 from importer.celery_tasks import (
+    call_next_step,
     copy_dynamic_model,
     copy_geonode_data_table,
     copy_geonode_resource,
@@ -17,7 +22,11 @@ from importer.celery_tasks import (
     import_resource,
     orchestrator,
     publish_resource,
+    publish_resources_batch,
+    record_execution_step,
+    register_execution_task,
     rollback,
+    stage_upload,
 )
 from geonode.resource.models import ExecutionRequest
 from geonode.layers.models import Dataset
@@ -25,10 +34,13 @@ from geonode.resource.enumerator import ExecutionRequestAction
 from geonode.base.models import ResourceBase
 from geonode.base.populate_test_data import create_single_dataset
 from geonode.assets.handlers import asset_handler_registry
+from geonode.assets.local import LocalAssetHandler
 from dynamic_models.models import ModelSchema, FieldSchema
 from dynamic_models.exceptions import DynamicModelError, InvalidFieldNameError
-from importer.models import ResourceHandlerInfo
+from importer.models import ExecutionTask, ResourceHandlerInfo
 from importer import project_dir
+from importer.metrics import step_timer
+from importer.utils import compute_content_hash, flatten_kwargs
 
 from importer.tests.utils import (
     ImporterBaseTestSupport,
@@ -83,6 +95,107 @@ class TestCeleryTasks(ImporterBaseTestSupport):
         self.assertEqual(count, ExecutionRequest.objects.count())
         importer.assert_called_once()
 
+    def _create_staging_execution(self, archive):
+        staging_dir = LocalAssetHandler()._create_asset_dir()
+        archive_path = shutil.copy(archive, staging_dir)
+        exec_id = orchestrator.create_execution_request(
+            user=self.user,
+            func_name="stage_upload",
+            step="importer.stage_upload",
+            input_params={
+                "files": {"base_file": archive_path},
+                "staging": {
+                    "archive": archive_path,
+                    "original_zip_name": "valid",
+                    "params": {
+                        "store_spatial_files": True,
+                        "dedupe_policy": "reject",
+                    },
+                },
+            },
+        )
+        return str(exec_id), staging_dir
+
+    @patch("importer.celery_tasks.import_orchestrator")
+    def test_stage_upload_should_extract_the_archive_and_start_the_import(
+        self, _orc
+    ):
+        exec_id, staging_dir = self._create_staging_execution(
+            f"{project_dir}/tests/fixture/valid.zip"
+        )
+
+        stage_upload(exec_id)
+
+        _exec = orchestrator.get_execution_object(exec_id)
+        self.assertEqual(
+            "importer.handlers.gpkg.handler.GPKGFileHandler",
+            _exec.input_params["handler_module_path"],
+        )
+        self.assertTrue(_exec.input_params["asset_id"])
+        self.assertTrue(os.path.exists(_exec.input_params["files"]["base_file"]))
+        # the hash is of the extracted files, not of the archive
+        self.assertEqual(
+            compute_content_hash(_exec.input_params["files"]),
+            _exec.input_params["content_hash"],
+        )
+        self.assertFalse(os.path.exists(staging_dir))
+        _orc.s.assert_called_once()
+
+        asset_handler = import_string(_exec.input_params["asset_module_path"])
+        asset_handler.objects.filter(id=_exec.input_params["asset_id"]).delete()
+
+    @patch("importer.celery_tasks.import_orchestrator")
+    def test_call_next_step_should_queue_the_orchestrator(self, _orc):
+        call_next_step(("a", "b"), {"c": 1})
+        _orc.apply_async.assert_called_once_with(("a", "b"), {"c": 1})
+        _orc.apply.assert_not_called()
+
+    @patch("importer.celery_tasks.IMPORTER_FUSED_STEPS", True)
+    @patch("importer.celery_tasks.import_orchestrator")
+    def test_call_next_step_should_run_the_orchestrator_inline(self, _orc):
+        call_next_step(("a", "b"), {"c": 1})
+        _orc.apply.assert_called_once_with(("a", "b"), {"c": 1})
+        _orc.apply_async.assert_not_called()
+
+    def test_flatten_kwargs_should_merge_the_nested_kwargs(self):
+        self.assertDictEqual(
+            {"a": 1, "b": 2, "c": 3},
+            flatten_kwargs({"a": 1, "kwargs": {"b": 2, "kwargs": {"c": 3, "a": 0}}}),
+        )
+        self.assertDictEqual({}, flatten_kwargs({"kwargs": {}}))
+
+    @patch("importer.celery_tasks.orchestrator.perform_next_step")
+    def test_import_orchestrator_should_not_nest_the_kwargs(self, perform_next_step):
+        import_orchestrator(
+            {},
+            str(self.exec_id),
+            "importer.handlers.gpkg.handler.GPKGFileHandler",
+            "importer.import_resource",
+            "layer",
+            "alternate",
+            kwargs={"kwargs": {"original_dataset_alternate": "geonode:layer"}},
+        )
+        self.assertDictEqual(
+            {"original_dataset_alternate": "geonode:layer"},
+            perform_next_step.call_args.kwargs["kwargs"],
+        )
+
+    @patch("importer.celery_tasks.import_orchestrator")
+    def test_stage_upload_should_fail_if_the_handler_is_not_found(self, _orc):
+        with tempfile.TemporaryDirectory() as _dir:
+            archive = os.path.join(_dir, "invalid.zip")
+            with zipfile.ZipFile(archive, "w") as _zip:
+                _zip.writestr("file.invalid", "abc")
+            exec_id, staging_dir = self._create_staging_execution(archive)
+
+        with self.assertRaises(InvalidInputFileException):
+            stage_upload(exec_id)
+
+        _exec = orchestrator.get_execution_object(exec_id)
+        self.assertEqual(ExecutionRequest.STATUS_FAILED, _exec.status)
+        self.assertFalse(os.path.exists(staging_dir))
+        _orc.s.assert_not_called()
+
     @patch("importer.celery_tasks.orchestrator.perform_next_step")
     @patch("importer.celery_tasks.DataStoreManager.input_is_valid")
     def test_import_resource_should_rase_exp_if_is_invalid(
@@ -178,6 +291,95 @@ class TestCeleryTasks(ImporterBaseTestSupport):
             if self.exec_id:
                 ExecutionRequest.objects.filter(exec_id=str(self.exec_id)).delete()
 
+    @patch("importer.celery_tasks.publish_resource.retry")
+    @patch("importer.celery_tasks.geoserver_controller.retry_after")
+    @patch("importer.celery_tasks.DataPublisher.publish_resources")
+    def test_publish_resource_should_wait_if_geoserver_is_paused(
+        self, publish_resources, retry_after, retry
+    ):
+        retry_after.return_value = 30
+        retry.side_effect = Retry()
+
+        with self.assertRaises(Retry):
+            publish_resource(
+                str(self.exec_id),
+                step_name="publish_resource",
+                layer_name="dataset3",
+                alternate="alternate_dataset3",
+                action=ExecutionRequestAction.IMPORT.value,
+                handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+            )
+
+        retry.assert_called_once_with(countdown=30, max_retries=10)
+        publish_resources.assert_not_called()
+
+    @patch("importer.celery_tasks.call_rollback_function")
+    @patch("importer.celery_tasks.publish_resource.retry")
+    @patch("importer.celery_tasks.geoserver_controller.retry_after")
+    def test_publish_resource_should_rollback_once_geoserver_retries_are_exhausted(
+        self, retry_after, retry, call_rollback_function
+    ):
+        retry_after.return_value = 30
+        retry.side_effect = MaxRetriesExceededError()
+
+        with self.assertRaises(Exception):
+            publish_resource(
+                str(self.exec_id),
+                step_name="publish_resource",
+                layer_name="dataset3",
+                alternate="alternate_dataset3",
+                action=ExecutionRequestAction.IMPORT.value,
+                handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+            )
+
+        call_rollback_function.assert_called_once()
+
+    @patch("importer.celery_tasks.IMPORTER_BATCH_PUBLISHING", True)
+    @patch("importer.celery_tasks.import_orchestrator.apply_async")
+    @patch("importer.celery_tasks.DataPublisher.extract_resource_to_publish")
+    @patch("importer.celery_tasks.DataPublisher.publish_resources")
+    def test_publish_resource_should_publish_the_layers_in_batch(
+        self,
+        publish_resources,
+        extract_resource_to_publish,
+        importer,
+    ):
+        try:
+            publish_resources.return_value = True
+            orchestrator.set_expected_layers(str(self.exec_id), 2)
+            for layer in ("dataset3", "dataset4"):
+                extract_resource_to_publish.return_value = [
+                    {"crs": 12345, "name": layer}
+                ]
+                with patch(
+                    "importer.celery_tasks.publish_resources_batch.apply_async",
+                    side_effect=lambda args, kwargs: publish_resources_batch(
+                        *args, **kwargs
+                    ),
+                ):
+                    publish_resource(
+                        str(self.exec_id),
+                        resource_type="gpkg",
+                        step_name="publish_resource",
+                        layer_name=layer,
+                        alternate=f"alternate_{layer}",
+                        action=ExecutionRequestAction.IMPORT.value,
+                        handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+                    )
+                if layer == "dataset3":
+                    # the first layer waits for the other one
+                    publish_resources.assert_not_called()
+                    importer.assert_not_called()
+
+            publish_resources.assert_called_once_with(
+                [{"crs": 12345, "name": "dataset3"}, {"crs": 12345, "name": "dataset4"}]
+            )
+            self.assertEqual(2, importer.call_count)
+        finally:
+            # cleanup
+            if self.exec_id:
+                ExecutionRequest.objects.filter(exec_id=str(self.exec_id)).delete()
+
     @patch("importer.celery_tasks.import_orchestrator.apply_async")
     @patch("importer.celery_tasks.DataPublisher.extract_resource_to_publish")
     @patch("importer.celery_tasks.DataPublisher.publish_resources")
@@ -310,6 +512,36 @@ class TestCeleryTasks(ImporterBaseTestSupport):
             if Dataset.objects.filter(alternate=alternate).exists():
                 Dataset.objects.filter(alternate=alternate).delete()
 
+    @patch("importer.celery_tasks.import_orchestrator")
+    @patch("importer.celery_tasks.is_redelivered", return_value=True)
+    def test_create_geonode_resource_redelivered_should_not_reuse_other_resources(
+        self, _redelivered, import_orchestrator
+    ):
+        # same alternate, but created by another execution
+        other = create_single_dataset(name="alternate_redelivered", owner=self.user)
+        new = create_single_dataset(name="alternate_redelivered_new", owner=self.user)
+        try:
+            with patch(
+                "importer.handlers.gpkg.handler.GPKGFileHandler.create_geonode_resource",
+                return_value=new,
+            ) as _create:
+                create_geonode_resource(
+                    str(self.exec_id),
+                    resource_type="gpkg",
+                    step_name="create_geonode_resource",
+                    layer_name="redelivered",
+                    alternate="alternate_redelivered",
+                    handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+                    action="import",
+                )
+                _create.assert_called_once()
+
+            req = ExecutionRequest.objects.get(exec_id=str(self.exec_id))
+            self.assertEqual(new.pk, req.geonode_resource.pk)
+        finally:
+            other.delete()
+            new.delete()
+
     @patch("importer.celery_tasks.call_rollback_function")
     def test_copy_geonode_resource_should_raise_exeption_if_the_alternate_not_exists(
         self, call_rollback_function
@@ -361,6 +593,52 @@ class TestCeleryTasks(ImporterBaseTestSupport):
             if new_alternate:
                 Dataset.objects.filter(alternate=new_alternate).delete()
 
+    @patch("importer.celery_tasks.import_orchestrator.apply_async")
+    @patch("importer.orchestrator.importer_app.tasks.get")
+    def test_copy_geonode_resource_of_a_dedupe_copy(self, mock_celery, async_call):
+        new_alternate = None
+        try:
+            resource = create_single_dataset(name="dedupe_cloning", owner=self.user)
+            ResourceHandlerInfo.objects.create(
+                resource=resource,
+                handler_module_path="importer.handlers.gpkg.handler.GPKGFileHandler",
+                content_hash="dedupe_hash",
+            )
+            exec_id = orchestrator.create_execution_request(
+                user=self.user,
+                func_name="start_import",
+                step="start_import",
+                input_params={
+                    "files": {"base_file": self.existing_file},
+                    "content_hash": "dedupe_hash",
+                    "dedupe_policy": "copy",
+                },
+            )
+            _exec = orchestrator.get_execution_object(str(exec_id))
+            self.assertTrue(orchestrator.apply_dedupe_policy(_exec))
+
+            exec_id, new_alternate = copy_geonode_resource(
+                str(exec_id),
+                "importer.copy_geonode_resource",
+                resource.title,
+                resource.alternate,
+                "importer.handlers.gpkg.handler.GPKGFileHandler",
+                "copy",
+                kwargs={
+                    "original_dataset_alternate": resource.alternate,
+                    "new_dataset_alternate": "schema_copy_dedupe_cloning",
+                },
+            )
+
+            new_resource = ResourceBase.objects.get(
+                alternate__icontains=new_alternate
+            )
+            self.assertEqual(resource.title, new_resource.title)
+            async_call.assert_called_once()
+
+        finally:
+            Dataset.objects.filter(alternate__icontains="dedupe_cloning").delete()
+
     @patch("importer.handlers.gpkg.handler.GPKGFileHandler._import_resource_rollback")
     @patch("importer.handlers.gpkg.handler.GPKGFileHandler._publish_resource_rollback")
     @patch(
@@ -515,6 +793,77 @@ class TestCeleryTasks(ImporterBaseTestSupport):
         layer.refresh_from_db()
         self.assertEqual(layer.title, "test_dataset")
 
+    def test_register_execution_task_should_add_the_task_to_the_ledger(self):
+        register_execution_task(
+            sender=import_resource,
+            task_id="task_id_ledger",
+            args=(str(self.exec_id), "handler", "import"),
+            kwargs={},
+        )
+        entry = ExecutionTask.objects.get(task_id="task_id_ledger")
+        self.assertEqual(str(self.exec_id), str(entry.exec_id))
+        self.assertEqual("importer.import_resource", entry.task_name)
+
+        # files dict before the execution id, like the import_orchestrator
+        register_execution_task(
+            sender=import_orchestrator,
+            task_id="task_id_ledger_2",
+            args=({}, str(self.exec_id)),
+            kwargs={},
+        )
+        self.assertEqual(
+            2, ExecutionTask.objects.filter(exec_id=str(self.exec_id)).count()
+        )
+
+    def test_register_execution_task_should_skip_tasks_without_execution(self):
+        register_execution_task(
+            sender=import_resource, task_id="task_id_no_exec", args=("foo",), kwargs={}
+        )
+        self.assertFalse(ExecutionTask.objects.filter(task_id="task_id_no_exec").exists())
+
+    @patch("importer.celery_tasks.IMPORTER_METRICS", True)
+    @patch("importer.celery_tasks.metrics")
+    def test_record_execution_step_should_save_the_timeline(self, metrics):
+        step_timer.start("task_id_timeline")
+        ExecutionRequest.objects.filter(exec_id=self.exec_id).exists()
+        record_execution_step(
+            sender=import_resource,
+            task_id="task_id_timeline",
+            args=(str(self.exec_id), "handler", "import"),
+            kwargs={},
+            state="SUCCESS",
+        )
+        timeline = ExecutionRequest.objects.get(exec_id=self.exec_id).output_params[
+            "timeline"
+        ]
+        step = timeline["task_id_timeline"]
+        self.assertEqual("importer.import_resource", step["task"])
+        self.assertEqual("success", step["status"])
+        self.assertGreaterEqual(step["queries"], 1)
+        metrics.observe.assert_called_once_with(
+            "importer_task_duration_seconds",
+            step["duration"],
+            task="importer.import_resource",
+            status="success",
+        )
+
+    @patch("importer.celery_tasks.IMPORTER_METRICS", False)
+    def test_record_execution_step_should_not_save_the_timeline_without_metrics(
+        self,
+    ):
+        step_timer.start("task_id_no_metrics")
+        record_execution_step(
+            sender=import_resource,
+            task_id="task_id_no_metrics",
+            args=(str(self.exec_id), "handler", "import"),
+            kwargs={},
+            state="SUCCESS",
+        )
+        output_params = (
+            ExecutionRequest.objects.get(exec_id=self.exec_id).output_params or {}
+        )
+        self.assertNotIn("timeline", output_params)
+
 
 class TestDynamicModelSchema(TransactionImporterBaseTestSupport):
     databases = ("default", "datastore")
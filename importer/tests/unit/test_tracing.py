@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+from django.test import SimpleTestCase
+from unittest.mock import patch
+from importer.tracing import SENT_AT_HEADER, TRACEPARENT_HEADER, Tracer
+
+
+@patch("importer.tracing.IMPORTER_TRACING", True)
+@patch("importer.tracing.IMPORTER_TRACING_ENDPOINT", None)
+class TestTracer(SimpleTestCase):
+    def setUp(self):
+        self.tracer = Tracer()
+        _, self.trace_file = tempfile.mkstemp(suffix=".jsonl")
+        self.addCleanup(os.remove, self.trace_file)
+        patcher = patch("importer.tracing.IMPORTER_TRACING_FILE", self.trace_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _exported_spans(self):
+        with open(self.trace_file) as _file:
+            batches = [json.loads(line) for line in _file if line.strip()]
+        return [
+            span
+            for batch in batches
+            for span in batch["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        ]
+
+    def test_nested_spans_should_be_exported_in_the_same_trace(self):
+        with self.tracer.span("importer.import_resource") as parent:
+            with self.tracer.span("ogr2ogr", layer="layer"):
+                pass
+
+        spans = {span["name"]: span for span in self._exported_spans()}
+        self.assertEqual(2, len(spans))
+        self.assertEqual(parent.trace_id, spans["ogr2ogr"]["traceId"])
+        self.assertEqual(parent.span_id, spans["ogr2ogr"]["parentSpanId"])
+        self.assertNotIn("parentSpanId", spans["importer.import_resource"])
+
+    def test_inject_should_propagate_the_current_context(self):
+        headers = {}
+        with self.tracer.span("importer.start_import") as parent:
+            self.tracer.inject(headers)
+        self.assertEqual(parent.traceparent, headers[TRACEPARENT_HEADER])
+        self.assertIn(SENT_AT_HEADER, headers)
+
+        # the worker continues the trace of the publisher
+        span = self.tracer.start_span(
+            "importer.import_orchestrator",
+            traceparent=headers[TRACEPARENT_HEADER],
+            key="task_id",
+        )
+        self.assertEqual(parent.trace_id, span.trace_id)
+        self.assertEqual(parent.span_id, span.parent_id)
+        self.tracer.end_span(key="task_id", error=Exception("failed"))
+
+        exported = self._exported_spans()[-1]
+        self.assertEqual(2, exported["status"]["code"])
+
+    def test_invalid_traceparent_should_start_a_new_trace(self):
+        self.assertIsNone(self.tracer.parse("invalid"))
+        span = self.tracer.start_span("importer.publish_resource", traceparent="invalid")
+        self.assertIsNone(span.parent_id)
+
+    @patch("importer.tracing.IMPORTER_TRACING", False)
+    def test_disabled_tracing_should_not_export(self):
+        with self.tracer.span("ogr2ogr") as span:
+            self.assertIsNone(span)
+        headers = {}
+        self.tracer.inject(headers)
+        self.assertEqual({}, headers)
+        self.assertEqual([], self._exported_spans())
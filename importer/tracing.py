@@ -0,0 +1,216 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from importer.settings import (
+    IMPORTER_TRACING,
+    IMPORTER_TRACING_ENDPOINT,
+    IMPORTER_TRACING_FILE,
+    IMPORTER_TRACING_SERVICE_NAME,
+)
+
+logger = logging.getLogger(__name__)
+
+# headers added to the messages of the importer tasks
+TRACEPARENT_HEADER = "traceparent"
+SENT_AT_HEADER = "importer_sent_at"
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, start=None, **attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = start or time.time_ns()
+        self.end = None
+        self.error = None
+        self.attributes = attributes
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in self.attributes.items()
+                if value is not None
+            ],
+            # 1 is OK, 2 is ERROR
+            "status": {"code": 2, "message": str(self.error)} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Tracer:
+    """
+    Minimal tracer compatible with the W3C trace context.
+    The context of the current span is sent in the headers of the tasks
+    published, the worker continues the trace with the span of the task.
+    The spans are exported in batch when the outermost span of the thread ends
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    @property
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @property
+    def _finished(self) -> list:
+        if not hasattr(self._local, "finished"):
+            self._local.finished = []
+        return self._local.finished
+
+    @property
+    def _keys(self) -> dict:
+        if not hasattr(self._local, "keys"):
+            self._local.keys = {}
+        return self._local.keys
+
+    def current(self):
+        return self._stack[-1] if self._stack else None
+
+    @staticmethod
+    def parse(traceparent):
+        """
+        Return the trace id and the parent span id of a traceparent header
+        """
+        try:
+            _, trace_id, parent_id, _ = traceparent.split("-")
+        except (AttributeError, ValueError):
+            return None
+        if len(trace_id) != 32 or len(parent_id) != 16:
+            return None
+        return trace_id, parent_id
+
+    def start_span(self, name, traceparent=None, key=None, start=None, **attributes):
+        """
+        Start a span, child of the remote context if provided or of the current span.
+        The key can be used to end the span from another function
+        """
+        if not IMPORTER_TRACING:
+            return None
+        current = self.current()
+        context = self.parse(traceparent) if traceparent else None
+        if context:
+            trace_id, parent_id = context
+        elif current:
+            trace_id, parent_id = current.trace_id, current.span_id
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+        span = Span(name, trace_id, parent_id, start=start, **attributes)
+        self._stack.append(span)
+        if key:
+            self._keys[key] = span
+        return span
+
+    def end_span(self, span=None, key=None, error=None):
+        span = span or self._keys.pop(key, None)
+        if span is None:
+            return
+        span.end = time.time_ns()
+        span.error = error
+        if span in self._stack:
+            self._stack.remove(span)
+        self._finished.append(span)
+        if not self._stack:
+            self.flush()
+
+    def add_span(self, name, trace_id, parent_id, start, end, **attributes):
+        """
+        Add an already completed span, like the time spent by a task in queue
+        """
+        if not IMPORTER_TRACING:
+            return
+        span = Span(name, trace_id, parent_id, start=start, **attributes)
+        span.end = end
+        self._finished.append(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = self.start_span(name, **attributes)
+        try:
+            yield span
+        except Exception as e:
+            self.end_span(span, error=e)
+            raise
+        self.end_span(span)
+
+    def traced(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def inject(self, headers: dict):
+        """
+        Add the context of the current span to the headers of a task
+        """
+        if not IMPORTER_TRACING:
+            return
+        current = self.current()
+        if current:
+            headers[TRACEPARENT_HEADER] = current.traceparent
+        headers[SENT_AT_HEADER] = time.time_ns()
+
+    def flush(self):
+        spans = list(self._finished)
+        self._finished.clear()
+        if not spans:
+            return
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": IMPORTER_TRACING_SERVICE_NAME},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "importer"},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        try:
+            if IMPORTER_TRACING_FILE:
+                with open(IMPORTER_TRACING_FILE, "a") as _file:
+                    _file.write(json.dumps(payload) + "\n")
+            if IMPORTER_TRACING_ENDPOINT:
+                requests.post(IMPORTER_TRACING_ENDPOINT, json=payload, timeout=5)
+        except Exception as e:
+            logger.warning(f"Cannot export the spans: {e}")
+
+
+tracer = Tracer()
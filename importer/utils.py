@@ -1,14 +1,107 @@
 import enum
+import hashlib
+import logging
+import re
+
+import requests
+from geoserver.catalog import FailedRequestError
 from geonode.resource.manager import ResourceManager
 from geonode.geoserver.manager import GeoServerResourceManager
 from geonode.base.models import ResourceBase
 from django.utils.translation import gettext_lazy as _
+from importer.settings import IMPORTER_DEDUPE_POLICY, IMPORTER_RESUMABLE
+
+logger = logging.getLogger(__name__)
 
 
 class ImporterRequestAction(enum.Enum):
     ROLLBACK = _("rollback")
 
 
+class DedupePolicy(enum.Enum):
+    """
+    What to do when the same content is already imported by the user:
+    - none: import it again
+    - reject: fail the execution
+    - link: complete the execution pointing to the existing resources
+    - copy: copy the existing resources, without loading the files again
+    """
+
+    NONE = "none"
+    REJECT = "reject"
+    LINK = "link"
+    COPY = "copy"
+
+
+def compute_content_hash(files: dict, chunk_size=1024 * 1024) -> str:
+    """
+    Return the sha256 of the content of the files. The names of the files
+    are not considered, so the same data uploaded with another name has the same hash
+    """
+    digest = hashlib.sha256()
+    for key in sorted(files):
+        _file = files[key]
+        if not isinstance(_file, str):
+            continue
+        file_digest = hashlib.sha256()
+        with open(_file, "rb") as fp:
+            for chunk in iter(lambda: fp.read(chunk_size), b""):
+                file_digest.update(chunk)
+        digest.update(f"{key}:{file_digest.hexdigest()};".encode())
+    return digest.hexdigest()
+
+
+def get_dedupe_params(files: dict, policy=None, compute_hash=True) -> dict:
+    """
+    Return the dedupe policy and the content hash of the files
+    to save in the input_params of the execution.
+    The hash is not needed with the "none" policy. Without compute_hash
+    is computed by the worker before the import (see apply_dedupe_policy)
+    """
+    policy = policy or IMPORTER_DEDUPE_POLICY
+    params = {"dedupe_policy": policy}
+    if compute_hash and policy != DedupePolicy.NONE.value:
+        params["content_hash"] = compute_content_hash(files)
+    return params
+
+
+# errors caused by an external service which can succeed if retried
+TRANSIENT_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+)
+
+# gsconfig reports the failed requests as "<message>: <status code>, <response>"
+FAILED_REQUEST_STATUS = re.compile(r":\s*(\d{3}),")
+
+
+def _get_server_error_status(error):
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = getattr(error.response, "status_code", None)
+    elif isinstance(error, FailedRequestError):
+        match = FAILED_REQUEST_STATUS.search(str(error))
+        status = int(match.group(1)) if match else None
+    else:
+        return None
+    return status if status and 500 <= status < 600 else None
+
+
+def is_transient_error(error) -> bool:
+    """
+    True if the error is a timeout, a failed connection or a 5xx response
+    of GeoServer. The exceptions wrapped by the tasks are checked as well
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, TRANSIENT_ERRORS) or _get_server_error_status(error):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
 def error_handler(exc, exec_id=None):
     return f'{str(exc.detail if hasattr(exc, "detail") else exc.args[0])}. Request: {exec_id}'
 
@@ -39,7 +132,21 @@ def call_rollback_function(
     error=None,
     **kwargs,
 ):
-    from importer.celery_tasks import import_orchestrator
+    from importer.celery_tasks import import_orchestrator, orchestrator
+
+    if (
+        IMPORTER_RESUMABLE
+        and layer
+        and is_transient_error(error)
+        and orchestrator.mark_as_resumable(
+            execution_id, layer, error_handler(error, exec_id=execution_id)
+        )
+    ):
+        # the layer is not rolled back, the execution can be resumed from its checkpoint
+        logger.warning(
+            f"Layer {layer} of the execution {execution_id} failed for a transient error, kept for the resume"
+        )
+        return
 
     task_params = (
         {},
@@ -55,6 +162,19 @@ def call_rollback_function(
     import_orchestrator.apply_async(task_params, kwargs)
 
 
+def flatten_kwargs(kwargs: dict) -> dict:
+    """
+    Merge the kwargs nested by celery under the kwargs key at each step,
+    so the payload sent to the next task does not grow at each hop.
+    The outer values have the precedence
+    """
+    flat = {}
+    while isinstance(kwargs, dict) and kwargs:
+        flat = {**{k: v for k, v in kwargs.items() if k != "kwargs"}, **flat}
+        kwargs = kwargs.get("kwargs")
+    return flat
+
+
 def find_key_recursively(obj, key):
     """
     Celery (unluckly) append the kwargs for each task